@@ -0,0 +1,48 @@
+<?php
+
+namespace App\Console\Commands;
+
+use App\Models\Document;
+use App\Services\DocumentProcessingService;
+use Illuminate\Console\Command;
+
+class ImportQueuedCNIS extends Command
+{
+    /**
+     * The name and signature of the console command.
+     *
+     * @var string
+     */
+    protected $signature = 'cnis:import-queued
+                           {--limit=100 : Máximo de documentos por execução}';
+
+    /**
+     * The console command description.
+     *
+     * @var string
+     */
+    protected $description = 'Gravar os vínculos dos CNIS extraídos pelo worker Python';
+
+    /**
+     * Execute the console command.
+     */
+    public function handle(DocumentProcessingService $documentProcessingService)
+    {
+        $documents = Document::query()
+            ->where('type', 'cnis')
+            ->where('is_processed', true)
+            ->whereNotNull('extraction_job')
+            ->orderBy('id')
+            ->limit((int) $this->option('limit'))
+            ->get();
+
+        $vinculos = 0;
+        foreach ($documents as $document) {
+            $vinculos += $documentProcessingService->importQueuedCNIS($document);
+        }
+
+        $this->info("{$documents->count()} documento(s) importado(s), {$vinculos} vínculo(s) gravado(s).");
+
+        return 0;
+    }
+}
@@ -20,6 +20,7 @@ class Document extends Model
         'file_size',
         'extracted_data',
         'is_processed',
+        'extraction_job',
         'notes',
         'uploaded_by',
     ];
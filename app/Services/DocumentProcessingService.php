@@ -4,6 +4,7 @@
 
 use App\Models\Document;
 use App\Models\EmploymentRelationship;
+use Illuminate\Support\Facades\Config;
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Storage;
 use Smalot\PdfParser\Parser as PdfParser;
@@ -34,6 +35,12 @@ public function processDocument(Document $document): array
                 throw new \Exception('Arquivo não encontrado: ' . $filePath);
             }
 
+            // CNIS de um caso com a fila habilitada: o worker Python extrai e
+            // cnis:import-queued grava os vínculos
+            if ($document->type === 'cnis' && $document->case_id && Config::get('python.queue.enabled', false)) {
+                return $this->queueCNIS($filePath, $document);
+            }
+
             $content = $this->extractTextFromFile($filePath, $document->mime_type);
 
             switch ($document->type) {
@@ -105,8 +112,25 @@ private function processCNIS(string $content, Document $document): array
 
         $filePath = Storage::disk('public')->path($document->file_path);
         
-        // Tenta primeiro com Python
-        $pythonResult = $this->pythonCNISExtractorService->processCNIS($filePath);
+        // Tenta primeiro com Python; os vínculos são gravados à medida que o
+        // extrator os emite
+        $streamedRelationships = [];
+        $onVinculo = null;
+        if ($document->case_id) {
+            $onVinculo = function (array $employment) use ($document, &$streamedRelationships) {
+                $streamedRelationships[] = $this->createEmploymentRelationship($document->case_id, $employment);
+            };
+        }
+
+        $pythonResult = $this->pythonCNISExtractorService->processCNIS($filePath, $onVinculo);
+
+        // Extração interrompida: descarta os vínculos já gravados
+        if (!$pythonResult['success']) {
+            foreach ($streamedRelationships as $relationship) {
+                $relationship->delete();
+            }
+            $streamedRelationships = [];
+        }
         
         if ($pythonResult['success']) {
             Log::info('Python CNIS Extractor processou com sucesso', ['data' => $pythonResult['data']]);
@@ -170,7 +194,7 @@ private function processCNIS(string $content, Document $document): array
             'is_processed' => true,
         ]);
 
-        if (!empty($extractedData['vinculos_empregaticios']) && $document->case_id) {
+        if (!empty($extractedData['vinculos_empregaticios']) && $document->case_id && empty($streamedRelationships)) {
             $this->createEmploymentRelationships($document->case_id, $extractedData['vinculos_empregaticios']);
         }
 
@@ -186,6 +210,50 @@ private function processCNIS(string $content, Document $document): array
         ];
     }
 
+    private function queueCNIS(string $filePath, Document $document): array
+    {
+        // is_processed volta a false antes do push: o worker pode concluir o
+        // job antes da gravação do uuid, que só altera extraction_job
+        $document->update(['is_processed' => false]);
+        $jobUuid = $this->pythonCNISExtractorService->queueCNIS($filePath, $document->id);
+        $document->update(['extraction_job' => $jobUuid]);
+
+        return [
+            'success' => true,
+            'queued' => true,
+            'job_uuid' => $jobUuid,
+            'data' => [],
+        ];
+    }
+
+    /**
+     * Grava os vínculos de um CNIS extraído pelo worker Python.
+     *
+     * O worker grava apenas documents.extracted_data e is_processed; aqui os
+     * vínculos do resultado viram EmploymentRelationship do caso e o job é
+     * marcado como consumido. Retorna o número de vínculos gravados.
+     */
+    public function importQueuedCNIS(Document $document): int
+    {
+        if (!$document->extraction_job || !$document->is_processed) {
+            return 0;
+        }
+
+        $employments = $document->extracted_data['vinculos_empregaticios'] ?? [];
+        if ($document->case_id) {
+            $this->createEmploymentRelationships($document->case_id, $employments);
+        }
+
+        $document->update(['extraction_job' => null]);
+
+        Log::info('Vínculos do CNIS enfileirado gravados', [
+            'document_id' => $document->id,
+            'vinculos_count' => count($employments),
+        ]);
+
+        return count($employments);
+    }
+
     private function extractPersonalDataImproved(string $content): array
     {
         $data = [];
@@ -430,23 +498,28 @@ private function extractBenefitsImproved(string $content): array
     private function createEmploymentRelationships(int $caseId, array $employments): void
     {
         foreach ($employments as $employment) {
-            EmploymentRelationship::create([
-                'case_id' => $caseId,
-                'employer_name' => $employment['empregador'],
-                'employer_cnpj' => $employment['cnpj'] ?? null,
-                'start_date' => $this->parseDate($employment['data_inicio']),
-                'end_date' => $this->parseDate($employment['data_fim']),
-                'salary' => $employment['ultima_remuneracao'] ?? null,
-                'position' => $employment['tipo_vinculo'] ?? null,
-                'notes' => json_encode([
-                    'cnpj' => $employment['cnpj'] ?? '',
-                    'tipo_vinculo' => $employment['tipo_vinculo'] ?? '',
-                    'ultima_remuneracao' => $employment['ultima_remuneracao'] ?? 0,
-                ]),
-            ]);
+            $this->createEmploymentRelationship($caseId, $employment);
         }
     }
 
+    private function createEmploymentRelationship(int $caseId, array $employment): EmploymentRelationship
+    {
+        return EmploymentRelationship::create([
+            'case_id' => $caseId,
+            'employer_name' => $employment['empregador'],
+            'employer_cnpj' => $employment['cnpj'] ?? null,
+            'start_date' => $this->parseDate($employment['data_inicio']),
+            'end_date' => $this->parseDate($employment['data_fim']),
+            'salary' => $employment['ultima_remuneracao'] ?? null,
+            'position' => $employment['tipo_vinculo'] ?? null,
+            'notes' => json_encode([
+                'cnpj' => $employment['cnpj'] ?? '',
+                'tipo_vinculo' => $employment['tipo_vinculo'] ?? '',
+                'ultima_remuneracao' => $employment['ultima_remuneracao'] ?? 0,
+            ]),
+        ]);
+    }
+
     private function parseDate(?string $dateString): ?string
     {
         if (empty($dateString)) {
@@ -4,19 +4,36 @@
 
 use Illuminate\Support\Facades\Log;
 use Illuminate\Support\Facades\Config;
+use Illuminate\Support\Facades\Queue;
+use Illuminate\Support\Str;
 
 class PythonCNISExtractorService
 {
     private string $pythonScriptPath;
     private string $pythonExecutable;
+    private ?string $serverSocket;
+    private ?string $pdfBackend;
+    private string $inputMode;
+    private bool $collectMetrics;
 
     public function __construct()
     {
-        $this->pythonScriptPath = base_path('simple_cnis_extractor.py');
+        $this->pythonScriptPath = Config::get('python.scripts.cnis_extractor', base_path('simple_cnis_extractor.py'));
         $this->pythonExecutable = Config::get('python.executable', 'python');
+        $this->serverSocket = Config::get('python.server.socket');
+        $this->pdfBackend = Config::get('python.pdf_backend');
+        $this->inputMode = Config::get('python.input', 'path');
+        $this->collectMetrics = (bool) Config::get('python.metrics', false);
     }
 
-    public function processCNIS(string $filePath): array
+    /**
+     * Processa o CNIS com o extrator Python.
+     *
+     * $onVinculo, quando informado, recebe cada vínculo assim que o script o
+     * emite (ainda durante a extração). Se o resultado final não for bem-sucedido,
+     * os vínculos já recebidos devem ser descartados.
+     */
+    public function processCNIS(string $filePath, ?callable $onVinculo = null): array
     {
         try {
             Log::info('Iniciando processamento com Python CNIS Extractor', ['file' => $filePath]);
@@ -31,33 +48,27 @@ public function processCNIS(string $filePath): array
                 throw new \Exception('Script Python não encontrado: ' . $this->pythonScriptPath);
             }
 
-            // Executa o script Python
-            $result = $this->executePythonScript($filePath);
+            // Usa o servidor Python quando disponível, senão executa o script
+            $extractedData = $this->requestFromServer($filePath, $onVinculo)
+                ?? $this->executePythonScript($filePath, $onVinculo);
 
-            if (!$result['success']) {
-                Log::error('Erro na execução do script Python', ['error' => $result['error']]);
+            if (empty($extractedData['success'])) {
+                $error = $extractedData['error'] ?? 'Erro desconhecido';
+                Log::error('Erro na execução do script Python', ['error' => $error]);
                 return [
                     'success' => false,
-                    'error' => 'Erro no Python CNIS Extractor: ' . $result['error'],
+                    'error' => 'Erro no Python CNIS Extractor: ' . $error,
                 ];
             }
 
-            // Decodifica o resultado JSON
-            // Limpa a saída para pegar apenas o JSON
-            if (preg_match('/({.*})/s', $result['output'], $matches)) {
-                $json = $matches[1];
-            } else {
-                $json = $result['output'];
-            }
-            $extractedData = json_decode($json, true);
-
-            if (json_last_error() !== JSON_ERROR_NONE) {
-                throw new \Exception('Erro ao decodificar JSON: ' . json_last_error_msg() . ' | Saída: ' . $result['output']);
-            }
-
             Log::info('Processamento Python concluído com sucesso', [
                 'vinculos_count' => count($extractedData['data']['vinculos_empregaticios'] ?? []),
                 'text_length' => $extractedData['text_length'] ?? 0,
+                'backend' => $extractedData['backend'] ?? null,
+                'ocr_pages' => count($extractedData['ocr_pages'] ?? []),
+                'skipped_pages' => count($extractedData['skipped_pages'] ?? []),
+                'personal_source' => $extractedData['personal_source'] ?? null,
+                'metrics' => $extractedData['metrics'] ?? null,
             ]);
 
             return [
@@ -65,6 +76,10 @@ public function processCNIS(string $filePath): array
                 'data' => $extractedData['data'],
                 'metadata' => [
                     'text_length' => $extractedData['text_length'] ?? 0,
+                    'backend' => $extractedData['backend'] ?? null,
+                    'ocr_pages' => $extractedData['ocr_pages'] ?? [],
+                    'skipped_pages' => $extractedData['skipped_pages'] ?? [],
+                    'personal_source' => $extractedData['personal_source'] ?? null,
                     'method' => 'python_extractor',
                 ],
             ];
@@ -82,39 +97,202 @@ public function processCNIS(string $filePath): array
         }
     }
 
-    private function executePythonScript(string $filePath): array
+    /**
+     * Enfileira a extração do CNIS para o worker Python (simple_cnis_extractor.py --queue).
+     *
+     * O payload é um JSON simples lido pelo worker direto da tabela jobs; o
+     * resultado é gravado em documents.extracted_data do documento informado.
+     * Retorna o uuid do job.
+     */
+    public function queueCNIS(string $filePath, ?int $documentId = null): string
+    {
+        $queue = Config::get('python.queue.name', 'cnis');
+        $payload = [
+            'uuid' => (string) Str::uuid(),
+            'displayName' => 'cnis.extract',
+            'job' => 'cnis.extract',
+            'maxTries' => (int) Config::get('python.queue.max_tries', 3),
+            'backoff' => (string) Config::get('python.queue.backoff', '10,60,300'),
+            'data' => [
+                'pdf_path' => $filePath,
+                'document_id' => $documentId,
+            ],
+        ];
+
+        Queue::connection('database')->pushRaw(json_encode($payload, JSON_UNESCAPED_UNICODE), $queue);
+
+        Log::info('Extração do CNIS enfileirada para o worker Python', [
+            'file' => $filePath,
+            'document_id' => $documentId,
+            'queue' => $queue,
+            'uuid' => $payload['uuid'],
+        ]);
+
+        return $payload['uuid'];
+    }
+
+    private function requestFromServer(string $filePath, ?callable $onVinculo): ?array
+    {
+        if (!$this->serverSocket || !file_exists($this->serverSocket)) {
+            return null;
+        }
+
+        $timeout = (int) Config::get('python.server.timeout', 120);
+        $socket = @stream_socket_client('unix://' . $this->serverSocket, $errno, $errstr, $timeout);
+
+        if ($socket === false) {
+            Log::warning('Servidor Python indisponível, executando script', ['error' => $errstr]);
+            return null;
+        }
+
+        stream_set_timeout($socket, $timeout);
+
+        $request = json_encode(['id' => uniqid('cnis_', true), 'pdf_path' => $filePath]);
+        fwrite($socket, $request . "\n");
+        $response = fgets($socket);
+        fclose($socket);
+
+        if ($response === false) {
+            Log::warning('Servidor Python não respondeu, executando script');
+            return null;
+        }
+
+        Log::info('Resultado do servidor Python', ['output_length' => strlen($response)]);
+
+        $extractedData = json_decode($response, true);
+
+        if (!is_array($extractedData)) {
+            throw new \Exception('Erro ao decodificar JSON do servidor: ' . json_last_error_msg());
+        }
+
+        if ($onVinculo && !empty($extractedData['success'])) {
+            foreach ($extractedData['data']['vinculos_empregaticios'] ?? [] as $vinculo) {
+                $onVinculo($vinculo);
+            }
+        }
+
+        return $extractedData;
+    }
+
+    /**
+     * Executa o script com saída NDJSON (--format ndjson): cabeçalho, um registro
+     * por vínculo assim que extraído e um trailer com contagens e métricas.
+     * Os logs do script vão para um arquivo temporário, separados do stdout.
+     */
+    private function executePythonScript(string $filePath, ?callable $onVinculo): array
     {
+        // Com entrada "stdin" o arquivo é o stdin do processo ('-'), mapeado em memória pelo script
+        $fromStdin = $this->inputMode === 'stdin';
+
         // Escapa o caminho do arquivo para segurança
-        $escapedFilePath = escapeshellarg($filePath);
+        $escapedFilePath = $fromStdin ? '-' : escapeshellarg($filePath);
         $escapedScriptPath = escapeshellarg($this->pythonScriptPath);
 
         // Comando para executar o script Python
-        $command = "{$this->pythonExecutable} {$escapedScriptPath} {$escapedFilePath} 2>&1";
+        $command = "{$this->pythonExecutable} {$escapedScriptPath} {$escapedFilePath} --format ndjson --quiet";
+
+        if ($this->pdfBackend) {
+            $command .= ' --backend ' . escapeshellarg($this->pdfBackend);
+        }
+
+        if ($this->collectMetrics) {
+            $command .= ' --metrics';
+        }
 
         Log::info('Executando comando Python', ['command' => $command]);
 
-        // Executa o comando
-        $output = [];
-        $returnCode = 0;
-        exec($command, $output, $returnCode);
+        $stderrPath = tempnam(sys_get_temp_dir(), 'cnis_stderr_');
+        $descriptors = [
+            1 => ['pipe', 'w'],
+            2 => ['file', $stderrPath, 'w'],
+        ];
+        if ($fromStdin) {
+            $descriptors[0] = ['file', $filePath, 'r'];
+        }
+
+        $process = proc_open($command, $descriptors, $pipes);
+
+        if (!is_resource($process)) {
+            @unlink($stderrPath);
+            return [
+                'success' => false,
+                'error' => 'Não foi possível iniciar o processo Python',
+            ];
+        }
+
+        $vinculos = [];
+        $trailer = null;
 
-        $outputString = implode("\n", $output);
+        // Cada linha é um registro completo: não há varredura da saída inteira
+        try {
+            while (($line = fgets($pipes[1])) !== false) {
+                $record = json_decode($line, true);
+
+                if (!is_array($record)) {
+                    Log::warning('Linha inválida na saída do Python', ['line' => substr($line, 0, 200)]);
+                    continue;
+                }
+
+                switch ($record['type'] ?? null) {
+                    case 'vinculo':
+                        unset($record['type'], $record['index']);
+                        $vinculos[] = $record;
+                        if ($onVinculo) {
+                            $onVinculo($record);
+                        }
+                        break;
+
+                    case 'trailer':
+                        $trailer = $record;
+                        break;
+                }
+            }
+        } finally {
+            fclose($pipes[1]);
+            $returnCode = proc_close($process);
+            $stderr = trim((string) @file_get_contents($stderrPath));
+            @unlink($stderrPath);
+        }
 
         Log::info('Resultado da execução Python', [
             'return_code' => $returnCode,
-            'output_length' => strlen($outputString),
+            'vinculos' => count($vinculos),
         ]);
 
-        if ($returnCode !== 0) {
+        if ($trailer === null) {
+            return [
+                'success' => false,
+                'error' => "Execução interrompida (código {$returnCode}): {$stderr}",
+            ];
+        }
+
+        if (empty($trailer['success'])) {
+            return [
+                'success' => false,
+                'error' => $trailer['error'] ?? "Erro na execução (código {$returnCode}): {$stderr}",
+            ];
+        }
+
+        if (($trailer['vinculos'] ?? 0) !== count($vinculos)) {
             return [
                 'success' => false,
-                'error' => "Erro na execução (código {$returnCode}): {$outputString}",
+                'error' => "Saída incompleta: {$trailer['vinculos']} vínculos anunciados, " . count($vinculos) . ' recebidos',
             ];
         }
 
         return [
             'success' => true,
-            'output' => $outputString,
+            'data' => [
+                'client_name' => $trailer['client_name'] ?? '',
+                'client_cpf' => $trailer['client_cpf'] ?? '',
+                'vinculos_empregaticios' => $vinculos,
+            ],
+            'text_length' => $trailer['text_length'] ?? 0,
+            'backend' => $trailer['backend'] ?? null,
+            'ocr_pages' => $trailer['ocr_pages'] ?? [],
+            'skipped_pages' => $trailer['skipped_pages'] ?? [],
+            'personal_source' => $trailer['personal_source'] ?? null,
+            'metrics' => $trailer['metrics'] ?? null,
         ];
     }
 
@@ -142,7 +320,7 @@ public function checkPythonEnvironment(): array
         }
 
         // Verifica módulos Python necessários
-        $requiredModules = ['re', 'json', 'logging', 'PyPDF2', 'pdfplumber'];
+        $requiredModules = ['re', 'json', 'logging', 'fitz', 'PyPDF2', 'pdfplumber'];
         foreach ($requiredModules as $module) {
             $output = [];
             $returnCode = 0;
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Artefatos de texto extraído do CNIS
+Guarda o texto de cada página em um arquivo compactado ao lado do PDF, para que
+mudanças nas regras de extração possam ser reaplicadas sem decodificar o PDF de novo
+"""
+
+import os
+import gzip
+import json
+import tempfile
+from typing import Dict, Any, Optional, Callable, Iterable, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SUFFIX = '.cnis-text.jsonl.gz'
+FORMAT_NAME = 'cnis-text'
+FORMAT_VERSION = 1
+
+# Formato (JSON lines compactado com gzip):
+#   {"format": "cnis-text", "version": 1, "source": "arquivo.pdf"}
+#   {"page": 0, "offset": 0, "text": "..."}          (uma linha por página)
+#   {"end": true, "backend": "PyPDF2", "page_count": N, "text_length": M}
+
+
+def artifact_path_for(path: str) -> str:
+    """Caminho do artefato de texto correspondente a um PDF"""
+    if path.endswith(ARTIFACT_SUFFIX):
+        return path
+    return path + ARTIFACT_SUFFIX
+
+
+class TextArtifactWriter:
+    """Grava o artefato página a página; o arquivo só aparece após commit()"""
+
+    def __init__(self, path: str, source: Optional[str] = None):
+        self.path = path
+        self.page_count = 0
+        self.text_length = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp-')
+        self.file = gzip.open(os.fdopen(fd, 'wb'), 'wt', encoding='utf-8')
+        self._write_line({'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+                          'source': os.path.basename(source) if source else None})
+
+    def _write_line(self, record: Dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_page(self, text: str) -> None:
+        self._write_line({'page': self.page_count, 'offset': self.text_length, 'text': text})
+        self.page_count += 1
+        self.text_length += len(text)
+
+    def commit(self, backend: Optional[str]) -> None:
+        self._write_line({'end': True, 'backend': backend,
+                          'page_count': self.page_count, 'text_length': self.text_length})
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def save_pages(chunks: Iterable[str], path: str, source: Optional[str] = None,
+               backend: Callable[[], Optional[str]] = lambda: None) -> Iterator[str]:
+    """Repassa as páginas adiante enquanto grava o artefato
+
+    O artefato só é publicado se todas as páginas forem lidas sem erro.
+    """
+    writer = TextArtifactWriter(path, source)
+    try:
+        for chunk in chunks:
+            writer.write_page(chunk)
+            yield chunk
+    except BaseException:
+        writer.discard()
+        raise
+    writer.commit(backend())
+    logger.info(f"Artefato de texto salvo: {path}")
+
+
+def iter_artifact_pages(path: str, meta: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """Lê o texto das páginas do artefato, uma por vez
+
+    Se meta for informado, recebe o cabeçalho e o trailer (backend, contagens).
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        header = json.loads(file.readline() or 'null')
+        if not isinstance(header, dict) or header.get('format') != FORMAT_NAME:
+            raise ValueError(f"Arquivo não é um artefato de texto CNIS: {path}")
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Versão de artefato não suportada: {header.get('version')}")
+
+        for line in file:
+            record = json.loads(line)
+            if record.get('end'):
+                if meta is not None:
+                    meta.update(header)
+                    meta.update(record)
+                return
+            yield record['text']
+
+    raise ValueError(f"Artefato de texto incompleto: {path}")
+
+
+def read_text_artifact(path: str) -> Dict[str, Any]:
+    """Carrega o artefato inteiro: páginas, offsets e backend usado"""
+    meta = {}
+    pages = list(iter_artifact_pages(path, meta))
+    offsets = []
+    offset = 0
+    for page in pages:
+        offsets.append(offset)
+        offset += len(page)
+    meta.pop('end', None)
+    return {**meta, 'pages': pages, 'offsets': offsets}
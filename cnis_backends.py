@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Backends de leitura de PDF para o extrator CNIS
+Interface única sobre PyMuPDF, pypdf/PyPDF2 e pdfplumber, com escolha automática do mais rápido
+O PDF pode ser um caminho ou um PdfInput (conteúdo em memória), aberto sem ir ao disco
+"""
+
+import math
+import statistics
+import importlib
+import importlib.util
+from typing import Any, Dict, List, Optional, Iterator, Tuple, Type
+import logging
+
+from cnis_input import PdfInput, PdfSource, can_share, shared_with_workers, worker_source
+from cnis_pages import HEAD_FRACTION, skip_page
+
+logger = logging.getLogger(__name__)
+
+# A partir de quantas páginas vale a pena decodificar o PDF em paralelo
+PARALLEL_PAGE_THRESHOLD = 40
+
+# Tamanho mínimo de cada fatia de páginas enviada a um worker
+MIN_PAGES_PER_TASK = 4
+
+# Palavra com coordenadas: (x0, y0, x1, y1, texto)
+Word = Tuple[float, float, float, float, str]
+
+# Palavras cujo centro vertical dista menos que esta fração da altura
+# mediana das palavras ficam na mesma linha
+ROW_TOLERANCE = 0.5
+
+
+def words_to_text(words: List[Word]) -> str:
+    """Texto da página com uma linha por linha visual (palavras da esquerda para a direita)
+
+    O PyMuPDF devolve cada célula de tabela como uma linha própria; o
+    divisor de seções espera a linha inteira da tabela, como no pypdf e no
+    pdfplumber.
+    """
+    if not words:
+        return ''
+    tolerance = ROW_TOLERANCE * max(statistics.median(word[3] - word[1] for word in words), 1.0)
+    rows = []
+    row: List[Word] = []
+    last = None
+    for word in sorted(words, key=lambda word: word[1] + word[3]):
+        center = (word[1] + word[3]) / 2
+        if row and center - last > tolerance:
+            rows.append(row)
+            row = []
+        row.append(word)
+        last = center
+    rows.append(row)
+    return '\n'.join(' '.join(word[4] for word in sorted(row)) for row in rows) + '\n'
+
+
+class BackendNotAvailable(ImportError):
+    """Backend solicitado não está instalado"""
+
+
+class PdfBackend:
+    """Interface comum dos backends de PDF
+
+    Uso:
+        with backend_class(source) as pdf:
+            for index in range(pdf.page_count()):
+                text = pdf.page_text(index)
+    """
+
+    # Nome exposto em --backend e no JSON de saída
+    name = ''
+    # Módulos que fornecem o backend, em ordem de preferência
+    modules = ()
+    # Indica se words() está disponível
+    supports_words = False
+
+    @classmethod
+    def module_name(cls) -> Optional[str]:
+        """Primeiro módulo instalado do backend (sem importá-lo)"""
+        for module in cls.modules:
+            if importlib.util.find_spec(module) is not None:
+                return module
+        return None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cls.module_name() is not None
+
+    @classmethod
+    def load_module(cls):
+        module = cls.module_name()
+        if module is None:
+            raise BackendNotAvailable(f"Backend de PDF '{cls.name}' não instalado ({', '.join(cls.modules)})")
+        return importlib.import_module(module)
+
+    def __init__(self, source: PdfSource):
+        self.source = source
+        self.module = self.load_module()
+        self.open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def page_text(self, index: int) -> str:
+        raise NotImplementedError
+
+    def words(self, index: int) -> List[Word]:
+        """Palavras da página com coordenadas (origem no canto superior esquerdo)"""
+        raise NotImplementedError(f"Backend '{self.name}' não fornece coordenadas de palavras")
+
+    def words_and_text(self, index: int) -> Tuple[List[Word], str]:
+        """Palavras da página com coordenadas e o texto dela (o mesmo de page_text)"""
+        return self.words(index), self.page_text(index) or ''
+
+    def page_head(self, index: int) -> Optional[str]:
+        """Texto do topo da página (HEAD_FRACTION da altura), ou None quando o
+        backend não lê um recorte mais barato que a página inteira"""
+        return None
+
+    def iter_page_texts(self, start: int = 0, stop: Optional[int] = None,
+                        targeted: bool = False) -> Iterator[Optional[str]]:
+        """Texto das páginas do intervalo, cada uma terminando com quebra de linha
+
+        Com targeted, as páginas de legenda, resumo e benefícios (cnis_pages)
+        são classificadas pelo topo e devolvidas como None, sem extração
+        completa; sem recorte no backend, a classificação usa o texto inteiro.
+        """
+        stop = self.page_count() if stop is None else stop
+        for index in range(start, stop):
+            head = self.page_head(index) if targeted else None
+            if head is not None and skip_page(index, head):
+                yield None
+                continue
+            text = self.page_text(index) or ''
+            if targeted and head is None and skip_page(index, text):
+                yield None
+                continue
+            yield text if text.endswith('\n') else text + '\n'
+
+    def iter_page_words(self, start: int = 0, stop: Optional[int] = None,
+                        targeted: bool = False) -> Iterator[Optional[Tuple[List[Word], str]]]:
+        """(palavras com coordenadas, texto) das páginas do intervalo (None nas dispensadas)
+
+        O texto é o de iter_page_texts: é ele que segue para os dados pessoais,
+        o artefato salvo e o divisor de seções quando a leitura por coordenadas
+        não se aplica ao documento.
+        """
+        stop = self.page_count() if stop is None else stop
+        for index in range(start, stop):
+            head = self.page_head(index) if targeted else None
+            if head is not None and skip_page(index, head):
+                yield None
+                continue
+            words, text = self.words_and_text(index)
+            if targeted and head is None and skip_page(index, text):
+                yield None
+                continue
+            yield words, text if text.endswith('\n') else text + '\n'
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = 'pymupdf'
+    modules = ('fitz',)
+    supports_words = True
+
+    def open(self) -> None:
+        self.doc = open_fitz_document(self.module, self.source)
+
+    def close(self) -> None:
+        self.doc.close()
+
+    def page_count(self) -> int:
+        return len(self.doc)
+
+    def page_text(self, index: int) -> str:
+        return words_to_text(self.words(index))
+
+    def words(self, index: int) -> List[Word]:
+        return self.words_in(self.doc.load_page(index))
+
+    def words_and_text(self, index: int) -> Tuple[List[Word], str]:
+        # Uma só leitura das palavras: o texto da página é montado a partir delas
+        words = self.words(index)
+        return words, words_to_text(words)
+
+    def words_in(self, page, clip=None) -> List[Word]:
+        words = page.get_text('words', clip=clip)
+        if not page.rotation:
+            return [word[:5] for word in words]
+        # Extratos em paisagem: get_text('words') dá as coordenadas da página
+        # sem rotação; leva cada palavra para a orientação exibida
+        matrix = page.rotation_matrix
+        Rect = self.module.Rect
+        return [(*(Rect(word[:4]) * matrix), word[4]) for word in words]
+
+    def page_head(self, index: int) -> str:
+        page = self.doc.load_page(index)
+        rect = page.rect
+        clip = self.module.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * HEAD_FRACTION)
+        # O recorte é medido na orientação exibida; a extração usa a página sem rotação
+        if page.rotation:
+            clip = clip * page.derotation_matrix
+        return words_to_text(self.words_in(page, clip))
+
+
+class PypdfBackend(PdfBackend):
+    name = 'pypdf'
+    modules = ('pypdf', 'PyPDF2')
+
+    def open(self) -> None:
+        if isinstance(self.source, PdfInput):
+            self.file = self.source.stream()
+        else:
+            self.file = open(self.source, 'rb')
+        self.reader = self.module.PdfReader(self.file)
+
+    def close(self) -> None:
+        # O buffer de um PdfInput pertence a quem o criou
+        if not isinstance(self.source, PdfInput):
+            self.file.close()
+
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self.reader.pages[index].extract_text()
+
+
+class PdfplumberBackend(PdfBackend):
+    name = 'pdfplumber'
+    modules = ('pdfplumber',)
+    supports_words = True
+
+    def open(self) -> None:
+        source = self.source.stream() if isinstance(self.source, PdfInput) else self.source
+        self.pdf = self.module.open(source)
+
+    def close(self) -> None:
+        self.pdf.close()
+
+    def page_count(self) -> int:
+        return len(self.pdf.pages)
+
+    def page_text(self, index: int) -> str:
+        return self.pdf.pages[index].extract_text()
+
+    def words(self, index: int) -> List[Word]:
+        return [
+            (word['x0'], word['top'], word['x1'], word['bottom'], word['text'])
+            for word in self.pdf.pages[index].extract_words()
+        ]
+
+    def page_head(self, index: int) -> str:
+        page = self.pdf.pages[index]
+        x0, top, x1, _ = page.bbox
+        return page.crop((x0, top, x1, top + page.height * HEAD_FRACTION)).extract_text() or ''
+
+
+def open_fitz_document(fitz, source: PdfSource):
+    """Abre o documento no PyMuPDF a partir do caminho ou do conteúdo em memória
+
+    O stream= do PyMuPDF só aceita bytes: bytearray e io.BytesIO são
+    convertidos com cópia, e memoryview e mmap são recusados. Não há como
+    entregar o mapeamento sem copiá-lo. Bytes lidos de um pipe vão direto;
+    um arquivo mapeado com caminho conhecido é reaberto pelo MuPDF (a
+    releitura sai do cache de páginas do sistema, sem cópia na memória do
+    Python); só o mmap sem caminho (stdin redirecionado de um arquivo) é
+    copiado.
+    """
+    if not isinstance(source, PdfInput):
+        return fitz.open(source)
+    if source.path is not None and not isinstance(source.data, bytes):
+        return fitz.open(source.path)
+    return fitz.open(stream=source.as_bytes(), filetype='pdf')
+
+
+# Do mais rápido para o mais lento em documentos CNIS
+BACKENDS = (PyMuPDFBackend, PypdfBackend, PdfplumberBackend)
+
+BACKENDS_BY_NAME: Dict[str, Type[PdfBackend]] = {backend.name: backend for backend in BACKENDS}
+
+
+def available_backends() -> List[str]:
+    """Nomes dos backends instalados, do mais rápido para o mais lento"""
+    return [backend.name for backend in BACKENDS if backend.is_available()]
+
+
+def get_backend(name: Optional[str] = None) -> Type[PdfBackend]:
+    """Retorna a classe do backend pedido ou, sem nome, do mais rápido instalado"""
+    if name:
+        if name not in BACKENDS_BY_NAME:
+            raise ValueError(f"Backend de PDF desconhecido: {name} (opções: {', '.join(BACKENDS_BY_NAME)})")
+        backend = BACKENDS_BY_NAME[name]
+        if not backend.is_available():
+            raise BackendNotAvailable(f"Backend de PDF '{name}' não instalado ({', '.join(backend.modules)})")
+        return backend
+
+    for backend in BACKENDS:
+        if backend.is_available():
+            return backend
+
+    raise BackendNotAvailable("Nenhuma biblioteca de PDF encontrada. Instale PyMuPDF, pypdf/PyPDF2 ou pdfplumber")
+
+
+def open_pdf(source: PdfSource, name: Optional[str] = None) -> PdfBackend:
+    """Abre o PDF com o backend pedido ou com o mais rápido instalado"""
+    return get_backend(name)(source)
+
+
+def _decode_page_range(backend_name: str, source: Optional[str], start: int, stop: int,
+                       targeted: bool = False, words: bool = False) -> List[Any]:
+    """Decodifica uma fatia de páginas em um processo worker (abre o PDF por conta própria)"""
+    with BACKENDS_BY_NAME[backend_name](worker_source(source)) as pdf:
+        if words:
+            return list(pdf.iter_page_words(start, stop, targeted))
+        return list(pdf.iter_page_texts(start, stop, targeted))
+
+
+def page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Divide as páginas em fatias contíguas, cerca de duas por worker"""
+    size = max(MIN_PAGES_PER_TASK, math.ceil(page_count / (workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def iter_page_texts_parallel(backend: Type[PdfBackend], source: PdfSource, page_count: int,
+                             workers: int, targeted: bool = False, words: bool = False) -> Iterator[Any]:
+    """Decodifica as páginas em paralelo e as devolve na ordem original
+
+    Cada worker abre o documento e decodifica a sua fatia; as fatias são
+    devolvidas em ordem, assim o texto de um vínculo que atravessa a quebra
+    de página chega contíguo ao divisor de seções. O conteúdo em memória é
+    herdado pelos workers no fork, sem ser enviado a cada tarefa.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    ranges = page_ranges(page_count, workers)
+
+    with shared_with_workers(source) as task_source, \
+            ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as executor:
+        futures = [
+            executor.submit(_decode_page_range, backend.name, task_source, start, stop, targeted, words)
+            for start, stop in ranges
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+def iter_pdf_pages(source: PdfSource, name: Optional[str] = None, workers: int = 1,
+                   threshold: int = PARALLEL_PAGE_THRESHOLD, targeted: bool = False,
+                   words: bool = False) -> Iterator[Any]:
+    """Texto das páginas do PDF, em paralelo quando o documento é grande
+
+    O paralelismo só é usado com workers > 1 e a partir de threshold páginas,
+    para que documentos pequenos não paguem o custo de criar o pool. Com
+    targeted, as páginas dispensadas vêm como None (ver iter_page_texts);
+    com words, cada página vem como a lista de palavras com coordenadas.
+    """
+    backend = get_backend(name)
+    with backend(source) as pdf:
+        page_count = pdf.page_count()
+        if workers <= 1 or page_count < threshold or not can_share(source):
+            if words:
+                yield from pdf.iter_page_words(targeted=targeted)
+            else:
+                yield from pdf.iter_page_texts(targeted=targeted)
+            return
+
+    logger.info(f"Decodificando {page_count} páginas em paralelo ({workers} workers)")
+    yield from iter_page_texts_parallel(backend, source, page_count, workers, targeted, words)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Processamento em lote de arquivos CNIS
+Distribui os arquivos entre processos e emite um resultado NDJSON por arquivo
+"""
+
+import os
+import sys
+import glob
+import json
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Iterable, Iterator, Tuple
+import logging
+
+from cnis_artifacts import ARTIFACT_SUFFIX
+from cnis_metrics import MetricsAggregator
+from cnis_patterns import format_report, iter_profiled
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Extrator do processo worker (criado uma única vez por processo)
+_extractor = None
+
+# Quantas vezes um arquivo é reenviado após a queda de um worker
+MAX_RETRIES = 1
+
+
+def _init_worker(extractor_factory: Callable[[], Any]) -> None:
+    """Inicializa o extrator no processo worker"""
+    global _extractor
+    _extractor = extractor_factory()
+
+
+def _process_file(pdf_path: str) -> Dict[str, Any]:
+    """Processa um arquivo no worker, isolando qualquer erro"""
+    try:
+        result = _extractor.process_cnis(pdf_path)
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    return {'file': pdf_path, **result}
+
+
+def collect_inputs(sources: Iterable[str], suffix: str = '.pdf') -> Iterator[str]:
+    """Expande diretórios, padrões glob e arquivos de manifesto em caminhos de PDF
+
+    - diretório: todos os arquivos com o sufixo (recursivo)
+    - padrão com * ? ou [: expandido com glob
+    - arquivo com o sufixo (.pdf por padrão): o próprio arquivo
+    - outro arquivo: manifesto com um caminho por linha (# inicia comentário)
+    """
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            yield from sorted(str(p) for p in path.rglob('*') if p.name.lower().endswith(suffix))
+        elif glob.has_magic(source):
+            yield from sorted(glob.glob(source, recursive=True))
+        elif path.name.lower().endswith(suffix):
+            yield str(path)
+        elif path.is_file():
+            with open(path, 'r', encoding='utf-8') as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        yield line
+        else:
+            logger.warning(f"Entrada ignorada (não encontrada): {source}")
+
+
+def _create_executor(extractor_factory: Callable[[], Any], workers: int) -> 'ProcessPoolExecutor':
+    """Cria o pool de processos, usando fork quando disponível"""
+    # multiprocessing e concurrent.futures só são carregados no modo lote
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(extractor_factory,)
+    )
+
+
+class ExtractionPool:
+    """Pool de processos do extrator, reaproveitado enquanto houver arquivos
+
+    O extrator é criado uma vez em cada processo, no início do pool, e não a
+    cada arquivo ou lote. Cada arquivo enviado leva uma etiqueta (tag), que
+    volta junto com o resultado. Se um worker morrer (ex.: PDF que derruba a
+    biblioteca), os arquivos em voo são reenviados a um novo pool e só o
+    arquivo que continuar falhando é reportado como erro.
+    """
+
+    def __init__(self, extractor_factory: Callable[[], Any], workers: int):
+        self.extractor_factory = extractor_factory
+        self.workers = workers
+        self.retries: Dict[str, int] = {}
+        self.in_flight = deque()  # (future, pdf_path, tag) na ordem de envio
+        self.executor = _create_executor(extractor_factory, workers)
+
+    def __len__(self) -> int:
+        return len(self.in_flight)
+
+    def submit(self, pdf_path: str, tag: Any = None) -> None:
+        self.in_flight.append((self.executor.submit(_process_file, pdf_path), pdf_path, tag))
+
+    def collect(self, ordered: bool = False, timeout: Optional[float] = None) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Espera e devolve os resultados concluídos como pares (tag, resultado)
+
+        Com ordered=True espera o primeiro arquivo enviado, para que os
+        resultados saiam na ordem de envio; senão, o primeiro a terminar.
+        Depois de timeout segundos sem conclusão devolve uma lista vazia.
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+        from concurrent.futures.process import BrokenProcessPool
+
+        if not self.in_flight:
+            return []
+        if ordered:
+            wait([self.in_flight[0][0]], timeout=timeout)
+            done = [self.in_flight[0]] if self.in_flight[0][0].done() else []
+        else:
+            finished, _ = wait([item[0] for item in self.in_flight], timeout=timeout,
+                               return_when=FIRST_COMPLETED)
+            done = [item for item in self.in_flight if item[0] in finished]
+
+        results = []
+        broken = []
+        for item in done:
+            self.in_flight.remove(item)
+            future, pdf_path, tag = item
+            try:
+                results.append((tag, future.result()))
+            except BrokenProcessPool:
+                broken.append((pdf_path, tag))
+            except Exception as e:
+                results.append((tag, {'file': pdf_path, 'success': False, 'error': str(e)}))
+
+        if broken:
+            # Arquivos em voo ainda não concluídos foram perdidos junto com o pool
+            self.executor.shutdown(wait=False)
+            self.executor = _create_executor(self.extractor_factory, self.workers)
+            lost = [(None, pdf_path, tag) for pdf_path, tag in broken] + list(self.in_flight)
+            self.in_flight.clear()
+            for future, pdf_path, tag in lost:
+                if future is not None and future.done() and future.exception() is None:
+                    self.in_flight.append((future, pdf_path, tag))
+                    continue
+                self.retries[pdf_path] = self.retries.get(pdf_path, 0) + 1
+                if self.retries[pdf_path] > MAX_RETRIES:
+                    results.append((tag, {'file': pdf_path, 'success': False,
+                                          'error': 'Processo worker encerrado inesperadamente'}))
+                else:
+                    self.submit(pdf_path, tag)
+        return results
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(extractor_factory: Callable[[], Any], pdf_paths: Iterable[str],
+              workers: Optional[int] = None, ordered: bool = False) -> Iterator[Dict[str, Any]]:
+    """Processa os arquivos em paralelo, gerando um resultado por arquivo
+
+    Por padrão os resultados saem na ordem de conclusão; com ordered=True
+    saem na ordem de entrada. No máximo workers * 4 arquivos ficam em voo,
+    o que mantém a memória constante mesmo em lotes com centenas de milhares
+    de arquivos. Quedas de worker são tratadas pelo ExtractionPool.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    pending = iter(pdf_paths)
+    pool = ExtractionPool(extractor_factory, workers)
+
+    def fill() -> None:
+        while len(pool) < max_in_flight:
+            pdf_path = next(pending, None)
+            if pdf_path is None:
+                break
+            pool.submit(pdf_path)
+
+    try:
+        fill()
+        while pool:
+            for _, result in pool.collect(ordered):
+                yield result
+            fill()
+    finally:
+        pool.close()
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], stream) -> Dict[str, int]:
+    """Escreve um registro JSON por linha, com flush a cada registro"""
+    totals = {'total': 0, 'success': 0, 'failed': 0}
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        stream.flush()
+        totals['total'] += 1
+        totals['success' if record.get('success') else 'failed'] += 1
+    return totals
+
+
+def _observed(records: Iterable[Dict[str, Any]], aggregator: MetricsAggregator) -> Iterator[Dict[str, Any]]:
+    for record in records:
+        aggregator.observe(record)
+        yield record
+
+
+def add_batch_arguments(parser) -> None:
+    """Adiciona as opções de lote ao parser de linha de comando"""
+    parser.add_argument('--batch', nargs='+', metavar='ENTRADA',
+                        help='Processa em lote diretórios, padrões glob ou manifestos (saída NDJSON)')
+    parser.add_argument('--ordered', action='store_true',
+                        help='No modo lote, emite os resultados na ordem de entrada')
+
+
+def run_batch_cli(extractor_factory: Callable[[], Any], args) -> None:
+    """Executa o modo lote a partir dos argumentos de linha de comando"""
+    # Com --from-text, diretórios são varridos em busca dos artefatos de texto
+    suffix = ARTIFACT_SUFFIX if getattr(args, 'from_text', False) else '.pdf'
+    records = run_batch(extractor_factory, collect_inputs(args.batch, suffix),
+                        workers=args.workers, ordered=args.ordered)
+
+    metrics_textfile = getattr(args, 'metrics_textfile', None)
+    aggregator = MetricsAggregator(metrics_textfile) if metrics_textfile else None
+    if aggregator is not None:
+        records = _observed(records, aggregator)
+
+    # Perfil dos padrões somado entre os documentos (retirado dos registros)
+    profile = {} if getattr(args, 'profile_patterns', False) else None
+    if profile is not None:
+        records = iter_profiled(records, profile)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            totals = write_ndjson(records, f)
+    else:
+        totals = write_ndjson(records, sys.stdout)
+
+    if aggregator is not None:
+        aggregator.flush()
+
+    if profile:
+        print(format_report(profile, documents=totals['total']), file=sys.stderr)
+
+    logger.info(f"Lote concluído: {totals['total']} arquivos, "
+                f"{totals['success']} com sucesso, {totals['failed']} com erro")
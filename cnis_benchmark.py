@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark por etapa dos extratores CNIS
+Mede decodificação do PDF, dados pessoais, divisão em seções, extração de cada
+seção e serialização nas três classes de extrator, sobre um corpus sintético
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import importlib
+import subprocess
+import tracemalloc
+from typing import Dict, List, Any, Optional
+import logging
+
+from cnis_artifacts import artifact_path_for, iter_artifact_pages
+from cnis_corpus import add_corpus_arguments, corpus_options, load_manifest, write_corpus
+from cnis_patterns import PATTERNS, format_report as format_pattern_report, using_patterns
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('decode', 'personal', 'split', 'sections', 'serialize')
+
+# Nome -> (módulo, classe, argumentos do construtor)
+EXTRACTORS = {
+    'simple_cnis_extractor': ('simple_cnis_extractor', 'CNISExtractorSimple', {'ocr': False}),
+    'python_cnis_extractor': ('python_cnis_extractor', 'CNISExtractor', {}),
+    'python_cnis_extractor_simple': ('python_cnis_extractor_simple', 'CNISExtractorSimple', {}),
+}
+
+
+def create_extractor(name: str, backend: Optional[str] = None):
+    module_name, class_name, kwargs = EXTRACTORS[name]
+    cls = getattr(importlib.import_module(module_name), class_name)
+    return cls(backend=backend, **kwargs)
+
+
+def decode(extractor, pdf_path: str, from_text: bool) -> str:
+    if from_text:
+        return ''.join(iter_artifact_pages(artifact_path_for(pdf_path)))
+    return extractor.extract_text_from_pdf(pdf_path)
+
+
+def run_document(extractor, pdf_path: str, from_text: bool, timings: Dict[str, float]) -> int:
+    """Processa um documento etapa por etapa, somando os tempos; retorna os vínculos"""
+    clock = time.perf_counter
+
+    start = clock()
+    text = decode(extractor, pdf_path, from_text)
+    decoded = clock()
+    personal = extractor.extract_personal_data(text)
+    personal_done = clock()
+    sections = extractor.split_into_employment_sections(text)
+    split_done = clock()
+    employments = []
+    for section in sections:
+        employment = extractor.extract_employment_from_section(section)
+        if employment and employment.get('empregador'):
+            employments.append(employment)
+    sections_done = clock()
+    json.dumps({'success': True, 'data': {'dados_pessoais': personal,
+                                          'vinculos_empregaticios': employments},
+                'text_length': len(text)}, ensure_ascii=False)
+    end = clock()
+
+    timings['decode'] += decoded - start
+    timings['personal'] += personal_done - decoded
+    timings['split'] += split_done - personal_done
+    timings['sections'] += sections_done - split_done
+    timings['serialize'] += end - sections_done
+    return len(employments)
+
+
+def measure_memory(extractor, paths: List[str], from_text: bool) -> int:
+    """Pico de memória alocada (tracemalloc) no documento mais exigente, em bytes"""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for path in paths:
+            tracemalloc.reset_peak()
+            run_document(extractor, path, from_text, dict.fromkeys(STAGES, 0.0))
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchmark_extractor(name: str, corpus_dir: str, manifest: Dict[str, Any], repeat: int,
+                        from_text: bool, backend: Optional[str] = None) -> Dict[str, Any]:
+    """Executa o corpus repeat vezes e guarda o menor tempo de cada etapa"""
+    extractor = create_extractor(name, backend)
+    documents = manifest['documents']
+    paths = [os.path.join(corpus_dir, doc['name']) for doc in documents]
+
+    best = dict.fromkeys(STAGES, float('inf'))
+    vinculos = 0
+    for _ in range(repeat):
+        timings = dict.fromkeys(STAGES, 0.0)
+        vinculos = sum(run_document(extractor, path, from_text, timings) for path in paths)
+        for stage in STAGES:
+            best[stage] = min(best[stage], timings[stage])
+
+    total = sum(best.values())
+    pages = sum(doc['pages'] for doc in documents)
+    return {
+        'stages': best,
+        'total': total,
+        'docs_per_s': len(documents) / total if total else 0.0,
+        'pages_per_s': pages / total if total else 0.0,
+        'vinculos': vinculos,
+        'peak_memory': measure_memory(extractor, paths, from_text),
+        'text_backend': 'artifact' if from_text else extractor.text_backend,
+    }
+
+
+def profile_patterns(name: str, corpus_dir: str, manifest: Dict[str, Any], from_text: bool,
+                     backend: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Uma passada extra pelo corpus com o perfil dos padrões habilitado
+
+    Fica fora das repetições cronometradas, já que a instrumentação tem custo.
+    Só entram os padrões chamados. Os padrões próprios dos extratores legados
+    são usados já compilados e ficam fora do perfil; deles só aparecem os dos
+    módulos compartilhados (remunerações).
+    """
+    extractor = create_extractor(name, backend)
+    paths = [os.path.join(corpus_dir, doc['name']) for doc in manifest['documents']]
+    patterns = PATTERNS.profiled()
+    with using_patterns(patterns):
+        timings = dict.fromkeys(STAGES, 0.0)
+        for path in paths:
+            run_document(extractor, path, from_text, timings)
+    profile = patterns.snapshot()
+    return {pattern: stats for pattern, stats in profile.items() if stats['calls']}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    corpus = report['corpus']
+    lines = [
+        f"commit {report['commit'] or '?'} | Python {report['python']} | "
+        f"{corpus['docs']} docs, {corpus['pages']} páginas, {corpus['vinculos']} vínculos/doc",
+        '',
+        f"{'extrator':<30}" + ''.join(f"{stage:>11}" for stage in STAGES)
+        + f"{'total':>11}{'docs/s':>10}{'pág/s':>10}{'pico KiB':>10}",
+    ]
+    for name, result in report['results'].items():
+        lines.append(
+            f"{name:<30}"
+            + ''.join(f"{result['stages'][stage] * 1000:>9.1f}ms" for stage in STAGES)
+            + f"{result['total'] * 1000:>9.1f}ms{result['docs_per_s']:>10.1f}"
+            f"{result['pages_per_s']:>10.1f}{result['peak_memory'] // 1024:>10}"
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Benchmark por etapa dos extratores CNIS')
+    parser.add_argument('--corpus', help='Diretório de corpus gerado por cnis_corpus.py '
+                                         '(padrão: gera um corpus temporário)')
+    parser.add_argument('--extractor', action='append', choices=sorted(EXTRACTORS),
+                        help='Extrator a medir (padrão: todos)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições (vale o menor tempo)')
+    parser.add_argument('--from-text', action='store_true',
+                        help='Lê os artefatos de texto em vez de decodificar os PDFs')
+    parser.add_argument('--backend', help='Biblioteca de PDF (padrão: a mais rápida instalada)')
+    parser.add_argument('--json', help='Grava o relatório em JSON para comparar entre commits')
+    parser.add_argument('--profile-patterns', action='store_true',
+                        help='Inclui o perfil das expressões regulares de cada extrator (passada extra)')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix='cnis-bench-') as tmp_dir:
+        corpus_dir = args.corpus
+        if corpus_dir is None:
+            corpus_dir = tmp_dir
+            write_corpus(corpus_dir, **corpus_options(args))
+        manifest = load_manifest(corpus_dir)
+
+        documents = manifest['documents']
+        from_text = args.from_text or not all(doc['pdf'] for doc in documents)
+        if from_text and not args.from_text:
+            logger.warning("Corpus sem PDFs: a etapa decode mede a leitura dos artefatos de texto")
+
+        results = {}
+        for name in args.extractor or list(EXTRACTORS):
+            results[name] = benchmark_extractor(name, corpus_dir, manifest, args.repeat,
+                                                from_text, args.backend)
+            if args.profile_patterns:
+                results[name]['patterns'] = profile_patterns(name, corpus_dir, manifest,
+                                                             from_text, args.backend)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'from_text': from_text,
+        'corpus': {
+            'docs': len(documents),
+            'pages': sum(doc['pages'] for doc in documents),
+            'vinculos': manifest['spec']['vinculos'] + manifest['spec']['agrupamentos'],
+            'spec': manifest['spec'],
+            'seed': manifest['seed'],
+        },
+        'results': results,
+    }
+
+    print(format_report(report))
+    for name, result in results.items():
+        if 'patterns' in result:
+            print(f"\n{name}\n" + format_pattern_report(result['patterns'], documents=len(documents)))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Relatório salvo em: {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
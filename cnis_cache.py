@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Cache de resultados do extrator CNIS
+Indexado pelo SHA-256 do PDF e pela versão das regras de extração, com remoção LRU por tamanho
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Diretório padrão, dentro do storage do Laravel
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / 'storage' / 'framework' / 'cache' / 'cnis'
+
+# Tamanho máximo padrão do cache (em bytes)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Ao estourar o limite, remove entradas até ficar nesta fração do máximo
+EVICTION_TARGET = 0.9
+
+_READ_CHUNK = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(_READ_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_buffer(data) -> str:
+    """Calcula o SHA-256 de um buffer em memória (bytes ou mmap), sem copiá-lo
+
+    Dá o mesmo resultado de hash_file para o mesmo conteúdo.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprint_files(paths: Iterable[str]) -> str:
+    """Gera a impressão digital da versão das regras a partir dos fontes do extrator"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """Cache em disco dos resultados de process_cnis
+
+    Cada entrada é um arquivo JSON gravado de forma atômica (arquivo
+    temporário + rename), então leituras concorrentes nunca veem escrita
+    parcial. O mtime da entrada marca o último acesso e orienta a remoção
+    LRU, feita sob flock exclusivo para ser segura entre vários workers
+    do PHP-FPM.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, version: str = '',
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.version = version
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.cache_dir / '.lock'
+        self.size_path = self.cache_dir / '.size'
+
+    def key_for(self, pdf_hash: str) -> str:
+        """Combina o hash do PDF com a versão das regras de extração"""
+        return f"{pdf_hash}-{self.version}" if self.version else pdf_hash
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    @contextmanager
+    def locked(self):
+        """Trava exclusiva entre processos para manutenção do cache"""
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna o resultado guardado ou None"""
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                result = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache ilegível ignorada ({path}): {e}")
+            return None
+
+        # Marca o acesso para a política LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Grava o resultado de forma atômica e aplica o limite de tamanho"""
+        path = self.entry_path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            # A entrada substituída sai do total: o tamanho dela é lido sob a
+            # mesma trava que troca o arquivo e atualiza o contador
+            with self.locked():
+                try:
+                    replaced = os.stat(path).st_size
+                except FileNotFoundError:
+                    replaced = 0
+                total = self._read_size() - replaced + len(data)
+                os.replace(tmp_path, path)
+                if total > self.max_bytes:
+                    total = self._evict()
+                self._write_size(total)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _read_size(self) -> int:
+        try:
+            return int(self.size_path.read_text())
+        except (OSError, ValueError):
+            return self._scan_size()
+
+    def _write_size(self, total: int) -> None:
+        self.size_path.write_text(str(total))
+
+    def _entries(self):
+        for subdir in os.scandir(self.cache_dir):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.json'):
+                    yield entry
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self) -> int:
+        """Remove as entradas menos usadas recentemente (chamar com a trava)"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        logger.info(f"Cache CNIS: {removed} entradas removidas, {total} bytes em uso")
+        return total
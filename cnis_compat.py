@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Camada de compatibilidade entre o modelo de dados e os formatos JSON existentes
+simple_cnis_extractor.py emite client_name/client_cpf, data_fim vazia para
+vínculos ativos e a última remuneração em reais (o salário gravado pelo
+Laravel); python_cnis_extractor*.py emitem dados_pessoais, salário, a
+competência da última remuneração e 'sem data fim'. Também lê a saída do
+extrator para os cálculos de linha de comando (cnis_tempo, cnis_salarios)
+"""
+
+import sys
+import json
+from typing import Dict, List, Any, Optional
+
+from cnis_models import ExtractionResult, PersonalData, Vinculo, format_date
+from cnis_remuneracoes import Remuneracoes, format_competencia, format_valor, month_index
+
+# data_fim dos vínculos ativos no formato legado
+SEM_DATA_FIM = 'sem data fim'
+
+# Chaves do modo lote que identificam o documento, repetidas na saída dos cálculos
+RECORD_KEYS = ('file', 'id')
+
+
+def vinculo_to_simple(vinculo: Vinculo) -> Dict[str, Any]:
+    """Vínculo no formato de simple_cnis_extractor.py"""
+    ultima = vinculo.ultima_centavos()
+    return {
+        'empregador': vinculo.empregador,
+        'cnpj': vinculo.cnpj,
+        'data_inicio': format_date(vinculo.inicio),
+        'data_fim': format_date(vinculo.fim),
+        'ultima_remuneracao': ultima / 100 if ultima is not None else None,
+        'remuneracoes': vinculo.remuneracoes.to_json(),
+    }
+
+
+def vinculo_to_legacy(vinculo: Vinculo) -> Dict[str, Any]:
+    """Vínculo no formato de python_cnis_extractor.py"""
+    ultima = vinculo.remuneracoes.ultima()
+    return {
+        'empregador': vinculo.empregador,
+        'cnpj': vinculo.cnpj,
+        'data_inicio': format_date(vinculo.inicio),
+        'data_fim': format_date(vinculo.fim) or SEM_DATA_FIM,
+        'salario': format_valor(ultima[1]) if ultima else '',
+        'ultima_remuneracao': (format_competencia(vinculo.ultima_remuneracao)
+                               if vinculo.ultima_remuneracao is not None else ''),
+        'remuneracoes': vinculo.remuneracoes.to_json(),
+    }
+
+
+def vinculo_from_json(data: Dict[str, Any]) -> Vinculo:
+    """Reconstrói o vínculo a partir de qualquer um dos dois formatos
+
+    Só a competência do formato legado ('MM/AAAA') volta para
+    ultima_remuneracao; o valor em reais do formato simples sai da série.
+    """
+    data_fim = data.get('data_fim')
+    ultima = data.get('ultima_remuneracao')
+    if not isinstance(ultima, str):
+        ultima = None
+    return Vinculo.from_fields(
+        data.get('empregador', ''),
+        data.get('cnpj', ''),
+        data.get('data_inicio'),
+        None if data_fim == SEM_DATA_FIM else data_fim,
+        Remuneracoes.from_json(data['remuneracoes']) if data.get('remuneracoes') else None,
+        month_index(int(ultima[:2]), int(ultima[3:])) if ultima else None,
+    )
+
+
+def personal_to_legacy(personal: PersonalData) -> Dict[str, str]:
+    """dados_pessoais com apenas os campos encontrados"""
+    data = {}
+    if personal.cpf:
+        data['cpf'] = personal.cpf
+    if personal.nome:
+        data['nome'] = personal.nome
+    if personal.data_nascimento is not None:
+        data['data_nascimento'] = format_date(personal.data_nascimento)
+    return data
+
+
+def result_to_simple(result: ExtractionResult) -> Dict[str, Any]:
+    """Resultado no formato de simple_cnis_extractor.py"""
+    return {
+        'success': True,
+        'data': {
+            'client_name': result.personal.nome or '',
+            'client_cpf': result.personal.cpf or '',
+            'vinculos_empregaticios': [vinculo_to_simple(vinculo) for vinculo in result.vinculos],
+        },
+        'text_length': result.text_length,
+        'backend': result.backend,
+        'ocr_pages': result.ocr_pages or [],
+        'skipped_pages': result.skipped_pages or [],
+    }
+
+
+def result_to_legacy(result: ExtractionResult) -> Dict[str, Any]:
+    """Resultado no formato de python_cnis_extractor.py"""
+    return {
+        'success': True,
+        'data': {
+            'dados_pessoais': personal_to_legacy(result.personal),
+            'vinculos_empregaticios': [vinculo_to_legacy(vinculo) for vinculo in result.vinculos],
+            'beneficios': [],
+        },
+        'text_length': result.text_length,
+        'backend': result.backend,
+    }
+
+
+def load_results(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Resultados do extrator lidos do arquivo (padrão: stdin)
+
+    Aceita um único JSON (modo arquivo) ou NDJSON (modo lote).
+    """
+    stream = open(path, 'r', encoding='utf-8') if path else sys.stdin
+    with stream:
+        content = stream.read()
+    try:
+        return [json.loads(content)]
+    except ValueError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def result_vinculos(record: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Vínculos de um resultado no formato simples (vazio quando a extração falhou)"""
+    return (record.get('data') or {}).get('vinculos_empregaticios') or []
+
+
+def with_record_keys(output: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    """Acrescenta à saída de um cálculo as chaves que identificam o documento no lote"""
+    for key in RECORD_KEYS:
+        if key in record:
+            output[key] = record[key]
+    return output
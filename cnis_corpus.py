@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Gerador de corpus sintético de CNIS
+Produz extratos realistas (texto por página e, com PyMuPDF instalado, PDFs) com
+quantidades configuráveis de vínculos, AGRUPAMENTOs, competências, nomes de
+empregador em várias linhas e quebras de página, para testes e benchmarks
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import importlib.util
+from typing import Dict, List, Any, Optional
+import logging
+
+from cnis_artifacts import TextArtifactWriter, artifact_path_for
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'corpus.json'
+
+DEFAULT_SPEC = {
+    'vinculos': 20,
+    'agrupamentos': 2,
+    'competencias': 24,
+    'multiline_ratio': 0.3,
+    'lines_per_page': 60,
+}
+
+_FIRST_NAMES = ('MARIA', 'JOSE', 'ANA', 'JOAO', 'ANTONIO', 'FRANCISCA', 'CARLOS', 'PAULO', 'LUCIA', 'RAIMUNDA')
+_SURNAMES = ('SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'RODRIGUES', 'FERREIRA', 'ALVES', 'PEREIRA', 'LIMA', 'GOMES')
+_COMPANY_WORDS = ('COMERCIO', 'INDUSTRIA', 'SERVICOS', 'TRANSPORTES', 'CONSTRUTORA', 'ALIMENTOS',
+                  'DISTRIBUIDORA', 'METALURGICA', 'TEXTIL', 'LOGISTICA', 'AGROPECUARIA', 'HOSPITALAR')
+_COMPANY_SUFFIXES = ('LTDA', 'S/A', 'EIRELI', 'ME', 'LTDA - EPP')
+
+_PAGE_HEADER = (
+    'INSS - Instituto Nacional do Seguro Social',
+    'CNIS - Cadastro Nacional de Informações Sociais',
+    'Extrato Previdenciário',
+)
+
+
+def _person_name(rng: random.Random) -> str:
+    return ' '.join([rng.choice(_FIRST_NAMES)] + rng.sample(_SURNAMES, 3))
+
+
+def _cnpj(rng: random.Random) -> str:
+    digits = f"{rng.randrange(10 ** 8):08d}"
+    return f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/0001-{rng.randrange(100):02d}"
+
+
+def _company_lines(rng: random.Random, multiline: bool) -> List[str]:
+    words = rng.sample(_COMPANY_WORDS, 4 if multiline else 2)
+    name = f"{rng.choice(_SURNAMES)} {' '.join(words)} {rng.choice(_COMPANY_SUFFIXES)}"
+    if not multiline:
+        return [name]
+    parts = name.split(' ')
+    cut = len(parts) // 2
+    return [' '.join(parts[:cut]), ' '.join(parts[cut:])]
+
+
+def _money(rng: random.Random) -> str:
+    cents = rng.randrange(100000, 2000000)
+    reais = f"{cents // 100:,}".replace(',', '.')
+    return f"{reais},{cents % 100:02d}"
+
+
+def generate_lines(vinculos: int = 20, agrupamentos: int = 2, competencias: int = 24,
+                   multiline_ratio: float = 0.3, seed: int = 0) -> List[str]:
+    """Linhas de um extrato CNIS sintético (sem cabeçalhos de página)"""
+    rng = random.Random(seed)
+    birth_year = rng.randrange(1950, 1985)
+    lines = [
+        'Identificação do Filiado',
+        f"NIT: {rng.randrange(10 ** 9, 10 ** 10)}.{rng.randrange(10)} "
+        f"CPF: {rng.randrange(1000):03d}.{rng.randrange(1000):03d}.{rng.randrange(1000):03d}-{rng.randrange(100):02d} "
+        f"Nome: {_person_name(rng)}",
+        f"Data de nascimento: {rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/{birth_year} "
+        f"Nome da mãe: {_person_name(rng)}",
+        'Relações Previdenciárias',
+        'Seq. NIT Código Emp. Origem do Vínculo Data Início Data Fim Tipo Filiado no Vínculo Últ. Remun.',
+    ]
+
+    # Vínculos em ordem cronológica, sem sobreposição
+    month = (birth_year + 18) * 12
+    kinds = ['vinculo'] * vinculos + ['agrupamento'] * agrupamentos
+    rng.shuffle(kinds)
+    for seq, kind in enumerate(kinds, start=1):
+        start = month + rng.randrange(0, 6)
+        end = start + max(competencias, 1) - 1
+        month = end + 1
+        start_date = f"{rng.randrange(1, 29):02d}/{start % 12 + 1:02d}/{start // 12}"
+        end_date = f"{rng.randrange(1, 29):02d}/{end % 12 + 1:02d}/{end // 12}"
+        last = f"{end % 12 + 1:02d}/{end // 12}"
+
+        if kind == 'agrupamento':
+            lines.append(f"{seq} AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS\tContribuinte Individual")
+            lines.append(f"Contribuinte Individual {start_date} {end_date}")
+        else:
+            names = _company_lines(rng, rng.random() < multiline_ratio)
+            lines.append(f"{seq} {_cnpj(rng)} {names[0]}")
+            lines.extend(names[1:])
+            lines.append(f"Empregado ou Agente Público {start_date} {end_date} Últ. Remun. {last}")
+
+        lines.append('Competência Remuneração')
+        for offset in range(competencias):
+            competencia = start + offset
+            lines.append(f"{competencia % 12 + 1:02d}/{competencia // 12} {_money(rng)}")
+
+    lines.append('Valores Consolidados')
+    lines.append('Legenda')
+    lines.append('Indicadores: PREM-EXT - Remuneração informada fora do prazo')
+    return lines
+
+
+def paginate(lines: List[str], lines_per_page: int = 60) -> List[str]:
+    """Distribui as linhas em páginas com cabeçalho, como no extrato impresso
+
+    As quebras caem em qualquer ponto, inclusive no meio de um vínculo.
+    """
+    body = max(lines_per_page - len(_PAGE_HEADER) - 1, 1)
+    chunks = [lines[start:start + body] for start in range(0, len(lines), body)] or [[]]
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        header = list(_PAGE_HEADER) + [f"Página {number} de {len(chunks)}"]
+        pages.append('\n'.join(header + chunk) + '\n')
+    return pages
+
+
+def generate_document(seed: int = 0, **spec) -> List[str]:
+    """Páginas de texto de um extrato sintético"""
+    spec = {**DEFAULT_SPEC, **spec}
+    lines = generate_lines(spec['vinculos'], spec['agrupamentos'], spec['competencias'],
+                           spec['multiline_ratio'], seed=seed)
+    return paginate(lines, spec['lines_per_page'])
+
+
+def is_pdf_available() -> bool:
+    return importlib.util.find_spec('fitz') is not None
+
+
+def write_pdf(pages: List[str], path: str, fontsize: float = 7) -> None:
+    """Grava as páginas em um PDF A4 com camada de texto (requer PyMuPDF)"""
+    import fitz
+
+    with fitz.open() as doc:
+        for text in pages:
+            page = doc.new_page(width=595, height=842)
+            page.insert_text((36, 36), text, fontsize=fontsize)
+        doc.save(path)
+
+
+def write_text(pages: List[str], pdf_path: str) -> str:
+    """Grava as páginas como artefato de texto do PDF (lido com --from-text)"""
+    path = artifact_path_for(pdf_path)
+    writer = TextArtifactWriter(path, source=pdf_path)
+    for text in pages:
+        writer.write_page(text)
+    writer.commit('synthetic')
+    return path
+
+
+def write_corpus(out_dir: str, docs: int = 10, seed: int = 0, pdf: Optional[bool] = None,
+                 **spec) -> Dict[str, Any]:
+    """Gera o corpus em out_dir e grava o manifesto corpus.json"""
+    spec = {**DEFAULT_SPEC, **spec}
+    if pdf is None:
+        pdf = is_pdf_available()
+    os.makedirs(out_dir, exist_ok=True)
+
+    documents = []
+    for index in range(docs):
+        pages = generate_document(seed=seed + index, **spec)
+        name = f"cnis_{index:04d}.pdf"
+        pdf_path = os.path.join(out_dir, name)
+        write_text(pages, pdf_path)
+        if pdf:
+            write_pdf(pages, pdf_path)
+        documents.append({
+            'name': name,
+            'pages': len(pages),
+            'lines': sum(page.count('\n') for page in pages),
+            'vinculos': spec['vinculos'] + spec['agrupamentos'],
+            'pdf': bool(pdf),
+        })
+
+    manifest = {'spec': spec, 'seed': seed, 'documents': documents}
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(corpus_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(corpus_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    """Opções do corpus, compartilhadas com o benchmark"""
+    parser.add_argument('--docs', type=int, default=10, help='Número de documentos')
+    parser.add_argument('--vinculos', type=int, default=DEFAULT_SPEC['vinculos'],
+                        help='Vínculos com CNPJ por documento')
+    parser.add_argument('--agrupamentos', type=int, default=DEFAULT_SPEC['agrupamentos'],
+                        help='Blocos AGRUPAMENTO por documento')
+    parser.add_argument('--competencias', type=int, default=DEFAULT_SPEC['competencias'],
+                        help='Linhas de competência por vínculo')
+    parser.add_argument('--multiline-ratio', type=float, default=DEFAULT_SPEC['multiline_ratio'],
+                        help='Fração de empregadores com nome em duas linhas')
+    parser.add_argument('--lines-per-page', type=int, default=DEFAULT_SPEC['lines_per_page'],
+                        help='Linhas por página')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador')
+    parser.add_argument('--no-pdf', action='store_true', help='Gera apenas os artefatos de texto')
+
+
+def corpus_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        'docs': args.docs,
+        'seed': args.seed,
+        'pdf': False if args.no_pdf else None,
+        'vinculos': args.vinculos,
+        'agrupamentos': args.agrupamentos,
+        'competencias': args.competencias,
+        'multiline_ratio': args.multiline_ratio,
+        'lines_per_page': args.lines_per_page,
+    }
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Gerador de corpus sintético de CNIS')
+    parser.add_argument('out_dir', help='Diretório de saída')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    manifest = write_corpus(args.out_dir, **corpus_options(args))
+    documents = manifest['documents']
+    pages = sum(doc['pages'] for doc in documents)
+    kind = 'PDFs + texto' if documents and documents[0]['pdf'] else 'texto'
+    print(f"{len(documents)} documentos ({pages} páginas, {kind}) em {args.out_dir}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
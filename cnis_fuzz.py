@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Entradas patológicas e aleatórias para os extratores CNIS
+Cada documento (casos de pior caso conhecidos para expressões regulares e
+extratos gerados com trechos aleatórios inseridos) passa pela extração de
+dados pessoais e de vínculos de cada extrator, que deve terminar dentro do
+orçamento de tempo por documento. Também confere, em textos curtos, que a
+busca do nome em tempo linear dá o mesmo resultado das expressões
+preguiçosas que substituiu.
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import importlib
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+import logging
+
+from cnis_corpus import generate_lines
+from cnis_scaling import EXTRACTORS, create_extractor
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo (s) de extração de um documento, por extrator
+DEFAULT_BUDGET = 1.0
+
+DEFAULT_SIZE = 100000
+
+# Trechos usados para montar os textos aleatórios
+PIECES = (
+    'A', 'b', 'ç', 'Õ', ' ', '   ', '\n', '\t', 'Data', 'data', 'DATA', 'Da', 'Nome', 'Nome: ', ': ',
+    '1', '.', '/', '-', 'NIT 1.2 ', 'CPF 123.456.789-00 ', 'x', '01/2000', '12/12/2012',
+    '12.345.678/0001-90', 'AGRUPAMENTO', 'Seq.', 'Contribuinte Individual', 'Nascimento: ',
+)
+
+# Expressões de nome usadas antes da busca em tempo linear (referência)
+_NOME = r'([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data|$)'
+_CPF_NOME = r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*' + _NOME
+REFERENCE_FULL = re.compile(r'NIT[:\s]*[\d\.-]+\s+' + _CPF_NOME, re.IGNORECASE)
+REFERENCE_PATTERNS = [
+    re.compile(r'NIT[:\s]*[\d\.-]+\s+' + _CPF_NOME, re.MULTILINE | re.IGNORECASE),
+    re.compile(_CPF_NOME, re.MULTILINE | re.IGNORECASE),
+    re.compile(r'Nome[:\s]+' + _NOME, re.MULTILINE | re.IGNORECASE),
+]
+REFERENCE_LINE = re.compile(r'^([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ]+\s+[A-ZÁÊÇÕa-záêçõ\s]+)\s*$', re.MULTILINE | re.IGNORECASE)
+
+
+def worst_cases(size: int) -> Dict[str, str]:
+    """Textos que fazem expressões ambíguas retrocederem, com cerca de size caracteres"""
+    return {
+        'linha_espacos': 'JOAO' + ' ' * size + '1',
+        'linha_palavras': 'JOAO ' + 'SILVA ' * (size // 6) + '1',
+        'rotulo_espacos': 'Nome: JOAO' + ' ' * size + 'x1',
+        'rotulo_repetido': 'Nome ' * (size // 5) + '1',
+        'rotulo_dois_pontos': 'Nome: ' * (size // 6) + '1',
+        'rotulo_sem_data': 'Nome: ' + 'SILVA ' * (size // 6) + '1',
+        'cpf_repetido': 'CPF 123.456.789-00 Nome ' * (size // 24) + '1',
+        'nit_repetido': 'NIT 1.2 CPF 123.456.789-00 Nome ' * (size // 32) + '1',
+        'nit_digitos': 'NIT ' + '1' * size,
+        'datas_quebradas': 'Data ' + '1/' * (size // 2),
+        'maiusculas_linhas': '\n'.join(['AGRUPAMENTO DE CONTRATANTES'] * (size // 28)),
+        'sem_quebra': 'EMPRESA LTDA 12.345.678/0001-90 01/01/2000 ' * (size // 44),
+    }
+
+
+def random_text(rng: random.Random, pieces: int) -> str:
+    return ''.join(rng.choice(PIECES) for _ in range(pieces))
+
+
+def random_documents(count: int, seed: int, size: int) -> Iterator[Tuple[str, str]]:
+    """Extratos gerados com trechos aleatórios e sequências longas inseridas"""
+    rng = random.Random(seed)
+    for index in range(count):
+        lines = generate_lines(vinculos=rng.randint(1, 20), agrupamentos=rng.randint(0, 3), seed=seed + index)
+        for _ in range(rng.randint(1, 20)):
+            position = rng.randrange(len(lines) + 1)
+            if rng.random() < 0.2:
+                # Sequência longa de um único trecho
+                lines.insert(position, rng.choice(PIECES) * rng.randint(100, max(size // 10, 100)))
+            else:
+                lines.insert(position, random_text(rng, rng.randint(1, 40)))
+        yield f"aleatorio_{index}", '\n'.join(lines)
+
+
+def reference_name(pattern: re.Pattern, text: str) -> Optional[str]:
+    match = pattern.search(text)
+    return match.group(1) if match else None
+
+
+def check_name_search(count: int, seed: int) -> List[str]:
+    """Compara a busca do nome com as expressões de referência em textos curtos"""
+    from cnis_patterns import PATTERNS
+    from simple_cnis_extractor import PersonalDataScanner
+
+    scanner = PersonalDataScanner()
+    pairs = [(REFERENCE_FULL, PATTERNS[PersonalDataScanner.NOME_FULL_PATTERN], False)]
+    pairs += [(reference, PATTERNS[name], True)
+              for reference, name in zip(REFERENCE_PATTERNS, PersonalDataScanner.NOME_PATTERNS)]
+
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(count):
+        text = random_text(rng, rng.randint(1, 16))
+        for reference, pattern, multiline in pairs:
+            expected = reference_name(reference, text)
+            found = scanner.search_name(pattern, text, multiline)
+            if expected != found:
+                failures.append(f"{pattern.pattern[:30]}... {text!r}: {expected!r} != {found!r}")
+        line = text.strip()
+        expected = reference_name(REFERENCE_LINE, line)
+        match = PATTERNS['pessoais.nome_linha'].search(line)
+        if expected != (match.group(1) if match else None):
+            failures.append(f"nome_linha {line!r}: {expected!r}")
+    return failures
+
+
+def timed_extraction(extractor: Any, text: str) -> float:
+    """Tempo da extração completa (dados pessoais e vínculos) de um documento"""
+    start = time.perf_counter()
+    extractor.extract_personal_data(text)
+    extractor.extract_employment_data(text)
+    return time.perf_counter() - start
+
+
+def run_suite(size: int = DEFAULT_SIZE, documents: int = 20, seed: int = 0,
+              budget: float = DEFAULT_BUDGET, only: Optional[List[str]] = None,
+              progress: Optional[Callable[[str, str, float], None]] = None) -> List[Dict[str, Any]]:
+    """Extrai cada documento com cada extrator e devolve os que estouraram o orçamento"""
+    extractors = {name: create_extractor(name) for name in EXTRACTORS if not only or name in only}
+    cases = list(worst_cases(size).items()) + list(random_documents(documents, seed, size))
+    failures = []
+    for case, text in cases:
+        for name, extractor in extractors.items():
+            seconds = timed_extraction(extractor, text)
+            if progress is not None:
+                progress(name, case, seconds)
+            if seconds > budget:
+                failures.append({'extractor': name, 'case': case, 'chars': len(text), 'seconds': seconds})
+    return failures
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Entradas patológicas e aleatórias para os extratores CNIS')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help='Tamanho aproximado (caracteres) dos casos de pior caso')
+    parser.add_argument('--documents', type=int, default=20, help='Número de extratos aleatórios')
+    parser.add_argument('--seed', type=int, default=0, help='Semente dos textos aleatórios')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='Tempo máximo (s) por documento e extrator')
+    parser.add_argument('--names', type=int, default=100000,
+                        help='Textos curtos comparados com as expressões de referência (0 desativa)')
+    parser.add_argument('--extractor', action='append', choices=sorted(EXTRACTORS),
+                        help='Executa apenas este extrator (pode repetir)')
+    parser.add_argument('--verbose', action='store_true', help='Mostra o tempo de cada documento')
+    args = parser.parse_args()
+
+    # Os extratores configuram o logging ao serem importados
+    for module_name, _, _ in EXTRACTORS.values():
+        importlib.import_module(module_name)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    failed = False
+    if args.names:
+        mismatches = check_name_search(args.names, args.seed)
+        for mismatch in mismatches[:20]:
+            print(f"Nome divergente: {mismatch}", file=sys.stderr)
+        print(f"Busca do nome: {args.names} textos, {len(mismatches)} divergência(s)")
+        failed = bool(mismatches)
+
+    def progress(name: str, case: str, seconds: float) -> None:
+        if args.verbose:
+            print(f"{name:<15} {case:<22} {seconds * 1000:>10.1f}ms")
+
+    over_budget = run_suite(args.size, args.documents, args.seed, args.budget, args.extractor, progress)
+    for failure in over_budget:
+        print(f"Acima do orçamento: {failure['extractor']} {failure['case']} "
+              f"({failure['chars']} caracteres): {failure['seconds']:.2f}s > {args.budget:g}s", file=sys.stderr)
+    print(f"Orçamento de {args.budget:g}s por documento: {len(over_budget)} violação(ões)")
+
+    if failed or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
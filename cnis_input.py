@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Entrada do PDF em memória para o extrator CNIS
+Além de um caminho, o PDF pode chegar pelo stdin, por um descritor de arquivo
+herdado ou como mmap do arquivo armazenado; o hash do cache e os backends que
+leem de um objeto de arquivo (pypdf, pdfplumber) usam o próprio buffer. O
+PyMuPDF só aceita bytes (ver open_fitz_document)
+"""
+
+import os
+import sys
+import mmap
+import stat
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from cnis_cache import hash_buffer, hash_file
+
+
+class PdfInput:
+    """Conteúdo de um PDF já em memória
+
+    data é um mmap somente leitura (arquivo regular) ou os bytes lidos de um
+    pipe; name identifica a origem nos logs e no cabeçalho NDJSON; path é o
+    caminho do arquivo mapeado, quando conhecido.
+    """
+
+    __slots__ = ('data', 'name', 'path')
+
+    def __init__(self, data: Union[bytes, mmap.mmap], name: str, path: Optional[str] = None):
+        self.data = data
+        self.name = name
+        self.path = path
+
+    @classmethod
+    def from_fd(cls, fd: int, name: Optional[str] = None, path: Optional[str] = None) -> 'PdfInput':
+        """Mapeia o descritor quando é um arquivo regular; senão lê até o fim
+
+        O descritor continua aberto: o mmap mantém a sua própria referência
+        ao arquivo.
+        """
+        name = name or f"fd:{fd}"
+        info = os.fstat(fd)
+        if stat.S_ISREG(info.st_mode) and info.st_size > 0:
+            return cls(mmap.mmap(fd, 0, access=mmap.ACCESS_READ), name, path)
+        # Pipe ou socket: FileIO.readall cresce um único objeto bytes
+        with os.fdopen(fd, 'rb', buffering=0, closefd=False) as file:
+            return cls(file.read(), name, path)
+
+    @classmethod
+    def from_stdin(cls) -> 'PdfInput':
+        return cls.from_fd(sys.stdin.fileno(), '<stdin>')
+
+    @classmethod
+    def from_path(cls, path: str) -> 'PdfInput':
+        """mmap do arquivo armazenado"""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return cls.from_fd(fd, path, path)
+        finally:
+            os.close(fd)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def stream(self):
+        """Objeto de arquivo sobre o buffer, para bibliotecas que leem com seek/read
+
+        O mmap já é um objeto de arquivo (volta ao início a cada chamada);
+        io.BytesIO compartilha o buffer de um bytes até alguém escrever nele.
+        """
+        if isinstance(self.data, mmap.mmap):
+            self.data.seek(0)
+            return self.data
+        import io
+        return io.BytesIO(self.data)
+
+    def as_bytes(self) -> bytes:
+        """Conteúdo como bytes, para APIs que não aceitam outro buffer
+
+        Os bytes lidos de um pipe são devolvidos como estão; um mmap é
+        copiado por inteiro.
+        """
+        return self.data if isinstance(self.data, bytes) else self.data[:]
+
+    def digest(self) -> str:
+        """SHA-256 do conteúdo, calculado sobre o próprio buffer"""
+        return hash_buffer(self.data)
+
+
+# Caminho do PDF ou conteúdo já em memória
+PdfSource = Union[str, PdfInput]
+
+
+def source_digest(source: PdfSource) -> str:
+    """SHA-256 do PDF (o mesmo para o caminho e para o conteúdo em memória)"""
+    if isinstance(source, PdfInput):
+        return source.digest()
+    return hash_file(source)
+
+
+# Entrada em memória herdada pelos processos criados com fork
+_inherited: Optional[PdfInput] = None
+
+
+def can_share(source: PdfSource) -> bool:
+    """Indica se a origem pode ser repassada a um pool de processos
+
+    Caminhos são enviados às tarefas; o conteúdo em memória só é herdado
+    (sem ser serializado) quando os processos são criados com fork.
+    """
+    if not isinstance(source, PdfInput):
+        return True
+    import multiprocessing
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+@contextmanager
+def shared_with_workers(source: PdfSource) -> Iterator[Optional[str]]:
+    """Argumento a enviar às tarefas dos pools criados dentro do bloco
+
+    Para um caminho, o próprio caminho; para o conteúdo em memória, None: os
+    workers o recebem por herança do fork, e worker_source o recupera.
+    """
+    global _inherited
+    if not isinstance(source, PdfInput):
+        yield source
+        return
+    _inherited = source
+    try:
+        yield None
+    finally:
+        _inherited = None
+
+
+def worker_source(source: Optional[PdfSource]) -> PdfSource:
+    """Origem do PDF dentro de um worker (ver shared_with_workers)"""
+    if source is None:
+        if _inherited is None:
+            raise RuntimeError('PDF em memória indisponível no worker')
+        return _inherited
+    return source
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Extração das tabelas de vínculos pelas coordenadas das palavras
+As palavras de cada página (PyMuPDF ou pdfplumber) são agrupadas em linhas
+pela posição vertical e atribuídas às colunas da tabela "Relações
+Previdenciárias" pela posição horizontal, de forma vetorizada com NumPy;
+cada linha da tabela vira um vínculo direto, sem as heurísticas sobre o
+texto corrido (que continuam como alternativa quando a tabela não é achada)
+"""
+
+import importlib.util
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Sequence
+
+from cnis_backends import ROW_TOLERANCE, Word
+from cnis_models import Vinculo
+from cnis_patterns import active_patterns, register_pattern
+from cnis_remuneracoes import Remuneracoes, fim_da_competencia, month_index
+from cnis_tokenizer import LineToken, VINCULO, AGRUPAMENTO
+
+# Colunas da tabela e a primeira palavra do rótulo de cada uma no cabeçalho;
+# 'Data' aparece duas vezes (início e fim, da esquerda para a direita)
+COLUMN_LABELS = {'Seq.': 'seq', 'NIT': 'nit', 'Código': 'codigo', 'Origem': 'origem',
+                 'Matrícula': 'matricula', 'Tipo': 'tipo', 'Últ.': 'ultima'}
+DATE_COLUMNS = ('inicio', 'fim')
+REQUIRED_COLUMNS = frozenset(('seq', 'codigo', 'origem', 'inicio', 'fim'))
+
+# Colunas que podem continuar na linha seguinte (nome do empregador e tipo
+# de filiado quebrados em várias linhas dentro da célula)
+CONTINUATION_COLUMNS = frozenset(('origem', 'tipo'))
+
+# Na mesma linha, palavras separadas por menos que esta fração da altura
+# mediana formam uma frase (o conteúdo de uma célula): o espaço entre
+# palavras fica perto de 0.27, e entre células, mesmo duas datas vizinhas,
+# passa de 0.5
+WORD_GAP = 0.4
+
+# Padrões das células, lidos por active_patterns() em feed_row
+register_pattern('layout.seq', r'\d+')
+register_pattern('layout.codigo', r'\d{2}\.\d{3}\.\d{3}(?:/\d{4}-\d{2})?')
+register_pattern('layout.data', r'\d{2}/\d{2}/\d{4}')
+register_pattern('layout.ultima_remuneracao', r'(\d{2})/(\d{4})')
+register_pattern('layout.terminador', r'Valores Consolidados|Legenda|TOTAIS')
+
+
+def agrupamento_cnpj(lines: List[str]) -> str:
+    """CNPJ de um vínculo sem código de empregador (agrupamento de contratantes)
+
+    Vem das linhas de remuneração (contratante e tomador), como no caminho de
+    texto: o primeiro CNPJ completo, ou a raiz quando só ela aparece.
+    """
+    patterns = active_patterns()
+    for pattern in (patterns.tokenizer_cnpj_completo, patterns.tokenizer_cnpj):
+        for line in lines:
+            match = pattern.search(line)
+            if match:
+                return match.group(0)
+    return ''
+
+
+def is_layout_available() -> bool:
+    """Indica se o NumPy (agrupamento vetorizado das palavras) está instalado"""
+    return importlib.util.find_spec('numpy') is not None
+
+
+class Columns:
+    """Colunas da tabela: limites entre colunas vizinhas e nome de cada coluna
+
+    Os valores ficam centralizados sob o rótulo (e podem começar antes
+    dele), então o limite entre duas colunas é o ponto médio entre o fim
+    de um rótulo e o início do seguinte, e cada palavra vai para a coluna
+    do seu centro.
+    """
+
+    __slots__ = ('bounds', 'names')
+
+    def __init__(self, bounds, names: List[str]):
+        self.bounds = bounds
+        self.names = names
+
+    @classmethod
+    def from_header(cls, words: Sequence[Word]) -> Optional['Columns']:
+        """Colunas a partir das palavras do cabeçalho, ou None se as palavras
+        não são o cabeçalho da tabela de vínculos
+
+        Cada rótulo vai da sua primeira palavra até a palavra anterior ao
+        rótulo seguinte.
+        """
+        import numpy as np
+
+        spans = {}
+        current = None
+        dates = iter(DATE_COLUMNS)
+        for word in sorted(words):
+            text = word[4]
+            name = COLUMN_LABELS.get(text)
+            if name is None and text == 'Data':
+                name = next(dates, None)
+            if name is None:
+                if current is not None:
+                    spans[current][1] = max(spans[current][1], word[2])
+                continue
+            current = None if name in spans else name
+            if current is not None:
+                spans[current] = [word[0], word[2]]
+        if not REQUIRED_COLUMNS <= spans.keys():
+            return None
+        names = sorted(spans, key=lambda name: spans[name][0])
+        bounds = [(spans[left][1] + spans[right][0]) / 2 for left, right in zip(names, names[1:])]
+        return cls(np.array(bounds), names)
+
+    def assign(self, center):
+        """Índice da coluna de cada palavra (vetorizado sobre os centros x)"""
+        import numpy as np
+
+        return np.searchsorted(self.bounds, center)
+
+
+def group_rows(words: Sequence[Word]) -> List[List[int]]:
+    """Agrupa as palavras em linhas, de cima para baixo
+
+    Cada linha é a lista dos índices das suas palavras, ordenados por x.
+    """
+    if not words:
+        return []
+    import numpy as np
+
+    boxes = np.array([word[:4] for word in words], dtype=float)
+    center = (boxes[:, 1] + boxes[:, 3]) / 2
+    tolerance = ROW_TOLERANCE * max(float(np.median(boxes[:, 3] - boxes[:, 1])), 1.0)
+
+    by_center = np.argsort(center, kind='stable')
+    breaks = np.diff(center[by_center]) > tolerance
+    row_of = np.empty(len(words), dtype=np.int64)
+    row_of[by_center] = np.concatenate(([0], np.cumsum(breaks)))
+
+    order = np.lexsort((boxes[:, 0], row_of))
+    bounds = np.flatnonzero(np.diff(row_of[order])) + 1
+    return [chunk.tolist() for chunk in np.split(order, bounds)]
+
+
+def is_adjacent(words: Sequence[Word], upper: List[int], lower: List[int]) -> bool:
+    """Indica se a linha upper está logo acima de lower (a menos de uma altura de linha)"""
+    if not upper:
+        return False
+    top = min(words[index][1] for index in lower)
+    bottom = max(words[index][3] for index in upper)
+    height = max(words[index][3] - words[index][1] for index in lower)
+    return top - bottom < height
+
+
+def phrase_centers(words: Sequence[Word], rows: List[List[int]]):
+    """Centro x da frase de cada palavra (vetorizado sobre a página)
+
+    Nomes longos ultrapassam o limite da coluna; atribuída pelo centro da
+    frase, a célula inteira fica na coluna do rótulo sob o qual está
+    centralizada.
+    """
+    import numpy as np
+
+    if not rows:
+        return np.empty(0)
+    order = np.concatenate(rows)
+    boxes = np.array([words[index][:4] for index in order], dtype=float)
+    gap = WORD_GAP * max(float(np.median(boxes[:, 3] - boxes[:, 1])), 1.0)
+    starts = np.zeros(len(order), dtype=bool)
+    starts[np.cumsum([0] + [len(row) for row in rows[:-1]])] = True
+    starts[1:] |= boxes[1:, 0] - boxes[:-1, 2] >= gap
+    first = np.flatnonzero(starts)
+    centers = (np.minimum.reduceat(boxes[:, 0], first) + np.maximum.reduceat(boxes[:, 2], first)) / 2
+    result = np.empty(len(words))
+    result[order] = centers[np.cumsum(starts) - 1]
+    return result
+
+
+class LayoutRow:
+    """Linha da tabela: texto completo e texto de cada coluna"""
+
+    __slots__ = ('text', 'cells')
+
+    def __init__(self, text: str, cells: dict):
+        self.text = text
+        self.cells = cells
+
+    @classmethod
+    def from_words(cls, text: str, words: Sequence[Word], indices: List[int],
+                   columns: Columns, assigned: List[int]) -> 'LayoutRow':
+        cells = {}
+        for index in indices:
+            name = columns.names[assigned[index]]
+            word = words[index][4]
+            cells[name] = f"{cells[name]} {word}" if name in cells else word
+        return cls(text, cells)
+
+    def cell(self, name: str) -> str:
+        return self.cells.get(name, '')
+
+
+class LayoutTableParser:
+    """Monta os vínculos a partir das palavras de cada página, em ordem
+
+    feed_page recebe as palavras de uma página; os vínculos concluídos
+    ficam disponíveis em drain e o último sai em finish. Antes do cabeçalho
+    da tabela as linhas são só texto. Até o primeiro vínculo ser aberto pelas colunas
+    (started), uma linha que o tokenizador reconhece como início de vínculo
+    marca failed: o cabeçalho era texto corrido, não uma tabela, e o
+    documento deve seguir pelo caminho do texto.
+    """
+
+    def __init__(self):
+        self.columns: Optional[Columns] = None
+        self.failed = False
+        self.started = False
+        self.completed: Deque[Vinculo] = deque()
+        self.current: Optional[dict] = None
+        # Ainda na linha do vínculo ou nas continuações do nome
+        self.in_name = False
+
+    def feed_page(self, words: Sequence[Word]) -> None:
+        """Processa as palavras de uma página
+
+        A coluna de cada palavra é calculada de uma vez para a página inteira
+        (e de novo apenas se a página trouxer outro cabeçalho da tabela).
+        """
+        rows = group_rows(words)
+        center = phrase_centers(words, rows)
+        assigned = self.columns.assign(center).tolist() if self.columns is not None else None
+        previous: List[int] = []
+        for indices in rows:
+            text = ' '.join(words[index][4] for index in indices)
+            header = None
+            if 'Seq.' in text:
+                # Rótulos em duas linhas ("Tipo Filiado no" / "Vínculo"): a
+                # linha logo acima entra no cabeçalho
+                above = previous if is_adjacent(words, previous, indices) else []
+                header = Columns.from_header([words[index] for index in above + indices])
+            previous = indices
+            if header is not None:
+                # O cabeçalho se repete a cada vínculo e nas páginas seguintes: o vínculo aberto continua
+                self.columns = header
+                assigned = header.assign(center).tolist()
+            elif assigned is not None:
+                self.feed_row(LayoutRow.from_words(text, words, indices, self.columns, assigned))
+            else:
+                self.check_unmatched(text)
+
+    def feed_row(self, row: LayoutRow) -> None:
+        patterns = active_patterns()
+        if patterns.paginas_cabecalho.match(row.text):
+            return
+        if patterns.layout_terminador.match(row.text):
+            self.close()
+            return
+
+        seq = row.cell('seq')
+        codigo = patterns.layout_codigo.search(row.cell('codigo'))
+        origem = row.cell('origem')
+        inicio = patterns.layout_data.search(row.cell('inicio'))
+        if patterns.layout_seq.fullmatch(seq) and origem and (codigo or inicio or origem.startswith('AGRUPAMENTO')):
+            self.close()
+            fim = patterns.layout_data.search(row.cell('fim'))
+            ultima = patterns.layout_ultima_remuneracao.search(row.cell('ultima'))
+            self.current = {
+                'nome': origem,
+                'cnpj': codigo.group(0) if codigo else '',
+                'inicio': inicio.group(0) if inicio else '',
+                'fim': fim.group(0) if fim else '',
+                'ultima': month_index(int(ultima.group(1)), int(ultima.group(2))) if ultima else None,
+                'linhas': [],
+            }
+            self.in_name = True
+            self.started = True
+        elif self.current is None:
+            self.check_unmatched(row.text)
+        elif self.in_name and origem and row.cells.keys() <= CONTINUATION_COLUMNS:
+            self.current['nome'] += ' ' + origem
+        else:
+            self.in_name = False
+            self.current['linhas'].append(row.text)
+
+    def check_unmatched(self, text: str) -> None:
+        """Marca failed se, antes do primeiro vínculo, a linha abre um vínculo no texto"""
+        if not self.started and not self.failed and LineToken(text).kind in (VINCULO, AGRUPAMENTO):
+            self.failed = True
+
+    def close(self) -> None:
+        """Conclui o vínculo aberto"""
+        current, self.current = self.current, None
+        self.in_name = False
+        if current is None:
+            return
+        cnpj = current['cnpj'] or agrupamento_cnpj(current['linhas'])
+        # Sem "Data Fim", o vínculo termina no mês da "Últ. Remun.", como no
+        # caminho de texto; só fica em aberto quando nenhuma das duas vem
+        fim = current['fim']
+        if not fim and current['ultima'] is not None:
+            fim = fim_da_competencia(current['ultima'])
+        self.completed.append(Vinculo.from_fields(
+            ' '.join(current['nome'].split()), cnpj, current['inicio'], fim,
+            Remuneracoes.from_lines(current['linhas']), current['ultima']
+        ))
+
+    def drain(self) -> Iterator[Vinculo]:
+        while self.completed:
+            yield self.completed.popleft()
+
+    def finish(self) -> Iterator[Vinculo]:
+        self.close()
+        yield from self.drain()
+
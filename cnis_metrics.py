@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Métricas do extrator CNIS
+Tempo de parede e de CPU, crescimento de memória por etapa e contadores por
+documento, com agregação em histogramas exportados no formato textfile do Prometheus
+"""
+
+import os
+import time
+import resource
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Limites dos histogramas de tempo (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Intervalo mínimo entre gravações do textfile (segundos)
+DEFAULT_WRITE_INTERVAL = 10.0
+
+
+def max_rss_kib() -> int:
+    """Pico de memória residente do processo (KiB no Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Metrics:
+    """Métricas de um documento
+
+    Os tempos são exclusivos: quando uma etapa consome outra (os geradores do
+    pipeline são encadeados), o tempo gasto na etapa interna é descontado da
+    externa. O crescimento do pico de memória residente é atribuído à etapa
+    que estava executando quando ele ocorreu.
+    """
+
+    __slots__ = ('stages', 'counters', '_stack', '_last_rss', '_start', '_start_cpu')
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self._stack: List[str] = []
+        self._last_rss = max_rss_kib()
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def _charge(self, name: str, wall: float, cpu: float) -> None:
+        rss = max_rss_kib()
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = [0.0, 0.0, 0]
+        stage[0] += wall
+        stage[1] += cpu
+        stage[2] += rss - self._last_rss
+        self._last_rss = rss
+
+    def _switch(self, push: Optional[str]) -> None:
+        """Encerra a medição da etapa corrente e passa para a próxima"""
+        now = time.perf_counter()
+        now_cpu = time.process_time()
+        if self._stack:
+            self._charge(self._stack[-1], now - self._start, now_cpu - self._start_cpu)
+        if push is None:
+            self._stack.pop()
+        else:
+            self._stack.append(push)
+        self._start = now
+        self._start_cpu = now_cpu
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mede um bloco de código como a etapa name"""
+        self._switch(name)
+        try:
+            yield
+        finally:
+            self._switch(None)
+
+    def timed(self, name: str, iterable: Iterable) -> Iterator:
+        """Atribui à etapa name o tempo gasto produzindo cada item do iterável"""
+        it = iter(iterable)
+        while True:
+            self._switch(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self._switch(None)
+            yield item
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Bloco 'metrics' do JSON de saída"""
+        stages = {
+            name: {'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3), 'rss_growth_kib': rss}
+            for name, (wall, cpu, rss) in self.stages.items()
+        }
+        return {
+            'stages': stages,
+            'wall_ms': round(sum(stage['wall_ms'] for stage in stages.values()), 3),
+            'cpu_ms': round(sum(stage['cpu_ms'] for stage in stages.values()), 3),
+            'peak_rss_kib': self._last_rss,
+            'counters': dict(self.counters),
+        }
+
+
+class MetricsAggregator:
+    """Agrega o bloco 'metrics' dos resultados e grava o textfile do Prometheus
+
+    Usado pelos modos lote e servidor, no processo principal; os resultados
+    chegam dos workers já com as métricas de cada documento.
+    """
+
+    def __init__(self, path: str, buckets=DEFAULT_BUCKETS, interval: float = DEFAULT_WRITE_INTERVAL):
+        self.path = path
+        self.buckets = tuple(buckets)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.documents: Dict[str, int] = {}
+        # etapa -> [contagem por limite, soma, quantidade]
+        self.histograms: Dict[str, list] = {}
+        self.cpu_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.peak_rss_kib = 0
+        self.last_write = 0.0
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def observe(self, result: Dict[str, Any]) -> None:
+        """Registra o resultado de um documento e regrava o textfile se passou o intervalo"""
+        status = 'success' if result.get('success') else 'error'
+        metrics = result.get('metrics') or {}
+        with self.lock:
+            self.documents[status] = self.documents.get(status, 0) + 1
+            if metrics:
+                self._observe('document', metrics['wall_ms'] / 1000)
+                for stage, values in metrics['stages'].items():
+                    self._observe(stage, values['wall_ms'] / 1000)
+                    self.cpu_seconds[stage] = self.cpu_seconds.get(stage, 0.0) + values['cpu_ms'] / 1000
+                for name, value in metrics['counters'].items():
+                    self.counters[name] = self.counters.get(name, 0) + value
+                self.peak_rss_kib = max(self.peak_rss_kib, metrics['peak_rss_kib'])
+
+            if time.monotonic() - self.last_write >= self.interval:
+                self._write()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._write()
+
+    def render(self) -> str:
+        lines = [
+            '# HELP cnis_documents_total Documentos processados pelo extrator CNIS',
+            '# TYPE cnis_documents_total counter',
+        ]
+        for status, value in sorted(self.documents.items()):
+            lines.append(f'cnis_documents_total{{status="{status}"}} {value}')
+
+        lines.append('# HELP cnis_stage_seconds Tempo de parede por etapa e documento')
+        lines.append('# TYPE cnis_stage_seconds histogram')
+        for stage, (counts, total, count) in sorted(self.histograms.items()):
+            for bound, value in zip(self.buckets, counts):
+                lines.append(f'cnis_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {value}')
+            lines.append(f'cnis_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'cnis_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'cnis_stage_seconds_count{{stage="{stage}"}} {count}')
+
+        lines.append('# HELP cnis_stage_cpu_seconds_total Tempo de CPU acumulado por etapa')
+        lines.append('# TYPE cnis_stage_cpu_seconds_total counter')
+        for stage, value in sorted(self.cpu_seconds.items()):
+            lines.append(f'cnis_stage_cpu_seconds_total{{stage="{stage}"}} {value:.6f}')
+
+        lines.append('# HELP cnis_events_total Contadores do extrator (páginas, linhas, seções, vínculos, fallbacks)')
+        lines.append('# TYPE cnis_events_total counter')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'cnis_events_total{{event="{name}"}} {value}')
+
+        lines.append('# HELP cnis_worker_peak_rss_bytes Maior pico de memória residente entre os workers')
+        lines.append('# TYPE cnis_worker_peak_rss_bytes gauge')
+        lines.append(f'cnis_worker_peak_rss_bytes {self.peak_rss_kib * 1024}')
+        return '\n'.join(lines) + '\n'
+
+    def _write(self) -> None:
+        """Grava o textfile de forma atômica (chamar com a trava)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.prom')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(self.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas em {self.path}: {e}")
+            return
+        self.last_write = time.monotonic()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Modelo de dados dos resultados do extrator CNIS
+Registros com __slots__ (sem dicionário por instância), datas convertidas uma
+única vez em ordinais e nomes de empregador internados; a serialização para
+os formatos JSON existentes fica em cnis_compat
+"""
+
+import sys
+import datetime
+from dataclasses import dataclass
+from typing import List, Iterator, Optional, Union
+
+from cnis_remuneracoes import Remuneracoes
+
+# Data do vínculo: ordinal (date.toordinal) quando válida, o texto original
+# quando não é uma data (ex.: '13/1990') ou None quando ausente
+DateValue = Union[int, str, None]
+
+
+def parse_date(text: Optional[str]) -> DateValue:
+    """Converte 'DD/MM/AAAA' em ordinal, preservando textos que não são datas"""
+    if not text:
+        return None
+    if len(text) == 10 and text[2] == '/' and text[5] == '/':
+        try:
+            return datetime.date(int(text[6:]), int(text[3:5]), int(text[:2])).toordinal()
+        except ValueError:
+            pass
+    return text
+
+
+def format_date(value: DateValue) -> str:
+    """Ordinal -> 'DD/MM/AAAA' (textos voltam como estavam, None como '')"""
+    if value is None:
+        return ''
+    if isinstance(value, int):
+        return datetime.date.fromordinal(value).strftime('%d/%m/%Y')
+    return value
+
+
+def intern_text(text: Optional[str]) -> Optional[str]:
+    """Interna nomes repetidos (o mesmo empregador aparece em muitos documentos)"""
+    return sys.intern(text) if text else text
+
+
+@dataclass
+class Competencia:
+    """Uma competência da série de remunerações"""
+
+    __slots__ = ('mes', 'centavos')
+
+    mes: int        # ano * 12 + mês - 1
+    centavos: int
+
+
+@dataclass
+class PersonalData:
+    """Dados pessoais do filiado"""
+
+    __slots__ = ('nome', 'cpf', 'data_nascimento')
+
+    nome: Optional[str]
+    cpf: Optional[str]
+    data_nascimento: DateValue
+
+    @classmethod
+    def from_fields(cls, nome: Optional[str] = None, cpf: Optional[str] = None,
+                    data_nascimento: Optional[str] = None) -> 'PersonalData':
+        return cls(nome, cpf, parse_date(data_nascimento))
+
+
+@dataclass
+class Vinculo:
+    """Vínculo empregatício (ou AGRUPAMENTO de contribuinte individual)
+
+    ultima_remuneracao é o índice do mês informado em "Últ. Remun.", quando
+    o extrator o lê.
+    """
+
+    __slots__ = ('empregador', 'cnpj', 'inicio', 'fim', 'remuneracoes', 'ultima_remuneracao')
+
+    empregador: str
+    cnpj: str
+    inicio: DateValue
+    fim: DateValue
+    remuneracoes: Remuneracoes
+    ultima_remuneracao: Optional[int]
+
+    @classmethod
+    def from_fields(cls, empregador: str, cnpj: str = '', data_inicio: Optional[str] = None,
+                    data_fim: Optional[str] = None, remuneracoes: Optional[Remuneracoes] = None,
+                    ultima_remuneracao: Optional[int] = None) -> 'Vinculo':
+        return cls(intern_text(empregador), intern_text(cnpj), parse_date(data_inicio), parse_date(data_fim),
+                   remuneracoes if remuneracoes is not None else Remuneracoes(), ultima_remuneracao)
+
+    @property
+    def aberto(self) -> bool:
+        """Vínculo sem data de fim"""
+        return self.fim is None
+
+    def competencias(self) -> Iterator[Competencia]:
+        for mes, centavos in self.remuneracoes:
+            yield Competencia(mes, centavos)
+
+    def ultima_centavos(self) -> Optional[int]:
+        """Valor da última remuneração: o da competência de "Últ. Remun." quando
+        ela está na série, senão o da última competência"""
+        if self.ultima_remuneracao is not None:
+            for mes, centavos in zip(reversed(self.remuneracoes.meses), reversed(self.remuneracoes.centavos)):
+                if mes == self.ultima_remuneracao:
+                    return centavos
+        ultima = self.remuneracoes.ultima()
+        return ultima[1] if ultima else None
+
+
+@dataclass
+class ExtractionResult:
+    """Resultado bem-sucedido da extração de um CNIS"""
+
+    __slots__ = ('personal', 'vinculos', 'text_length', 'backend', 'ocr_pages', 'skipped_pages')
+
+    personal: PersonalData
+    vinculos: List[Vinculo]
+    text_length: int
+    backend: Optional[str]
+    ocr_pages: Optional[List[int]]
+    skipped_pages: Optional[List[int]]
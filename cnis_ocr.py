@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+OCR seletivo para páginas digitalizadas do CNIS
+Só as páginas sem camada de texto são rasterizadas (PyMuPDF) e passam pelo Tesseract,
+em paralelo e com cache por hash da imagem da página
+"""
+
+import hashlib
+import importlib.util
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Deque, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+from cnis_cache import ResultCache
+from cnis_backends import open_fitz_document
+from cnis_input import PdfSource, can_share, shared_with_workers, worker_source
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Páginas com menos caracteres visíveis que isto são tratadas como digitalizadas
+MIN_TEXT_CHARS = 20
+
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_LANG = 'por'
+
+# Subdiretório do cache de resultados usado pelo texto das páginas OCR
+OCR_CACHE_SUBDIR = 'ocr'
+
+
+def is_ocr_available() -> bool:
+    """Indica se PyMuPDF (rasterização) e pytesseract estão instalados"""
+    return all(importlib.util.find_spec(module) is not None for module in ('fitz', 'pytesseract'))
+
+
+def needs_ocr(text: str) -> bool:
+    """Página sem camada de texto (ou só com ruído, como números de página)"""
+    return len(''.join(text.split())) < MIN_TEXT_CHARS
+
+
+def render_page(source: PdfSource, index: int, dpi: int) -> Tuple[int, int, bytes]:
+    """Rasteriza a página em tons de cinza: (largura, altura, pixels)"""
+    import fitz
+
+    with open_fitz_document(fitz, source) as doc:
+        pixmap = doc.load_page(index).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        return pixmap.width, pixmap.height, pixmap.samples
+
+
+def page_hash(width: int, height: int, pixels: bytes) -> str:
+    """Hash da imagem rasterizada, usado como chave do cache de OCR"""
+    digest = hashlib.sha256(f"{width}x{height}:".encode('ascii'))
+    digest.update(pixels)
+    return digest.hexdigest()
+
+
+def recognize(width: int, height: int, pixels: bytes, lang: str) -> str:
+    """Binariza a imagem (Otsu, se o OpenCV estiver instalado) e executa o Tesseract"""
+    import pytesseract
+    from PIL import Image
+
+    image = Image.frombytes('L', (width, height), pixels)
+    try:
+        import cv2
+        import numpy as np
+        gray = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width)
+        image = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    except ImportError:
+        # Sem OpenCV o Tesseract binariza internamente
+        pass
+
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def ocr_page(source: Optional[PdfSource], index: int, dpi: int = DEFAULT_OCR_DPI,
+             lang: str = DEFAULT_OCR_LANG, cache_dir: Optional[str] = None) -> str:
+    """Texto de uma página via OCR, consultando o cache pelo hash da imagem
+
+    Em um worker, source None é o PDF em memória herdado do processo pai.
+    """
+    width, height, pixels = render_page(worker_source(source), index, dpi)
+
+    cache = key = None
+    if cache_dir:
+        try:
+            cache = ResultCache(str(Path(cache_dir) / OCR_CACHE_SUBDIR), version=f"ocr-{lang}")
+            key = cache.key_for(page_hash(width, height, pixels))
+            cached = cache.get(key)
+            if cached is not None:
+                return cached['text']
+        except OSError as e:
+            logger.warning(f"Cache de OCR indisponível: {e}")
+            cache = None
+
+    text = recognize(width, height, pixels, lang)
+
+    if cache is not None:
+        try:
+            cache.set(key, {'text': text})
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar o OCR no cache: {e}")
+
+    return text
+
+
+class PageOCR:
+    """Substitui, no fluxo de páginas, o texto das páginas digitalizadas pelo OCR
+
+    As páginas com texto passam direto; as digitalizadas são enviadas a um
+    pool de processos (criado só na primeira página que precisar) e o fluxo
+    segura as páginas seguintes até o OCR terminar, preservando a ordem.
+    Com workers <= 1 o OCR roda no próprio processo, assim como para PDFs em
+    memória quando o sistema não cria processos com fork.
+    """
+
+    def __init__(self, dpi: int = DEFAULT_OCR_DPI, lang: str = DEFAULT_OCR_LANG,
+                 workers: int = 1, cache_dir: Optional[str] = None):
+        self.dpi = dpi
+        self.lang = lang
+        self.workers = workers
+        self.cache_dir = cache_dir
+
+    def iter_pages(self, source: PdfSource, pages: Iterable[Optional[str]],
+                   ocr_pages: Optional[List[int]] = None) -> Iterator[Optional[str]]:
+        """Repassa as páginas, trocando as digitalizadas pelo texto reconhecido
+
+        Os índices das páginas reconhecidas são acrescentados a ocr_pages;
+        páginas dispensadas (None) passam adiante sem OCR.
+        Se o OCR de uma página falhar, o texto original dela é mantido.
+        """
+        # Cada item: (OCR em andamento ou None, texto original da página)
+        pending: Deque[Tuple[Optional['Future'], str]] = deque()
+        in_process = self.workers <= 1 or not can_share(source)
+        executor = None
+        with shared_with_workers(source) as task_source:
+            try:
+                for index, text in enumerate(pages):
+                    future = None
+                    if text is not None and needs_ocr(text):
+                        if ocr_pages is not None:
+                            ocr_pages.append(index)
+                        if in_process:
+                            text = self.recognize_page(source, index, text)
+                        else:
+                            if executor is None:
+                                executor = self.create_executor()
+                            future = executor.submit(ocr_page, task_source, index, self.dpi,
+                                                     self.lang, self.cache_dir)
+                    pending.append((future, text))
+
+                    while pending and (pending[0][0] is None or pending[0][0].done()):
+                        yield self.page_text(*pending.popleft())
+
+                while pending:
+                    yield self.page_text(*pending.popleft())
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+    def create_executor(self) -> 'ProcessPoolExecutor':
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def recognize_page(self, source: PdfSource, index: int, text: str) -> str:
+        try:
+            return with_newline(ocr_page(source, index, self.dpi, self.lang, self.cache_dir))
+        except Exception as e:
+            logger.warning(f"OCR falhou na página {index + 1}: {e}")
+            return text
+
+    @staticmethod
+    def page_text(future: Optional['Future'], text: Optional[str]) -> Optional[str]:
+        if future is None:
+            return text
+        try:
+            return with_newline(future.result())
+        except Exception as e:
+            logger.warning(f"OCR falhou em uma página: {e}")
+            return text
+
+
+def with_newline(text: str) -> str:
+    return text if text.endswith('\n') else text + '\n'
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Saída NDJSON do extrator CNIS (--format ndjson)
+Um registro JSON compacto por linha no stdout: cabeçalho, um registro por
+vínculo assim que a sua seção é concluída e um trailer com contagens e
+métricas. Os logs ficam no stderr. Usa orjson quando instalado.
+"""
+
+import json
+from typing import Dict, Any, BinaryIO, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Versão do formato dos registros (muda apenas com alterações incompatíveis)
+FORMAT_VERSION = 1
+
+SERIALIZER = 'orjson' if orjson is not None else 'json'
+
+
+def dumps(record: Dict[str, Any]) -> bytes:
+    """Serializa um registro em JSON compacto UTF-8 (sem quebra de linha)"""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class NDJSONWriter:
+    """Escreve os registros de um documento, liberando cada linha em seguida
+
+    Registros:
+        {"type": "header", "version", "file", "serializer"}
+        {"type": "vinculo", "index", ...campos do vínculo}
+        {"type": "trailer", "success", "vinculos", ...} com error quando
+        success é false; client_name, client_cpf, text_length, backend,
+        ocr_pages, skipped_pages e personal_source quando true; metrics
+        quando habilitadas.
+
+    Vínculos já emitidos continuam válidos apenas se o trailer indicar
+    success; sem trailer (processo interrompido) o documento falhou.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.vinculos = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.stream.write(dumps(record) + b'\n')
+        self.stream.flush()
+
+    def header(self, pdf_path: str) -> None:
+        self.write({
+            'type': 'header',
+            'version': FORMAT_VERSION,
+            'file': pdf_path,
+            'serializer': SERIALIZER,
+        })
+
+    def vinculo(self, vinculo: Dict[str, Any]) -> None:
+        self.write({'type': 'vinculo', 'index': self.vinculos, **vinculo})
+        self.vinculos += 1
+
+    def trailer(self, result: Dict[str, Any]) -> None:
+        """Fecha o documento a partir do resultado de process_cnis
+
+        Vínculos do resultado que não passaram pelo callback (resultado vindo
+        do cache) são emitidos aqui, antes do trailer.
+        """
+        success = bool(result.get('success'))
+        data = result.get('data') or {}
+        if success:
+            for vinculo in (data.get('vinculos_empregaticios') or [])[self.vinculos:]:
+                self.vinculo(vinculo)
+
+        trailer = {'type': 'trailer', 'success': success, 'vinculos': self.vinculos}
+        if success:
+            trailer.update({
+                'client_name': data.get('client_name', ''),
+                'client_cpf': data.get('client_cpf', ''),
+                'text_length': result.get('text_length', 0),
+                'backend': result.get('backend'),
+                'ocr_pages': result.get('ocr_pages') or [],
+                'skipped_pages': result.get('skipped_pages') or [],
+                'personal_source': result.get('personal_source'),
+            })
+        else:
+            trailer['error'] = result.get('error', '')
+        metrics: Optional[Dict[str, Any]] = result.get('metrics')
+        if metrics is not None:
+            trailer['metrics'] = metrics
+        self.write(trailer)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Classificação de páginas do CNIS antes da extração completa do texto
+Pelo topo de cada página (lido com recorte, nos backends que o suportam)
+separa as que trazem a identificação do filiado ou as tabelas de vínculos
+das que o divisor de seções nunca usa: legendas, glossário de indicadores,
+valores consolidados e benefícios
+"""
+
+from typing import List
+
+from cnis_patterns import active_patterns, register_pattern
+from cnis_tokenizer import LineToken, CODIGO_EMP, VINCULO, AGRUPAMENTO, CNPJ, COMPETENCIA
+
+# Tipos de página
+IDENTIFICACAO = 'identificacao'
+VINCULOS = 'vinculos'
+LEGENDA = 'legenda'
+RESUMO = 'resumo'
+BENEFICIOS = 'beneficios'
+
+# Páginas cujo texto completo não é extraído
+SKIPPED_KINDS = frozenset((LEGENDA, RESUMO, BENEFICIOS))
+
+# Fração superior da página lida no recorte de classificação
+HEAD_FRACTION = 0.3
+
+# Linhas de conteúdo (após o cabeçalho repetido) examinadas no topo da página
+HEAD_LINES = 8
+
+# Linhas do que pertence a uma seção de vínculo: a página nunca é descartada
+_SECTION_KINDS = frozenset((CODIGO_EMP, VINCULO, AGRUPAMENTO, CNPJ, COMPETENCIA))
+
+# Padrões lidos por active_patterns() no uso (paginas_cabecalho...)
+register_pattern(
+    'paginas.cabecalho',
+    r'INSS\b|CNIS\b|Extrato Previdenciário|Instituto Nacional|Cadastro Nacional|Página\s+\d+\s+de\s*\d+'
+)
+# Repetidos no topo de toda página do extrato, depois do cabeçalho: a data e
+# hora de emissão e o bloco de identificação do filiado
+register_pattern(
+    'paginas.repetidos',
+    r'\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}(?::\d{2})?\s*$'
+    r'|Identificação do Filiado|NIT[:\s]*\d|CPF[:\s]*\d|Data de nascimento|Nome da mãe'
+)
+register_pattern(
+    'paginas.identificacao',
+    r'Identificação do Filiado|NIT[:\s]*\d[\d\.-]*\s+CPF|CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome'
+)
+register_pattern(
+    'paginas.titulo',
+    r'(?P<legenda>Legenda|Indicadores)|(?P<resumo>Valores Consolidados|TOTAIS)|(?P<beneficios>Benefícios)'
+)
+
+
+def content_lines(head: str) -> List[str]:
+    """Linhas não vazias do topo da página, sem o cabeçalho, a data de emissão
+    e a identificação do filiado que o extrato repete em toda página"""
+    patterns = active_patterns()
+    header = patterns.paginas_cabecalho
+    repeated = patterns.paginas_repetidos
+    lines = []
+    for line in head.split('\n'):
+        line = line.strip()
+        if line and not header.match(line) and not repeated.match(line):
+            lines.append(line)
+            if len(lines) == HEAD_LINES:
+                break
+    return lines
+
+
+def classify_page(index: int, head: str) -> str:
+    """Tipo da página a partir do texto do seu topo
+
+    Só a primeira página é de identificação: as demais repetem o bloco do
+    filiado e são classificadas pelo que vem depois dele. Uma página só é de
+    legenda, resumo ou benefícios quando a primeira linha de conteúdo é o
+    título da parte e nenhuma das linhas examinadas abre ou continua uma
+    seção de vínculo. Páginas sem texto (digitalizadas) ficam como vínculos,
+    para que passem pelo OCR.
+    """
+    patterns = active_patterns()
+    if index == 0 and patterns.paginas_identificacao.search(head):
+        return IDENTIFICACAO
+    lines = content_lines(head)
+    if not lines:
+        return VINCULOS
+    match = patterns.paginas_titulo.match(lines[0])
+    if match is None:
+        return VINCULOS
+    if any(LineToken(line).kind in _SECTION_KINDS for line in lines):
+        return VINCULOS
+    return match.lastgroup
+
+
+def skip_page(index: int, head: str) -> bool:
+    """Indica se a extração completa da página pode ser dispensada
+
+    A primeira página é sempre lida: é onde fica o bloco de identificação.
+    """
+    return index > 0 and classify_page(index, head) in SKIPPED_KINDS
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Paridade entre as bibliotecas de PDF no extrato real (CNIS.pdf)
+Cada biblioteca instalada é lida pelo caminho por coordenadas (tabela) e pelo
+caminho de texto (--no-layout); todas precisam achar os mesmos vínculos, com
+CNPJ, o mesmo nome de empregador, as mesmas datas e a série completa de
+remunerações, e dispensar as mesmas páginas.
+O PyMuPDF, o padrão, quebra cada célula da tabela em uma linha própria e já
+fez o caminho de texto devolver zero vínculos sem que nada acusasse
+"""
+
+import os
+import sys
+import argparse
+from typing import Dict, List, Any
+import logging
+
+from cnis_backends import available_backends
+from simple_cnis_extractor import CNISExtractorSimple
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CNIS.pdf')
+
+# O que todo backend precisa extrair do CNIS.pdf
+EXPECTED_VINCULOS = 14
+
+# Competências somadas de todos os vínculos, incluindo as linhas de
+# contribuinte individual e agrupamento (contratante e tomador entre a
+# competência e o valor) e as que continuam na página seguinte
+EXPECTED_COMPETENCIAS = 307
+
+# Páginas dispensadas (índice a partir de 0): só a última, "Valores
+# Consolidados por Ano Civil"; as demais repetem a identificação do filiado
+# no topo e continuam a tabela de vínculos
+EXPECTED_SKIPPED = [10]
+
+# Campos de cada vínculo que todas as bibliotecas e caminhos precisam
+# devolver iguais ao primeiro resultado (a referência)
+COMPARED_FIELDS = ('empregador', 'data_inicio', 'data_fim')
+
+
+def extract(pdf_path: str, backend: str, layout: bool) -> Dict[str, Any]:
+    """Resultado do extrator simples com um backend e um caminho fixos"""
+    extractor = CNISExtractorSimple(backend=backend, ocr=False, layout=layout)
+    return extractor.process_cnis(pdf_path)
+
+
+def violations(result: Dict[str, Any]) -> List[str]:
+    """Divergências de um resultado em relação ao esperado"""
+    if not result.get('success'):
+        return [f"falhou: {result.get('error')}"]
+    problems = []
+    vinculos = result['data']['vinculos_empregaticios']
+    if len(vinculos) != EXPECTED_VINCULOS:
+        problems.append(f"{len(vinculos)} vínculo(s), esperado {EXPECTED_VINCULOS}")
+    competencias = sum(len(vinculo['remuneracoes']['competencias']) for vinculo in vinculos)
+    if competencias != EXPECTED_COMPETENCIAS:
+        problems.append(f"{competencias} competência(s), esperado {EXPECTED_COMPETENCIAS}")
+    for seq, vinculo in enumerate(vinculos, start=1):
+        if not vinculo['cnpj']:
+            problems.append(f"vínculo {seq} sem CNPJ")
+        if not vinculo['remuneracoes']['competencias']:
+            problems.append(f"vínculo {seq} sem remunerações")
+    if result.get('skipped_pages') != EXPECTED_SKIPPED:
+        problems.append(f"páginas dispensadas {result.get('skipped_pages')}, esperado {EXPECTED_SKIPPED}")
+    return problems
+
+
+def differences(result: Dict[str, Any], reference: Dict[str, Any]) -> List[str]:
+    """Vínculos cujos campos comparados divergem dos da referência"""
+    if not result.get('success') or not reference.get('success'):
+        return []
+    problems = []
+    pairs = zip(result['data']['vinculos_empregaticios'], reference['data']['vinculos_empregaticios'])
+    for seq, (vinculo, esperado) in enumerate(pairs, start=1):
+        for field in COMPARED_FIELDS:
+            if vinculo[field] != esperado[field]:
+                problems.append(f"vínculo {seq}: {field} {vinculo[field]!r}, referência {esperado[field]!r}")
+    return problems
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Compara o extrato de exemplo entre as bibliotecas de PDF')
+    parser.add_argument('pdf_path', nargs='?', default=SAMPLE_PDF, help='Extrato a comparar')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    backends = available_backends()
+    if not backends:
+        print('Nenhuma biblioteca de PDF instalada', file=sys.stderr)
+        sys.exit(1)
+
+    failed = False
+    reference = None
+    print(f"{'biblioteca':<12}{'caminho':<10}{'vínculos':>10}{'competências':>14}  dispensadas")
+    for backend in backends:
+        for layout in (True, False):
+            path = 'tabela' if layout else 'texto'
+            result = extract(args.pdf_path, backend, layout)
+            vinculos = result.get('data', {}).get('vinculos_empregaticios', [])
+            competencias = sum(len(vinculo['remuneracoes']['competencias']) for vinculo in vinculos)
+            print(f"{backend:<12}{path:<10}{len(vinculos):>10}{competencias:>14}  {result.get('skipped_pages')}")
+            if reference is None:
+                reference = result
+            for problem in violations(result) + differences(result, reference):
+                print(f"  {backend}/{path}: {problem}", file=sys.stderr)
+                failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
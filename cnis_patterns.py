@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Registro central das expressões regulares dos extratores CNIS
+Cada padrão é compilado uma única vez e registrado com um nome; num conjunto
+medido, cada chamada registra contagem, acertos e tempo acumulado, e o
+relatório ordena os padrões pelo custo total
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
+
+# Métodos de re.Pattern expostos pelos padrões registrados
+_METHODS = ('search', 'match', 'fullmatch', 'findall', 'finditer', 'sub', 'subn', 'split')
+
+
+class PatternStats:
+    """Contadores de um padrão: chamadas, chamadas com acerto e tempo (s)"""
+
+    __slots__ = ('calls', 'hits', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'calls': self.calls, 'hits': self.hits, 'seconds': self.seconds}
+
+
+def _is_hit(method: str, result: Any) -> bool:
+    if method in ('search', 'match', 'fullmatch'):
+        return result is not None
+    if method == 'split':
+        return len(result) > 1
+    if method == 'subn':
+        return result[1] > 0
+    return bool(result)
+
+
+def _profiled(pattern: re.Pattern, method: str, stats: PatternStats) -> Callable:
+    """Versão instrumentada de um método do padrão"""
+    clock = time.perf_counter
+
+    if method == 'sub':
+        # sub não informa se houve substituição: mede com subn
+        subn = pattern.subn
+
+        def call(*args, **kwargs):
+            start = clock()
+            result, count = subn(*args, **kwargs)
+            stats.seconds += clock() - start
+            stats.calls += 1
+            if count:
+                stats.hits += 1
+            return result
+        return call
+
+    target = getattr(pattern, method)
+    if method == 'finditer':
+        # Consome o iterador para que o tempo da busca seja contado
+        def call(*args, **kwargs):
+            start = clock()
+            result = list(target(*args, **kwargs))
+            stats.seconds += clock() - start
+            stats.calls += 1
+            if result:
+                stats.hits += 1
+            return iter(result)
+        return call
+
+    def call(*args, **kwargs):
+        start = clock()
+        result = target(*args, **kwargs)
+        stats.seconds += clock() - start
+        stats.calls += 1
+        if _is_hit(method, result):
+            stats.hits += 1
+        return result
+    return call
+
+
+class RegisteredPattern:
+    """Versão instrumentada de um padrão registrado, usada como um re.Pattern
+
+    Só existe nos conjuntos medidos (PatternRegistry.profiled): os métodos
+    (search, match, findall, sub...) são atributos que chamam os do padrão
+    compilado e acumulam contagem, acertos e tempo em stats.
+    """
+
+    __slots__ = ('name', 'compiled', 'stats') + _METHODS
+
+    def __init__(self, name: str, compiled: re.Pattern):
+        self.name = name
+        self.compiled = compiled
+        self.stats = PatternStats()
+        for method in _METHODS:
+            setattr(self, method, _profiled(compiled, method, self.stats))
+
+    @property
+    def pattern(self) -> str:
+        return self.compiled.pattern
+
+    @property
+    def flags(self) -> int:
+        return self.compiled.flags
+
+    def __repr__(self):
+        return f"RegisteredPattern({self.name!r}, {self.compiled!r})"
+
+
+def attribute_name(name: str) -> str:
+    """Nome do padrão como atributo de um PatternSet ('tokenizer.data' -> 'tokenizer_data')"""
+    return name.replace('.', '_')
+
+
+class PatternSet:
+    """Padrões registrados acessados por atributo (ver attribute_name)
+
+    O conjunto simples (PATTERNS.plain) devolve os próprios re.Pattern; um
+    conjunto medido (PATTERNS.profiled()) devolve versões instrumentadas com
+    contadores próprios. Cada atributo é resolvido no primeiro acesso e
+    guardado na instância, de modo que os acessos seguintes custam o mesmo
+    que ler uma constante do módulo.
+    """
+
+    def __init__(self, registry: 'PatternRegistry', profiled: bool):
+        self._registry = registry
+        self._wrappers: Optional[Dict[str, RegisteredPattern]] = {} if profiled else None
+
+    def __getattr__(self, attr: str):
+        name = self._registry.names.get(attr)
+        if name is None:
+            raise AttributeError(f"Padrão não registrado: {attr}")
+        return self[name]
+
+    def __getitem__(self, name: str):
+        """Padrão pelo nome registrado ('tokenizer.data')"""
+        compiled = self._registry.entries[name]
+        value = compiled
+        if self._wrappers is not None:
+            value = self._wrappers.get(name)
+            if value is None:
+                value = self._wrappers[name] = RegisteredPattern(name, compiled)
+        setattr(self, attribute_name(name), value)
+        return value
+
+    @property
+    def profiled(self) -> bool:
+        return self._wrappers is not None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Contadores de todos os padrões registrados, por nome (zerados nos não usados)"""
+        wrappers = self._wrappers or {}
+        return {
+            name: wrappers[name].stats.as_dict() if name in wrappers else PatternStats().as_dict()
+            for name in self._registry.entries
+        }
+
+
+class PatternRegistry:
+    """Padrões compilados por nome, com conjuntos medidos sob demanda
+
+    compile devolve o próprio re.Pattern e nada no registro é trocado depois.
+    Quem quer medir pede um conjunto novo com profiled() e o ativa com
+    using_patterns durante a sua chamada; o código que lê os padrões por
+    active_patterns() passa a usar as versões medidas só nesse contexto.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, re.Pattern] = {}
+        # Atributo do PatternSet -> nome registrado
+        self.names: Dict[str, str] = {}
+        self.plain = PatternSet(self, profiled=False)
+
+    def compile(self, name: str, pattern: str, flags: int = 0) -> re.Pattern:
+        """Compila e registra um padrão
+
+        Registrar de novo o mesmo nome com a mesma expressão reaproveita o
+        registro (ex.: os dois extratores legados compartilham padrões).
+        """
+        compiled = re.compile(pattern, flags)
+        entry = self.entries.get(name)
+        if entry is None:
+            attr = attribute_name(name)
+            if attr in self.names:
+                raise ValueError(f"Padrão '{name}' conflita com '{self.names[attr]}'")
+            self.entries[name] = entry = compiled
+            self.names[attr] = name
+        elif entry != compiled:
+            raise ValueError(f"Padrão '{name}' já registrado com outra expressão")
+        return entry
+
+    def profiled(self) -> PatternSet:
+        """Conjunto novo de versões medidas, com contadores zerados"""
+        return PatternSet(self, profiled=True)
+
+    def __getitem__(self, name: str) -> re.Pattern:
+        return self.entries[name]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# Registro usado por todos os módulos do extrator
+PATTERNS = PatternRegistry()
+
+# Conjunto lido por active_patterns(): o simples, salvo dentro de using_patterns
+_ACTIVE: 'ContextVar[PatternSet]' = ContextVar('cnis_patterns_active', default=PATTERNS.plain)
+
+
+def compile_pattern(name: str, pattern: str, flags: int = 0) -> re.Pattern:
+    """Compila e registra um padrão no registro global
+
+    A constante devolvida fica fora do perfil; o código medido registra com
+    register_pattern e lê o padrão com active_patterns() no momento do uso.
+    """
+    return PATTERNS.compile(name, pattern, flags)
+
+
+def register_pattern(name: str, pattern: str, flags: int = 0) -> str:
+    """Registra um padrão lido por active_patterns() e devolve o seu nome
+
+    O nome serve às listas de padrões ordenadas: active_patterns()[nome].
+    """
+    PATTERNS.compile(name, pattern, flags)
+    return name
+
+
+def active_patterns() -> PatternSet:
+    """Conjunto de padrões em uso no contexto atual (o simples, sem perfil)"""
+    return _ACTIVE.get()
+
+
+@contextmanager
+def using_patterns(patterns: PatternSet) -> Iterator[PatternSet]:
+    """Ativa um conjunto de padrões só dentro do bloco (e da thread ou tarefa atual)"""
+    token = _ACTIVE.set(patterns)
+    try:
+        yield patterns
+    finally:
+        _ACTIVE.reset(token)
+
+
+def merge_profiles(total: Dict[str, Dict[str, Any]], profile: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Soma o perfil de um documento ao total do lote (altera e devolve total)"""
+    for name, stats in profile.items():
+        entry = total.setdefault(name, {'calls': 0, 'hits': 0, 'seconds': 0.0})
+        entry['calls'] += stats['calls']
+        entry['hits'] += stats['hits']
+        entry['seconds'] += stats['seconds']
+    return total
+
+
+def rank_profile(profile: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Nomes dos padrões do mais para o menos custoso"""
+    return sorted(profile, key=lambda name: (-profile[name]['seconds'], -profile[name]['calls'], name))
+
+
+def format_report(profile: Dict[str, Dict[str, Any]], documents: Optional[int] = None) -> str:
+    """Relatório em texto: padrões ordenados por tempo acumulado, seguidos dos
+    que nunca casaram e dos que nunca foram chamados"""
+    names = rank_profile(profile)
+    total = sum(stats['seconds'] for stats in profile.values()) or 1.0
+    width = max([len(name) for name in names] + [6])
+
+    title = 'Perfil dos padrões'
+    if documents is not None:
+        title += f" ({documents} documento(s))"
+    lines = [
+        title,
+        f"{'padrão':<{width}} {'chamadas':>10} {'acertos':>10} {'taxa':>7} {'total ms':>10} {'%':>6} {'µs/chamada':>11}",
+    ]
+    for name in names:
+        stats = profile[name]
+        if not stats['calls']:
+            continue
+        rate = 100.0 * stats['hits'] / stats['calls']
+        lines.append(
+            f"{name:<{width}} {stats['calls']:>10} {stats['hits']:>10} {rate:>6.1f}% "
+            f"{stats['seconds'] * 1000:>10.3f} {100.0 * stats['seconds'] / total:>5.1f}% "
+            f"{stats['seconds'] * 1e6 / stats['calls']:>11.2f}"
+        )
+
+    never_matched = [name for name in names if profile[name]['calls'] and not profile[name]['hits']]
+    never_called = sorted(name for name in names if not profile[name]['calls'])
+    if never_matched:
+        lines.append('Nunca casaram: ' + ', '.join(never_matched))
+    if never_called:
+        lines.append('Nunca chamados: ' + ', '.join(never_called))
+    return '\n'.join(lines)
+
+
+def iter_profiled(records: Iterable[Dict[str, Any]], total: Dict[str, Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """Retira o perfil de cada resultado ('pattern_profile') e o soma ao total"""
+    for record in records:
+        profile = record.pop('pattern_profile', None)
+        if profile:
+            merge_profiles(total, profile)
+        yield record
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Série mensal de remunerações dos vínculos do CNIS
+Guarda competências e salários-de-contribuição em arrays tipados (int32 para o
+índice do mês, int64 para os centavos), convertendo os valores em lote
+"""
+
+import calendar
+from array import array
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from cnis_patterns import active_patterns, register_pattern
+
+# Valor no formato brasileiro (1.234,56); o salário dos extratos antigos pode
+# vir com uma só casa decimal (1.234,5)
+_VALOR = r'(\d{1,3}(?:\.\d{3})+,\d{1,2}|\d+,\d{1,2})(?![\d,])'
+
+# Entre a competência e o valor, as linhas de contribuinte individual e de
+# agrupamento trazem o contratante, o tomador (CNPJ) e a forma de prestação
+# ("11/2011 01.256.678/0001-00 01.256.678/0001-00 Normal 2.434,46")
+_ENTRE = r'(?:\s+(?:\d{2}\.\d{3}\.\d{3}(?:/\d{4}-\d{2})?|[^\W\d_]+(?:-[^\W\d_]+)*)){0,6}?'
+
+# Competência MM/AAAA seguida do valor, podendo haver várias colunas por linha
+# (os padrões são lidos por active_patterns() em iter_rows)
+register_pattern('remuneracoes.competencia_valor', r'(?<![\d/])(\d{2})/(\d{4})' + _ENTRE + r'\s+' + _VALOR)
+
+# Competência no fim da linha, sem valor: o valor vem no início da seguinte
+# (texto com uma célula por linha)
+register_pattern('remuneracoes.competencia_sem_valor', r'(?<![\d/])(\d{2})/(\d{4})' + _ENTRE + r'\s*$')
+register_pattern('remuneracoes.valor_inicio_linha', r'\s*' + _VALOR)
+
+# Remove separadores de milhar e a vírgula decimal: '1.234,56' -> '123456'
+_STRIP_SEPARATORS = str.maketrans('', '', '.,')
+
+
+def month_index(month: int, year: int) -> int:
+    """Índice do mês (ano * 12 + mês - 1), usado no array de competências"""
+    return year * 12 + month - 1
+
+
+def format_competencia(index: int) -> str:
+    """Índice do mês -> 'MM/AAAA'"""
+    return f"{index % 12 + 1:02d}/{index // 12}"
+
+
+def fim_da_competencia(index: int) -> str:
+    """Índice do mês -> último dia do mês em 'DD/MM/AAAA'"""
+    year, month = index // 12, index % 12 + 1
+    return f"{calendar.monthrange(year, month)[1]:02d}/{month:02d}/{year}"
+
+
+def format_valor(centavos: int) -> str:
+    """Centavos -> '1.234,56'"""
+    reais = f"{centavos // 100:,}".replace(',', '.')
+    return f"{reais},{centavos % 100:02d}"
+
+
+def parse_centavos(valores: List[str]) -> array:
+    """Converte valores '1.234,56' para centavos de uma só vez
+
+    Os valores precisam ter exatamente duas casas decimais (from_rows
+    completa os de uma casa): uma única tradução sobre o texto concatenado
+    remove os separadores e cada valor vira um inteiro, sem passar por float.
+    """
+    if not valores:
+        return array('q')
+    return array('q', map(int, '\n'.join(valores).translate(_STRIP_SEPARATORS).split('\n')))
+
+
+def iter_rows(lines: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """(mês, ano, valor) de cada competência encontrada nas linhas
+
+    Uma competência no fim da linha recebe o valor que abre a linha seguinte.
+    """
+    patterns = active_patterns()
+    remuneracao = patterns.remuneracoes_competencia_valor
+    competencia_pendente = patterns.remuneracoes_competencia_sem_valor
+    valor_inicio = patterns.remuneracoes_valor_inicio_linha
+    pending = None
+    for line in lines:
+        if pending is not None:
+            match = valor_inicio.match(line)
+            if match:
+                yield pending + (match.group(1),)
+            pending = None
+        if '/' not in line:
+            continue
+        if ',' in line:
+            yield from remuneracao.findall(line)
+        match = competencia_pendente.search(line)
+        if match:
+            pending = match.groups()
+
+
+class Remuneracoes:
+    """Competências e salários-de-contribuição de um vínculo"""
+
+    __slots__ = ('meses', 'centavos')
+
+    def __init__(self, meses: Optional[array] = None, centavos: Optional[array] = None):
+        self.meses = meses if meses is not None else array('i')
+        self.centavos = centavos if centavos is not None else array('q')
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str]]) -> 'Remuneracoes':
+        """Monta a série a partir de (mês, ano, valor), ignorando meses inválidos"""
+        meses = array('i')
+        valores = []
+        for month, year, valor in rows:
+            month = int(month)
+            if 1 <= month <= 12:
+                meses.append(month_index(month, int(year)))
+                valores.append(valor + '0' if valor[-2] == ',' else valor)
+        return cls(meses, parse_centavos(valores))
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> 'Remuneracoes':
+        return cls.from_rows(iter_rows(lines))
+
+    def __len__(self) -> int:
+        return len(self.meses)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.meses, self.centavos)
+
+    def ultima(self) -> Optional[Tuple[int, int]]:
+        """(índice do mês, centavos) da última competência"""
+        if not self.meses:
+            return None
+        return self.meses[-1], self.centavos[-1]
+
+    def to_json(self) -> Dict[str, List[Any]]:
+        return {
+            'competencias': [format_competencia(index) for index in self.meses],
+            'centavos': self.centavos.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, List[Any]]) -> 'Remuneracoes':
+        meses = array('i')
+        for competencia in data.get('competencias', []):
+            meses.append(month_index(int(competencia[:2]), int(competencia[3:])))
+        return cls(meses, array('q', data.get('centavos', [])))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Médias salariais a partir das séries de remunerações do CNIS
+Soma vínculos concomitantes por competência (limitada ao teto), aplica a tabela
+de correção monetária e calcula as médias (todos os salários, 80% maiores)
+com NumPy para um lote de clientes de uma vez
+"""
+
+import os
+import csv
+import json
+import argparse
+import functools
+from pathlib import Path
+from typing import Dict, Any, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from cnis_compat import load_results, result_vinculos, with_record_keys
+from cnis_remuneracoes import month_index
+
+logger = logging.getLogger(__name__)
+
+# Início do período básico de cálculo (competência 07/1994)
+PBC_INICIO = month_index(7, 1994)
+
+# Frações dos maiores salários calculadas por padrão (além da média de todos)
+DEFAULT_FRACOES = (0.8,)
+
+# Tabela de índices padrão, dentro do storage do Laravel
+DEFAULT_INDICES_PATH = Path(__file__).resolve().parent / 'storage' / 'app' / 'indices_correcao.csv'
+
+# Formato do CSV (separador ',' ou ';', decimais com '.' ou ','):
+#   competencia,fator,teto
+#   07/1994,7.123456,582.86
+# fator: multiplicador que leva o valor da competência à data do cálculo
+# teto: teto do salário-de-contribuição em reais (opcional)
+
+
+def _number(value: str) -> Optional[float]:
+    value = (value or '').strip()
+    if not value:
+        return None
+    if ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    return float(value)
+
+
+class TabelaIndices:
+    """Fatores de correção e tetos por competência, em arrays indexados pelo mês"""
+
+    __slots__ = ('base', 'fator', 'teto')
+
+    def __init__(self, base: int, fator: np.ndarray, teto: np.ndarray):
+        self.base = base
+        # NaN onde não há fator; -1 onde não há teto
+        self.fator = fator
+        self.teto = teto
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[int, Optional[float], Optional[float]]]) -> 'TabelaIndices':
+        """Monta a tabela a partir de (índice do mês, fator, teto em reais)"""
+        meses = [mes for mes, _, _ in rows]
+        base = min(meses) if meses else 0
+        size = max(meses) - base + 1 if meses else 0
+        fator = np.full(size, np.nan)
+        teto = np.full(size, -1, dtype=np.int64)
+        for mes, valor, limite in rows:
+            if valor is not None:
+                fator[mes - base] = valor
+            if limite is not None:
+                teto[mes - base] = round(limite * 100)
+        return cls(base, fator, teto)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'TabelaIndices':
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            sample = file.read(1024)
+            file.seek(0)
+            delimiter = ';' if sample.count(';') > sample.count(',') else ','
+            rows = []
+            for record in csv.DictReader(file, delimiter=delimiter):
+                competencia = record['competencia'].strip()
+                mes = month_index(int(competencia[:2]), int(competencia[3:]))
+                rows.append((mes, _number(record.get('fator')), _number(record.get('teto'))))
+        return cls.from_rows(rows)
+
+    def lookup(self, meses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Fator (NaN se ausente) e teto em centavos (-1 se ausente) de cada mês"""
+        index = meses - self.base
+        dentro = (index >= 0) & (index < len(self.fator))
+        safe = np.where(dentro, index, 0)
+        fator = np.where(dentro, self.fator[safe] if len(self.fator) else np.nan, np.nan)
+        teto = np.where(dentro, self.teto[safe] if len(self.teto) else -1, -1)
+        return fator, teto
+
+
+@functools.lru_cache(maxsize=4)
+def _load_indices(path: str, mtime: float) -> TabelaIndices:
+    logger.info(f"Tabela de índices carregada: {path}")
+    return TabelaIndices.from_csv(path)
+
+
+def carregar_indices(path: Optional[str] = None) -> TabelaIndices:
+    """Carrega a tabela uma única vez por processo (recarrega se o arquivo mudar)"""
+    path = str(path or DEFAULT_INDICES_PATH)
+    return _load_indices(path, os.path.getmtime(path))
+
+
+class MediasSalariais:
+    """Médias de um lote de clientes (arrays indexados pelo cliente)
+
+    contribuicoes: competências consideradas (após unir concomitantes)
+    media_total: média corrigida de todos os salários, em centavos
+    medias_maiores: {fração: média corrigida dos maiores salários}
+    meses_no_teto: competências limitadas ao teto
+    meses_sem_indice: competências sem fator de correção (usado fator 1)
+    """
+
+    __slots__ = ('contribuicoes', 'soma', 'media_total', 'medias_maiores',
+                 'meses_no_teto', 'meses_sem_indice')
+
+    def cliente(self, index: int) -> Dict[str, Any]:
+        """Resultado de um cliente em formato JSON (valores em centavos)"""
+        return {
+            'contribuicoes': int(self.contribuicoes[index]),
+            'soma_corrigida': int(round(self.soma[index])),
+            'media_total': int(round(self.media_total[index])),
+            **{
+                f"media_{round(fracao * 100)}_maiores": int(round(medias[index]))
+                for fracao, medias in self.medias_maiores.items()
+            },
+            'meses_no_teto': int(self.meses_no_teto[index]),
+            'meses_sem_indice': int(self.meses_sem_indice[index]),
+        }
+
+
+def calcular_lote(cliente: np.ndarray, mes: np.ndarray, centavos: np.ndarray, n_clientes: int,
+                  indices: Optional[TabelaIndices] = None, inicio: int = PBC_INICIO,
+                  fracoes: Sequence[float] = DEFAULT_FRACOES) -> MediasSalariais:
+    """Calcula as médias salariais de vários clientes em uma passada
+
+    cliente, mes, centavos: uma posição por competência de cada vínculo
+    (índice do cliente, índice do mês e valor em centavos). Competências
+    repetidas do mesmo cliente (vínculos concomitantes) são somadas e
+    limitadas ao teto antes da correção.
+    """
+    cliente = np.asarray(cliente, dtype=np.int64)
+    mes = np.asarray(mes, dtype=np.int64)
+    centavos = np.asarray(centavos, dtype=np.int64)
+
+    considerar = mes >= inicio
+    cliente, mes, centavos = cliente[considerar], mes[considerar], centavos[considerar]
+
+    # Une vínculos concomitantes: uma entrada por (cliente, mês), já ordenada
+    if len(mes):
+        base = mes.min()
+        largura = mes.max() - base + 1
+        chaves, posicao = np.unique(cliente * largura + (mes - base), return_inverse=True)
+        soma_mes = np.bincount(posicao, weights=centavos)
+        cliente = chaves // largura
+        mes = chaves % largura + base
+    else:
+        soma_mes = np.empty(0)
+
+    result = MediasSalariais()
+    if indices is not None:
+        fator, teto = indices.lookup(mes)
+        no_teto = (teto >= 0) & (soma_mes > teto)
+        soma_mes = np.where(no_teto, teto, soma_mes)
+        sem_indice = np.isnan(fator)
+        valores = soma_mes * np.where(sem_indice, 1.0, fator)
+    else:
+        no_teto = sem_indice = np.zeros(len(mes), dtype=bool)
+        valores = soma_mes.astype(np.float64)
+
+    result.meses_no_teto = np.bincount(cliente[no_teto], minlength=n_clientes)
+    result.meses_sem_indice = np.bincount(cliente[sem_indice], minlength=n_clientes)
+
+    contagem = np.bincount(cliente, minlength=n_clientes)
+    soma = np.bincount(cliente, weights=valores, minlength=n_clientes)
+    result.contribuicoes = contagem
+    result.soma = soma
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result.media_total = np.where(contagem > 0, soma / contagem, 0.0)
+
+    # Maiores salários: ordena por cliente e valor decrescente e fica com os
+    # primeiros k de cada cliente (k = fração arredondada para baixo, mínimo 1)
+    order = np.lexsort((-valores, cliente))
+    ordenado_cliente = cliente[order]
+    ordenado_valor = valores[order]
+    inicio_grupo = np.cumsum(contagem) - contagem
+    posicao = np.arange(len(order)) - inicio_grupo[ordenado_cliente]
+
+    result.medias_maiores = {}
+    for fracao in fracoes:
+        k = np.maximum(np.floor(contagem * fracao).astype(np.int64), np.minimum(contagem, 1))
+        manter = posicao < k[ordenado_cliente]
+        soma_k = np.bincount(ordenado_cliente[manter], weights=ordenado_valor[manter], minlength=n_clientes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result.medias_maiores[fracao] = np.where(k > 0, soma_k / k, 0.0)
+
+    return result
+
+
+def calcular_clientes(clientes: Sequence[Sequence[Dict[str, Any]]], indices: Optional[TabelaIndices] = None,
+                      inicio: int = PBC_INICIO, fracoes: Sequence[float] = DEFAULT_FRACOES) -> MediasSalariais:
+    """Calcula a partir das listas de vínculos do extrator (um item por cliente)
+
+    Usa a série 'remuneracoes' de cada vínculo ({competencias, centavos}).
+    """
+    cliente = []
+    meses = []
+    valores = []
+    for index, vinculos in enumerate(clientes):
+        for vinculo in vinculos:
+            serie = vinculo.get('remuneracoes') or {}
+            competencias = serie.get('competencias') or []
+            cliente.extend([index] * len(competencias))
+            meses.extend(month_index(int(competencia[:2]), int(competencia[3:])) for competencia in competencias)
+            valores.extend(serie.get('centavos') or [])
+    return calcular_lote(np.array(cliente, dtype=np.int64), np.array(meses, dtype=np.int64),
+                         np.array(valores, dtype=np.int64), len(clientes), indices, inicio, fracoes)
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Médias salariais a partir da saída do extrator CNIS')
+    parser.add_argument('input', nargs='?', help='JSON ou NDJSON do extrator (padrão: stdin)')
+    parser.add_argument('--indices', help='CSV com fator de correção e teto por competência '
+                                          '(padrão: storage/app/indices_correcao.csv, se existir)')
+    parser.add_argument('--sem-correcao', action='store_true', help='Não aplica correção nem teto')
+    args = parser.parse_args()
+
+    indices = None
+    if not args.sem_correcao:
+        if args.indices or DEFAULT_INDICES_PATH.exists():
+            indices = carregar_indices(args.indices)
+        else:
+            logger.warning("Tabela de índices não encontrada: médias sem correção e sem teto")
+
+    records = load_results(args.input)
+    result = calcular_clientes([result_vinculos(record) for record in records], indices)
+    for index, record in enumerate(records):
+        output = with_record_keys({'medias_salariais': result.cliente(index)}, record)
+        print(json.dumps(output, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
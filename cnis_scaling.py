@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Verificação de escala dos extratores CNIS
+Gera entradas de 1k, 10k e 100k linhas para cada cenário (muitos vínculos,
+histórico longo em um único vínculo, texto sem dados pessoais, linha que
+atravessa várias páginas), mede cada caminho de extração e falha quando o
+tempo cresce mais que linearmente com o tamanho da entrada
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+from typing import Dict, List, Any, Callable, Sequence, Tuple
+import logging
+
+from cnis_corpus import generate_lines
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Crescimento máximo aceito do tempo por linha entre dois tamanhos: um caminho
+# linear fica perto de 1; um quadrático cresce na mesma proporção da entrada
+DEFAULT_TOLERANCE = 2.0
+
+# Tempos abaixo disso são dominados por ruído e custos fixos
+MIN_SECONDS = 0.002
+
+# Nome -> (módulo, classe, argumentos do construtor)
+EXTRACTORS = {
+    'simple': ('simple_cnis_extractor', 'CNISExtractorSimple', {'ocr': False}),
+    'legado': ('python_cnis_extractor', 'CNISExtractor', {}),
+    'legado_simple': ('python_cnis_extractor_simple', 'CNISExtractorSimple', {}),
+}
+
+
+def muitos_vinculos(lines: int, seed: int = 0) -> str:
+    """Extrato com vínculos de 24 competências até somar o número de linhas"""
+    return '\n'.join(generate_lines(vinculos=max(lines // 28, 1), agrupamentos=0, seed=seed)[:lines])
+
+
+def historico_longo(lines: int, seed: int = 0) -> str:
+    """Um único AGRUPAMENTO com uma linha de pagamento por competência
+
+    Cada linha traz competência, data de pagamento (distinta por linha),
+    contribuição e salário, como nos extratos de contribuinte individual
+    com décadas de recolhimentos.
+    """
+    rng = random.Random(seed)
+    result = [
+        'Relações Previdenciárias',
+        '1 AGRUPAMENTO DE CONTRATANTES/COOPERATIVAS\tContribuinte Individual',
+        'Contribuinte Individual 01/01/1950',
+        'Competência Data Pgto. Contribuição Salário Contribuição',
+    ]
+    for index in range(lines - len(result) - 1):
+        month = index % 12 + 1
+        year = 1950 + (index // 12) % 70
+        day = (index // 840) % 28 + 1
+        salario = rng.randrange(100000, 2000000)
+        result.append(f"{month:02d}/{year} {day:02d}/{month:02d}/{year} "
+                      f"{salario // 500},{salario % 100:02d} {salario // 100},{salario % 100:02d}")
+    result.append('Valores Consolidados')
+    return '\n'.join(result)
+
+
+def sem_dados_pessoais(lines: int, seed: int = 0) -> str:
+    """Texto sem CPF, nome ou nascimento: a busca percorre o documento inteiro"""
+    rng = random.Random(seed)
+    words = ('REMUNERACAO', 'INDICADORES', 'PREM-EXT', 'Competência', 'Observação', 'Seq.', '12,50')
+    return '\n'.join(' '.join(rng.choice(words) for _ in range(6)) for _ in range(lines))
+
+
+def linha_entre_paginas(lines: int, seed: int = 0) -> List[str]:
+    """Trechos (páginas) sem quebra de linha: uma única linha atravessa todos"""
+    return ['NOME DA EMPRESA SEM QUEBRA DE LINHA ' for _ in range(lines)]
+
+
+SCENARIOS: Dict[str, Callable[[int, int], Any]] = {
+    'muitos_vinculos': muitos_vinculos,
+    'historico_longo': historico_longo,
+    'sem_dados_pessoais': sem_dados_pessoais,
+    'linha_entre_paginas': linha_entre_paginas,
+}
+
+
+def create_extractor(name: str):
+    module_name, class_name, kwargs = EXTRACTORS[name]
+    return getattr(importlib.import_module(module_name), class_name)(**kwargs)
+
+
+def targets() -> List[Tuple[str, str, Callable[[Any], Any]]]:
+    """(caminho, cenário, função) de cada medição"""
+    from cnis_tokenizer import iter_lines
+    from cnis_remuneracoes import Remuneracoes
+
+    result = []
+    for name in EXTRACTORS:
+        extractor = create_extractor(name)
+        for scenario in ('muitos_vinculos', 'historico_longo'):
+            result.append((f"{name}.vinculos", scenario, extractor.extract_employment_data))
+        result.append((f"{name}.pessoais", 'sem_dados_pessoais', extractor.extract_personal_data))
+    result.append(('remuneracoes', 'historico_longo', lambda text: Remuneracoes.from_lines(text.split('\n'))))
+    result.append(('linhas', 'linha_entre_paginas', lambda chunks: sum(1 for _ in iter_lines(chunks))))
+    return result
+
+
+def measure(function: Callable[[Any], Any], argument: Any, repeat: int) -> float:
+    """Menor tempo entre as repetições"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def growth_factors(sizes: Sequence[int], timings: Sequence[float]) -> List[float]:
+    """Crescimento do tempo por linha entre tamanhos consecutivos (1 = linear)"""
+    factors = []
+    for (size_a, time_a), (size_b, time_b) in zip(zip(sizes, timings), zip(sizes[1:], timings[1:])):
+        factors.append((time_b / max(time_a, MIN_SECONDS)) / (size_b / size_a))
+    return factors
+
+
+def run_checks(sizes: Sequence[int] = DEFAULT_SIZES, repeat: int = 3,
+               tolerance: float = DEFAULT_TOLERANCE, only: Sequence[str] = ()) -> List[Dict[str, Any]]:
+    """Mede todos os caminhos em todos os tamanhos e aplica o limite de crescimento"""
+    inputs = {}
+    results = []
+    for path, scenario, function in targets():
+        if only and not any(path.startswith(prefix) for prefix in only):
+            continue
+        timings = []
+        for size in sizes:
+            key = (scenario, size)
+            if key not in inputs:
+                inputs[key] = SCENARIOS[scenario](size)
+            timings.append(measure(function, inputs[key], repeat))
+        factors = growth_factors(sizes, timings)
+        results.append({
+            'path': path,
+            'scenario': scenario,
+            'seconds': dict(zip(sizes, timings)),
+            'growth': factors,
+            'ok': all(factor <= tolerance for factor in factors),
+        })
+    return results
+
+
+def format_report(results: List[Dict[str, Any]], sizes: Sequence[int], tolerance: float) -> str:
+    lines = [
+        f"{'caminho':<26}{'cenário':<22}"
+        + ''.join(f"{f'{size} linhas':>15}" for size in sizes)
+        + f"{'crescimento':>16}  (limite {tolerance:g})"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['path']:<26}{result['scenario']:<22}"
+            + ''.join(f"{result['seconds'][size] * 1000:>13.1f}ms" for size in sizes)
+            + f"{' '.join(f'{factor:.2f}' for factor in result['growth']):>16}"
+            + ('' if result['ok'] else '  FALHOU')
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Verifica que os extratores CNIS escalam linearmente')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Tamanhos de entrada em linhas (padrão: 1000 10000 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições (vale o menor tempo)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Crescimento máximo do tempo por linha entre dois tamanhos')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Mede apenas os caminhos com este prefixo (ex.: simple, legado.pessoais)')
+    parser.add_argument('--json', help='Grava os resultados em JSON')
+    args = parser.parse_args()
+
+    # Os extratores configuram o logging ao serem importados
+    for module_name, _, _ in EXTRACTORS.values():
+        importlib.import_module(module_name)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    sizes = sorted(args.sizes)
+    results = run_checks(sizes, args.repeat, args.tolerance, args.only)
+    print(format_report(results, sizes, args.tolerance))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'sizes': sizes, 'tolerance': args.tolerance, 'results': results}, f, indent=2)
+
+    failed = [result for result in results if not result['ok']]
+    if failed:
+        print(f"{len(failed)} caminho(s) com crescimento acima do linear", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
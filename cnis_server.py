@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Modo servidor do extrator CNIS
+Mantém um pool de processos aquecidos para evitar o custo de inicialização por documento
+"""
+
+import os
+import sys
+import json
+import signal
+import socketserver
+import threading
+import multiprocessing
+from typing import Dict, Any, Optional, Callable
+import logging
+
+from cnis_metrics import MetricsAggregator
+
+logger = logging.getLogger(__name__)
+
+# Extrator do processo worker (criado uma única vez por processo)
+_extractor = None
+
+
+def _init_worker(extractor_factory: Callable[[], Any]) -> None:
+    """Inicializa o extrator no processo worker"""
+    global _extractor
+    _extractor = extractor_factory()
+
+
+def _process_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Processa uma requisição no processo worker"""
+    pdf_path = request.get('pdf_path')
+    if not pdf_path:
+        result = {
+            'success': False,
+            'error': 'Requisição sem pdf_path'
+        }
+    elif not os.path.exists(pdf_path):
+        result = {
+            'success': False,
+            'error': f'Arquivo não encontrado - {pdf_path}'
+        }
+    else:
+        result = _extractor.process_cnis(pdf_path)
+
+    return {'id': request.get('id'), **result}
+
+
+def _parse_request(line: str) -> Dict[str, Any]:
+    """Decodifica uma linha JSON de requisição"""
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError('A requisição deve ser um objeto JSON')
+    return request
+
+
+def _error_response(request_id: Any, error: str) -> Dict[str, Any]:
+    """Monta a resposta de erro de uma requisição"""
+    return {
+        'id': request_id,
+        'success': False,
+        'error': error
+    }
+
+
+def _encode_response(response: Dict[str, Any]) -> bytes:
+    """Serializa uma resposta em uma única linha JSON"""
+    return (json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def create_pool(extractor_factory: Callable[[], Any], workers: Optional[int] = None,
+                max_tasks_per_worker: Optional[int] = None):
+    """Cria o pool de workers aquecidos
+
+    Usa fork quando disponível para que as bibliotecas de PDF já importadas
+    no processo pai sejam herdadas pelos workers.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    return context.Pool(
+        processes=workers or os.cpu_count() or 1,
+        initializer=_init_worker,
+        initargs=(extractor_factory,),
+        maxtasksperchild=max_tasks_per_worker
+    )
+
+
+def serve_stdio(pool, stdin=None, stdout=None,
+                on_response: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+    """Lê requisições JSON-lines do stdin e responde uma linha por requisição
+
+    As respostas saem na ordem de conclusão; use o campo "id" para correlacioná-las.
+    on_response, se informado, recebe cada resposta antes do envio.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout.buffer
+    write_lock = threading.Lock()
+
+    def write(response: Dict[str, Any]) -> None:
+        if on_response is not None:
+            on_response(response)
+        with write_lock:
+            stdout.write(_encode_response(response))
+            stdout.flush()
+
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = _parse_request(line)
+        except ValueError as e:
+            write(_error_response(None, f'Requisição inválida: {e}'))
+            continue
+
+        request_id = request.get('id')
+        pool.apply_async(
+            _process_request,
+            (request,),
+            callback=write,
+            error_callback=lambda e, request_id=request_id: write(_error_response(request_id, str(e)))
+        )
+
+    pool.close()
+    pool.join()
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    """Atende uma conexão: uma requisição JSON por linha, uma resposta por linha"""
+
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf-8').strip()
+            if not line:
+                continue
+
+            try:
+                request = _parse_request(line)
+            except ValueError as e:
+                response = _error_response(None, f'Requisição inválida: {e}')
+            else:
+                try:
+                    response = self.server.pool.apply(_process_request, (request,))
+                except Exception as e:
+                    response = _error_response(request.get('id'), str(e))
+
+            if self.server.on_response is not None:
+                self.server.on_response(response)
+
+            self.wfile.write(_encode_response(response))
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(pool, socket_path: str,
+                 on_response: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+    """Atende requisições JSON-lines em um socket Unix"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = _UnixServer(socket_path, _SocketHandler)
+    server.pool = pool
+    server.on_response = on_response
+    # Permite que o PHP-FPM (grupo www-data) se conecte ao socket
+    os.chmod(socket_path, 0o660)
+    # Encerra de forma limpa no stop do systemd, removendo o socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logger.info(f"Servidor CNIS escutando em {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        pool.terminate()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def serve(extractor_factory: Callable[[], Any], socket_path: Optional[str] = None,
+          workers: Optional[int] = None, max_tasks_per_worker: Optional[int] = None,
+          metrics_textfile: Optional[str] = None) -> None:
+    """Inicia o servidor no socket informado ou, sem socket, no stdin/stdout
+
+    Com metrics_textfile, as métricas das respostas são agregadas e gravadas
+    periodicamente nesse arquivo (formato textfile do Prometheus).
+    """
+    pool = create_pool(extractor_factory, workers, max_tasks_per_worker)
+    aggregator = MetricsAggregator(metrics_textfile) if metrics_textfile else None
+    on_response = aggregator.observe if aggregator is not None else None
+
+    try:
+        if socket_path:
+            serve_socket(pool, socket_path, on_response)
+        else:
+            serve_stdio(pool, on_response=on_response)
+    finally:
+        if aggregator is not None:
+            aggregator.flush()
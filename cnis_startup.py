@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Custo de inicialização dos extratores CNIS
+Cada ponto de entrada é importado em um interpretador novo, como na execução
+por documento chamada pelo Laravel: mede o tempo de importação e de criação
+do extrator, as bibliotecas pesadas já carregadas antes do primeiro
+documento e o pico de memória (RSS) ao fim da primeira chamada de
+process_cnis, e falha quando algum valor passa do orçamento
+"""
+
+import os
+import sys
+import json
+import tempfile
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Any, Optional, Tuple
+import logging
+
+from cnis_scaling import EXTRACTORS
+
+logger = logging.getLogger(__name__)
+
+# Orçamento por ponto de entrada: importação (ms, mediana) e RSS (MiB) ao fim
+# do primeiro process_cnis
+STARTUP_BUDGET = {
+    'simple': {'import_ms': 250.0, 'rss_mib': 120.0},
+    'legado': {'import_ms': 250.0, 'rss_mib': 120.0},
+    'legado_simple': {'import_ms': 250.0, 'rss_mib': 120.0},
+}
+
+# Bibliotecas que só podem ser carregadas no caminho que as usa (nunca na
+# importação ou na criação do extrator)
+HEAVY_MODULES = (
+    'multiprocessing', 'concurrent.futures', 'numpy', 'pandas', 'spacy', 'cv2',
+    'fitz', 'pytesseract', 'PIL', 'pdfplumber', 'PyPDF2', 'pypdf',
+)
+
+# Executado em um interpretador novo: o relógio começa antes de qualquer
+# importação além das feitas pelo próprio interpretador
+_CHILD = r'''
+import time
+start = time.perf_counter()
+import sys
+import importlib
+module_name, class_name, kwargs, pdf_path, heavy = sys.argv[1:6]
+module = importlib.import_module(module_name)
+imported = time.perf_counter()
+import ast
+extractor = getattr(module, class_name)(**ast.literal_eval(kwargs))
+created = time.perf_counter()
+loaded = [name for name in heavy.split(',') if name in sys.modules]
+first_call_ms = None
+success = None
+if pdf_path:
+    result = extractor.process_cnis(pdf_path)
+    first_call_ms = (time.perf_counter() - created) * 1000
+    success = bool(result.get('success'))
+import json
+import resource
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (created - imported) * 1000,
+    'first_call_ms': first_call_ms,
+    'success': success,
+    'rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_at_startup': loaded,
+}))
+'''
+
+
+def sample_document(out_dir: str) -> Tuple[str, bool]:
+    """Documento de exemplo do corpus sintético: (caminho do PDF, PDF gravado)
+
+    O artefato de texto é sempre gravado; o PDF só com PyMuPDF instalado.
+    """
+    from cnis_corpus import generate_document, is_pdf_available, write_pdf, write_text
+
+    pdf_path = os.path.join(out_dir, 'startup.pdf')
+    pages = generate_document(seed=0)
+    write_text(pages, pdf_path)
+    if not is_pdf_available():
+        return pdf_path, False
+    write_pdf(pages, pdf_path)
+    return pdf_path, True
+
+
+def measure_once(name: str, pdf_path: Optional[str], from_text: bool = False) -> Dict[str, Any]:
+    module_name, class_name, kwargs = EXTRACTORS[name]
+    if from_text:
+        kwargs = {**kwargs, 'from_text': True}
+    completed = subprocess.run(
+        [sys.executable, '-c', _CHILD, module_name, class_name, repr(kwargs),
+         pdf_path or '', ','.join(HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name}: {completed.stderr.strip().splitlines()[-1:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(name: str, pdf_path: Optional[str], repeat: int, from_text: bool = False) -> Dict[str, Any]:
+    """Mediana das medições de repeat interpretadores novos"""
+    runs = [measure_once(name, pdf_path, from_text) for _ in range(repeat)]
+    result = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ('import_ms', 'init_ms', 'rss_mib')
+    }
+    first_calls = [run['first_call_ms'] for run in runs if run['first_call_ms'] is not None]
+    result['first_call_ms'] = statistics.median(first_calls) if first_calls else None
+    result['success'] = all(run['success'] for run in runs) if first_calls else None
+    result['heavy_at_startup'] = sorted({module for run in runs for module in run['heavy_at_startup']})
+    return result
+
+
+def violations(name: str, result: Dict[str, Any]) -> List[str]:
+    """Itens do orçamento excedidos por um ponto de entrada"""
+    budget = STARTUP_BUDGET[name]
+    problems = []
+    if result['import_ms'] > budget['import_ms']:
+        problems.append(f"importação {result['import_ms']:.1f}ms > {budget['import_ms']:g}ms")
+    if result['first_call_ms'] is not None and result['rss_mib'] > budget['rss_mib']:
+        problems.append(f"RSS {result['rss_mib']:.1f}MiB > {budget['rss_mib']:g}MiB")
+    if result['heavy_at_startup']:
+        problems.append(f"carregados na inicialização: {', '.join(result['heavy_at_startup'])}")
+    if result['success'] is False:
+        problems.append('process_cnis falhou no documento de exemplo')
+    return problems
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Mede a inicialização dos extratores CNIS contra o orçamento')
+    parser.add_argument('--repeat', type=int, default=5, help='Interpretadores novos por ponto de entrada')
+    parser.add_argument('--extractor', action='append', choices=sorted(EXTRACTORS),
+                        help='Mede apenas este extrator (pode repetir)')
+    parser.add_argument('--json', help='Grava as medições em JSON')
+    args = parser.parse_args()
+
+    names = args.extractor or list(EXTRACTORS)
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        pdf_path, has_pdf = sample_document(out_dir)
+        for name in names:
+            if has_pdf:
+                results[name] = measure(name, pdf_path, args.repeat)
+            elif name == 'simple':
+                # Sem PyMuPDF para gravar o PDF, lê o artefato de texto (--from-text)
+                results[name] = measure(name, pdf_path, args.repeat, from_text=True)
+            else:
+                print(f"{name}: PyMuPDF indisponível, primeiro documento não medido", file=sys.stderr)
+                results[name] = measure(name, None, args.repeat)
+
+    print(f"{'extrator':<15}{'importação':>12}{'criação':>10}{'1º documento':>14}{'RSS':>10}")
+    failed = False
+    for name, result in results.items():
+        first_call = f"{result['first_call_ms']:.1f}ms" if result['first_call_ms'] is not None else '-'
+        print(f"{name:<15}{result['import_ms']:>10.1f}ms{result['init_ms']:>8.1f}ms"
+              f"{first_call:>14}{result['rss_mib']:>7.1f}MiB")
+        for problem in violations(name, result):
+            print(f"  {name}: {problem}", file=sys.stderr)
+            failed = True
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'budget': STARTUP_BUDGET, 'results': results}, f, indent=2)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
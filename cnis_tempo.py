@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Cálculo do tempo de contribuição a partir dos vínculos extraídos do CNIS
+Ordena os períodos, une os concomitantes e sobrepostos e totaliza por cliente e
+por ano com NumPy, em uma única passada vetorizada para lotes de clientes
+"""
+
+import json
+import argparse
+from typing import Dict, Any, Optional, Sequence, Union
+import logging
+
+import numpy as np
+
+from cnis_compat import load_results, result_vinculos, with_record_keys
+from cnis_remuneracoes import fim_da_competencia, month_index
+
+logger = logging.getLogger(__name__)
+
+# Convenção da contagem previdenciária: ano de 365 dias e mês de 30 dias
+DIAS_ANO = 365
+DIAS_MES = 30
+
+DateLike = Union[str, np.datetime64, None]
+
+
+def parse_datas(datas: Sequence[Optional[str]]) -> np.ndarray:
+    """Converte datas 'DD/MM/AAAA' em datetime64[D]; vazias ou inválidas viram NaT"""
+    iso = [f"{data[6:10]}-{data[3:5]}-{data[:2]}" if data and len(data) == 10 else 'NaT' for data in datas]
+    try:
+        return np.array(iso, dtype='datetime64[D]')
+    except ValueError:
+        # Alguma data impossível (ex.: 31/02): converte uma a uma
+        result = np.empty(len(iso), dtype='datetime64[D]')
+        for index, value in enumerate(iso):
+            try:
+                result[index] = np.datetime64(value, 'D')
+            except ValueError:
+                result[index] = np.datetime64('NaT')
+        return result
+
+
+def datas_invalidas(datas: Sequence[Optional[str]], convertidas: np.ndarray) -> np.ndarray:
+    """Máscara das datas preenchidas que não puderam ser convertidas (ex.: '13/1990')"""
+    preenchidas = np.array([bool(data and data.strip()) for data in datas], dtype=bool)
+    return preenchidas & np.isnat(convertidas)
+
+
+def reference_date(data_referencia: DateLike = None) -> np.datetime64:
+    """Data de referência em datetime64[D] (padrão: hoje); aceita 'DD/MM/AAAA' ou ISO"""
+    if data_referencia is None:
+        return np.datetime64('today', 'D')
+    if isinstance(data_referencia, str) and '/' in data_referencia:
+        return parse_datas([data_referencia])[0]
+    return np.datetime64(data_referencia, 'D')
+
+
+class TempoContribuicao:
+    """Tempo de contribuição de um lote de clientes
+
+    Arrays por cliente (índice = posição do cliente no lote): dias, anos,
+    meses, dias_restantes, vinculos_abertos e vinculos_invalidos. Períodos unidos, ordenados
+    por cliente e início: periodos_cliente, periodos_inicio e periodos_fim
+    (datetime64[D], fim inclusivo). Quebra anual em triplas ordenadas:
+    por_ano_cliente, por_ano e por_ano_dias.
+    """
+
+    __slots__ = (
+        'dias', 'anos', 'meses', 'dias_restantes', 'vinculos_abertos', 'vinculos_invalidos',
+        'periodos_cliente', 'periodos_inicio', 'periodos_fim',
+        'por_ano_cliente', 'por_ano', 'por_ano_dias',
+    )
+
+    def cliente(self, index: int) -> Dict[str, Any]:
+        """Resultado de um cliente em formato JSON"""
+        periodos = slice(*np.searchsorted(self.periodos_cliente, [index, index + 1]))
+        anos = slice(*np.searchsorted(self.por_ano_cliente, [index, index + 1]))
+        return {
+            'dias': int(self.dias[index]),
+            'anos': int(self.anos[index]),
+            'meses': int(self.meses[index]),
+            'dias_restantes': int(self.dias_restantes[index]),
+            'vinculos_abertos': int(self.vinculos_abertos[index]),
+            'vinculos_invalidos': int(self.vinculos_invalidos[index]),
+            'periodos': [
+                {'inicio': str(inicio), 'fim': str(fim)}
+                for inicio, fim in zip(self.periodos_inicio[periodos], self.periodos_fim[periodos])
+            ],
+            'por_ano': {
+                str(ano): int(dias) for ano, dias in zip(self.por_ano[anos], self.por_ano_dias[anos])
+            },
+        }
+
+
+def calcular_lote(cliente: np.ndarray, inicio: np.ndarray, fim: np.ndarray, n_clientes: int,
+                  data_referencia: DateLike = None, limite: Optional[np.ndarray] = None,
+                  invalido: Optional[np.ndarray] = None) -> TempoContribuicao:
+    """Calcula o tempo de contribuição de vários clientes em uma passada
+
+    cliente: índice do cliente de cada vínculo (0..n_clientes-1)
+    inicio, fim: datetime64[D] com as datas do vínculo (fim inclusivo);
+        fim NaT indica vínculo aberto, contado até a data de referência.
+    limite: datetime64[D] opcional com o último dia coberto pelo vínculo
+        (última competência); um vínculo aberto não passa dele.
+    invalido: máscara opcional dos vínculos com data ilegível; não entram
+        na contagem nem como abertos, só em vinculos_invalidos.
+    Os períodos são ordenados por (cliente, início) em O(n log n) e unidos
+    com um máximo acumulado do fim dentro de cada cliente, de modo que
+    vínculos concomitantes ou sobrepostos contam uma única vez.
+    """
+    ref = reference_date(data_referencia)
+    cliente = np.asarray(cliente, dtype=np.int64)
+    inicio = np.asarray(inicio, dtype='datetime64[D]')
+    fim = np.asarray(fim, dtype='datetime64[D]')
+
+    invalido = np.zeros(len(cliente), dtype=bool) if invalido is None else np.asarray(invalido, dtype=bool)
+
+    aberto = np.isnat(fim) & ~invalido
+    result = TempoContribuicao()
+    # Só conta como aberto o vínculo já iniciado na data de referência
+    iniciado = ~np.isnat(inicio) & (inicio <= ref)
+    result.vinculos_abertos = np.bincount(cliente[aberto & iniciado], minlength=n_clientes)
+    result.vinculos_invalidos = np.bincount(cliente[invalido], minlength=n_clientes)
+
+    # Vínculos abertos vão até a última competência, se houver, ou até a
+    # referência; nada é contado depois dela
+    fim_aberto = np.full(len(fim), ref)
+    if limite is not None:
+        limite = np.asarray(limite, dtype='datetime64[D]')
+        fim_aberto = np.where(np.isnat(limite), ref, limite)
+    fim = np.where(aberto, fim_aberto, fim)
+    fim = np.minimum(fim, ref)
+    valido = ~invalido & ~np.isnat(inicio) & (inicio <= fim)
+    cliente, inicio, fim = cliente[valido], inicio[valido], fim[valido]
+
+    # Dias desde a época, com fim exclusivo
+    start = inicio.astype(np.int64)
+    end = fim.astype(np.int64) + 1
+
+    order = np.lexsort((start, cliente))
+    cliente, start, end = cliente[order], start[order], end[order]
+
+    # Máximo acumulado do fim por cliente: o deslocamento por cliente impede
+    # que o fim de um cliente invada o grupo do seguinte
+    if len(start):
+        base = end.min()
+        span = end.max() - base + 1
+        running = np.maximum.accumulate(cliente * span + (end - base)) - cliente * span + base
+    else:
+        running = end
+
+    # Novo período quando muda o cliente ou o início passa do fim acumulado anterior
+    novo = np.ones(len(start), dtype=bool)
+    novo[1:] = (cliente[1:] != cliente[:-1]) | (start[1:] > running[:-1])
+    first = np.flatnonzero(novo)
+    last = np.append(first[1:] - 1, len(start) - 1) if len(first) else first
+
+    bloco_cliente = cliente[first]
+    bloco_start = start[first]
+    bloco_end = running[last]
+
+    dias = np.bincount(bloco_cliente, weights=bloco_end - bloco_start, minlength=n_clientes).astype(np.int64)
+    result.dias = dias
+    result.anos = dias // DIAS_ANO
+    result.meses = (dias % DIAS_ANO) // DIAS_MES
+    result.dias_restantes = (dias % DIAS_ANO) % DIAS_MES
+
+    result.periodos_cliente = bloco_cliente
+    result.periodos_inicio = bloco_start.astype('datetime64[D]')
+    result.periodos_fim = (bloco_end - 1).astype('datetime64[D]')
+
+    _quebra_anual(result, bloco_cliente, bloco_start, bloco_end)
+    return result
+
+
+def _quebra_anual(result: TempoContribuicao, bloco_cliente: np.ndarray,
+                  bloco_start: np.ndarray, bloco_end: np.ndarray) -> None:
+    """Distribui os dias de cada período pelos anos civis que ele cobre"""
+    ano_inicio = bloco_start.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64)
+    ano_fim = (bloco_end - 1).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64)
+    repeticoes = ano_fim - ano_inicio + 1
+
+    # Um segmento por (período, ano coberto)
+    bloco = np.repeat(np.arange(len(bloco_start)), repeticoes)
+    deslocamento = np.arange(len(bloco)) - np.repeat(np.cumsum(repeticoes) - repeticoes, repeticoes)
+    ano = ano_inicio[bloco] + deslocamento
+
+    inicio_ano = ano.astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    fim_ano = (ano + 1).astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+    dias = np.minimum(bloco_end[bloco], fim_ano) - np.maximum(bloco_start[bloco], inicio_ano)
+
+    # Soma por (cliente, ano); np.unique já devolve as chaves ordenadas
+    clientes = bloco_cliente[bloco]
+    if len(ano):
+        ano_base = ano.min()
+        chave = clientes * (ano.max() - ano_base + 1) + (ano - ano_base)
+        chaves, posicao = np.unique(chave, return_inverse=True)
+        result.por_ano_dias = np.bincount(posicao, weights=dias).astype(np.int64)
+        largura = ano.max() - ano_base + 1
+        result.por_ano_cliente = chaves // largura
+        result.por_ano = chaves % largura + ano_base + 1970
+    else:
+        result.por_ano_dias = result.por_ano_cliente = result.por_ano = np.empty(0, dtype=np.int64)
+
+
+def calcular_clientes(clientes: Sequence[Sequence[Dict[str, Any]]],
+                      data_referencia: DateLike = None) -> TempoContribuicao:
+    """Calcula a partir das listas de vínculos do extrator (um item por cliente)"""
+    cliente = []
+    inicios = []
+    fins = []
+    limites = []
+    for index, vinculos in enumerate(clientes):
+        for vinculo in vinculos:
+            cliente.append(index)
+            inicios.append(vinculo.get('data_inicio'))
+            fins.append(vinculo.get('data_fim'))
+            limites.append(ultima_competencia(vinculo))
+    inicio = parse_datas(inicios)
+    fim = parse_datas(fins)
+    invalido = datas_invalidas(inicios, inicio) | datas_invalidas(fins, fim)
+    return calcular_lote(np.array(cliente, dtype=np.int64), inicio, fim, len(clientes), data_referencia,
+                         parse_datas(limites), invalido)
+
+
+def ultima_competencia(vinculo: Dict[str, Any]) -> Optional[str]:
+    """Último dia da última competência com remuneração do vínculo ('DD/MM/AAAA')"""
+    competencias = (vinculo.get('remuneracoes') or {}).get('competencias') or []
+    meses = [month_index(int(competencia[:2]), int(competencia[3:])) for competencia in competencias
+             if len(competencia) == 7 and 1 <= int(competencia[:2]) <= 12]
+    return fim_da_competencia(max(meses)) if meses else None
+
+
+def tempo_de_contribuicao(vinculos: Sequence[Dict[str, Any]],
+                          data_referencia: DateLike = None) -> Dict[str, Any]:
+    """Tempo de contribuição de um único CNIS, em formato JSON"""
+    return calcular_clientes([vinculos], data_referencia).cliente(0)
+
+
+def main():
+    """Função principal para execução via linha de comando"""
+    parser = argparse.ArgumentParser(description='Tempo de contribuição a partir da saída do extrator CNIS')
+    parser.add_argument('input', nargs='?', help='JSON ou NDJSON do extrator (padrão: stdin)')
+    parser.add_argument('--data-referencia', help='Data de referência (DD/MM/AAAA, padrão: hoje)')
+    args = parser.parse_args()
+
+    records = load_results(args.input)
+    result = calcular_clientes([result_vinculos(record) for record in records], args.data_referencia)
+    for index, record in enumerate(records):
+        output = with_record_keys({'tempo_contribuicao': result.cliente(index)}, record)
+        print(json.dumps(output, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tokenizador de linhas do CNIS
+Classifica cada linha do documento uma única vez, guardando os grupos capturados
+para que o divisor de seções e a extração de vínculos não reavaliem os mesmos padrões
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from cnis_patterns import active_patterns, register_pattern
+
+# Tipos de token
+CODIGO_EMP = 'codigo_emp'      # Cabeçalho da tabela "Código Emp."
+VINCULO = 'vinculo'            # Código + CNPJ (+ nome do empregador)
+AGRUPAMENTO = 'agrupamento'    # Código + AGRUPAMENTO
+TERMINADOR = 'terminador'      # Fim da seção de vínculo
+CNPJ = 'cnpj'                  # Linha que começa com CNPJ isolado
+DATA = 'data'                  # Linha que começa com data completa
+COMPETENCIA = 'competencia'    # Linha que começa com MM/AAAA + valor
+NUMERADO = 'numerado'          # Código + texto (CNPJ pode vir na linha seguinte)
+PALAVRA_CHAVE = 'palavra_chave'
+VAZIA = 'vazia'
+TEXTO = 'texto'
+
+# Padrões do tokenizador: o código os lê por active_patterns() no momento do
+# uso (tokenizer_inicio_linha, tokenizer_cnpj...), para que entrem no perfil
+
+# Classificação pelo início da linha (alternativas mutuamente exclusivas)
+register_pattern(
+    'tokenizer.inicio_linha',
+    r'(?P<codigo_emp>Código Emp\.)'
+    # Na ordem visual (pdfplumber, PyMuPDF) o NIT do filiado vem entre o
+    # Seq. e o código do empregador
+    r'|\d+\s+(?:\d{3}\.\d{5}\.\d{2}-\d\s+)?'
+    r'(?P<vinculo>\d{2}\.\d{3}\.\d{3}(?:/\d{4}-\d{2})?)(?:\s+(?P<empregador>.+))?'
+    r'|\d+\s+(?:\d{3}\.\d{5}\.\d{2}-\d\s+)?(?P<agrupamento>AGRUPAMENTO(?P<agrupamento_resto>.+)?)'
+    r'|(?P<terminador>Valores Consolidados|Legenda|TOTAIS)'
+    r'|(?P<cnpj>\d{2}\.\d{3}\.\d{3})'
+    r'|(?P<data>\d{2}/\d{2}/\d{4})'
+    r'|(?P<competencia>\d{2}/\d{4})\s+(?P<valor>[\d\.,]+)'
+    r'|(?P<numerado>\d+\s+[A-Z])'
+)
+
+register_pattern('tokenizer.cnpj', r'\d{2}\.\d{3}\.\d{3}')
+register_pattern('tokenizer.cnpj_completo', r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}')
+register_pattern('tokenizer.data', r'\d{2}/\d{2}/\d{4}')
+# MM/AAAA avulso: não casa o mês/ano de dentro de uma data completa nem de um CNPJ
+register_pattern('tokenizer.mes_ano', r'(?<![\d/])\d{2}/\d{4}(?!\d)')
+register_pattern('tokenizer.maiusculas', r'[A-Z]{3,}')
+register_pattern('tokenizer.palavra_chave', r'Empregado|Contribuinte|Data|Início|Fim|Remuneração', re.IGNORECASE)
+register_pattern('tokenizer.nascimento', r'nascimento|nasc\.', re.IGNORECASE)
+register_pattern('tokenizer.data_nascimento', r'(Data de nascimento|Nascimento)[:\s]*(\d{2}/\d{2}/\d{4})', re.IGNORECASE)
+
+# Palavras-chave que interrompem a continuação do nome do empregador
+_SHORT_KEYWORDS = frozenset(('empregado', 'contribuinte', 'data'))
+
+
+class LineToken:
+    """Linha classificada do CNIS com os grupos capturados"""
+
+    __slots__ = (
+        'kind', 'text', 'cnpj', 'cnpj_full', 'header_cnpj', 'employer', 'valor',
+        'full_dates', 'month_years', 'starts_digit', 'upper_run',
+        'kw_long', 'kw_short', 'nasc', 'nasc_date'
+    )
+
+    def __init__(self, text: str):
+        self.text = text
+        self.header_cnpj = None
+        self.employer = None
+        self.valor = None
+        patterns = active_patterns()
+
+        match = patterns.tokenizer_inicio_linha.match(text)
+        group = match.lastgroup if match else None
+        if group == 'empregador' or group == 'vinculo':
+            self.kind = VINCULO
+            if match.group('empregador') is not None:
+                self.header_cnpj = match.group('vinculo')
+                self.employer = match.group('empregador')
+        elif group == 'agrupamento' or group == 'agrupamento_resto':
+            self.kind = AGRUPAMENTO
+            if match.group('agrupamento_resto') is not None:
+                self.employer = match.group('agrupamento')
+        elif group == 'valor':
+            self.kind = COMPETENCIA
+            self.valor = match.group('valor')
+        elif group is not None:
+            self.kind = group
+        else:
+            self.kind = None
+
+        cnpj_match = patterns.tokenizer_cnpj.search(text)
+        self.cnpj = cnpj_match.group(0) if cnpj_match else None
+        full_match = patterns.tokenizer_cnpj_completo.search(text) if cnpj_match else None
+        self.cnpj_full = full_match.group(0) if full_match else None
+
+        if '/' in text:
+            self.full_dates = patterns.tokenizer_data.findall(text)
+            self.month_years = patterns.tokenizer_mes_ano.findall(text)
+        else:
+            self.full_dates = self.month_years = ()
+
+        self.starts_digit = text[:1].isdecimal()
+        runs = patterns.tokenizer_maiusculas.findall(text)
+        self.upper_run = max(map(len, runs)) if runs else 0
+
+        keywords = patterns.tokenizer_palavra_chave.findall(text)
+        self.kw_long = bool(keywords)
+        self.kw_short = any(keyword.lower() in _SHORT_KEYWORDS for keyword in keywords)
+
+        self.nasc = patterns.tokenizer_nascimento.search(text) is not None
+        nasc_match = patterns.tokenizer_data_nascimento.search(text) if self.nasc else None
+        self.nasc_date = nasc_match.group(2) if nasc_match else None
+
+        if self.kind is None:
+            if self.kw_long:
+                self.kind = PALAVRA_CHAVE
+            elif not text:
+                self.kind = VAZIA
+            else:
+                self.kind = TEXTO
+
+    def is_section_start(self, next_token: Optional['LineToken']) -> bool:
+        """Indica se a linha abre uma seção de vínculo"""
+        if self.kind in (CODIGO_EMP, VINCULO, AGRUPAMENTO):
+            return True
+        return self.kind == NUMERADO and next_token is not None and next_token.cnpj is not None
+
+    def __repr__(self):
+        return f"LineToken({self.kind!r}, {self.text!r})"
+
+
+def iter_line_batches(chunks: Iterable[str]) -> Iterator[List[str]]:
+    """Quebra trechos de texto (ex.: páginas) em listas de linhas completas
+
+    A última linha incompleta de um trecho é guardada e completada pelo
+    trecho seguinte; a lista final traz o que sobrou após o último trecho.
+    As partes de uma linha que atravessa vários trechos são acumuladas em
+    lista e unidas uma única vez, mantendo o custo linear.
+    """
+    parts: List[str] = []
+    for chunk in chunks:
+        lines = chunk.split('\n')
+        if len(lines) == 1:
+            parts.append(chunk)
+            yield []
+            continue
+        if parts:
+            parts.append(lines[0])
+            lines[0] = ''.join(parts)
+        parts = [lines.pop()]
+        yield lines
+    yield [''.join(parts)]
+
+
+def iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Quebra trechos de texto (ex.: páginas) em linhas sem concatenar o documento
+
+    Produz exatamente as mesmas linhas que ''.join(chunks).split('\\n'),
+    guardando apenas a última linha incompleta entre um trecho e outro.
+    """
+    for lines in iter_line_batches(chunks):
+        yield from lines
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[LineToken]:
+    """Classifica cada linha uma única vez, sem os espaços das pontas"""
+    for line in lines:
+        yield LineToken(line.strip())
+
+
+def tokenize_text(text: str) -> List[LineToken]:
+    """Classifica todas as linhas de um texto"""
+    return list(tokenize(text.split('\n')))
@@ -22,7 +22,84 @@
     */
 
     'scripts' => [
-        'cnis_extractor' => base_path('python_cnis_extractor.py'),
+        'cnis_extractor' => base_path('simple_cnis_extractor.py'),
+    ],
+
+    /*
+    |--------------------------------------------------------------------------
+    | Backend de PDF
+    |--------------------------------------------------------------------------
+    |
+    | Biblioteca usada para ler o PDF (pymupdf, pypdf ou pdfplumber). Vazio
+    | usa a mais rápida instalada; o JSON de saída informa qual foi usada.
+    |
+    */
+
+    'pdf_backend' => env('PYTHON_PDF_BACKEND'),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Entrada do PDF
+    |--------------------------------------------------------------------------
+    |
+    | "path" passa o caminho do arquivo ao script. "stdin" abre o arquivo
+    | como stdin do processo: o extrator o mapeia em memória (mmap) e usa o
+    | mesmo buffer na leitura do PDF e no hash do cache, sem reabri-lo.
+    |
+    */
+
+    'input' => env('PYTHON_CNIS_INPUT', 'path'),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Métricas
+    |--------------------------------------------------------------------------
+    |
+    | Quando habilitado, o extrator inclui no JSON um bloco "metrics" com
+    | tempos por etapa e contadores, registrado no log do processamento.
+    |
+    */
+
+    'metrics' => env('PYTHON_CNIS_METRICS', false),
+
+    /*
+    |--------------------------------------------------------------------------
+    | Modo Servidor
+    |--------------------------------------------------------------------------
+    |
+    | Socket Unix do extrator em modo servidor (simple_cnis_extractor.py
+    | --serve --socket ...). Quando configurado e disponível, evita iniciar
+    | um novo processo Python a cada documento.
+    |
+    */
+
+    'server' => [
+        'socket' => env('PYTHON_CNIS_SOCKET'),
+        'timeout' => env('PYTHON_CNIS_SOCKET_TIMEOUT', 120),
+    ],
+
+    /*
+    |--------------------------------------------------------------------------
+    | Fila de Extração
+    |--------------------------------------------------------------------------
+    |
+    | Fila da conexão "database" consumida pelo worker Python
+    | (simple_cnis_extractor.py --queue). O worker reserva os jobs em lotes,
+    | grava o resultado em documents.extracted_data e, em caso de falha,
+    | devolve o job à fila com as esperas de "backoff" (segundos) até
+    | "max_tries" tentativas, quando ele vai para failed_jobs.
+    |
+    | Com "enabled", os CNIS enviados para um caso são enfileirados em vez de
+    | extraídos na requisição; o comando cnis:import-queued grava os vínculos
+    | dos documentos já processados pelo worker.
+    |
+    */
+
+    'queue' => [
+        'enabled' => (bool) env('PYTHON_CNIS_QUEUE_ENABLED', false),
+        'name' => env('PYTHON_CNIS_QUEUE', 'cnis'),
+        'max_tries' => env('PYTHON_CNIS_QUEUE_TRIES', 3),
+        'backoff' => env('PYTHON_CNIS_QUEUE_BACKOFF', '10,60,300'),
     ],
 
     /*
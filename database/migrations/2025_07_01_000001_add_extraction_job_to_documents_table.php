@@ -0,0 +1,23 @@
+<?php
+
+use Illuminate\Database\Migrations\Migration;
+use Illuminate\Database\Schema\Blueprint;
+use Illuminate\Support\Facades\Schema;
+
+return new class extends Migration {
+    public function up()
+    {
+        Schema::table('documents', function (Blueprint $table) {
+            // uuid do job de extração enfileirado para o worker Python; limpo
+            // quando os vínculos do resultado são gravados (cnis:import-queued)
+            $table->string('extraction_job', 36)->nullable()->after('is_processed');
+        });
+    }
+
+    public function down()
+    {
+        Schema::table('documents', function (Blueprint $table) {
+            $table->dropColumn('extraction_job');
+        });
+    }
+};
@@ -4,53 +4,106 @@ Extrator de dados do CNIS usando Python
 Utiliza bibliotecas de IA e processamento de documentos para extrair informações estruturadas
 """
 
+import os
 import sys
 import json
 import re
 import argparse
+import functools
+import importlib.util
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator
 import logging
 
+from cnis_batch import add_batch_arguments, run_batch_cli
+from cnis_backends import BACKENDS_BY_NAME, get_backend
+from cnis_remuneracoes import Remuneracoes, format_valor, month_index
+from cnis_models import ExtractionResult, PersonalData, Vinculo
+from cnis_compat import result_to_legacy, vinculo_to_legacy
+from cnis_patterns import compile_pattern
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Padrões dos dados pessoais, em ordem de prioridade
+CPF_PATTERNS = [
+    compile_pattern('legado.cpf', r'CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})'),
+    compile_pattern('legado.cpf_apos_nit', r'NIT[:\s]*\d+\.\d+\s+CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})'),
+    compile_pattern('legado.cpf_solto', r'(\d{3}\.\d{3}\.\d{3}-\d{2})')
+]
+NOME_PATTERNS = [
+    compile_pattern('legado.nome_apos_cpf', r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([^\n\r]+)', re.IGNORECASE),
+    compile_pattern('legado.nome_rotulo', r'Nome[:\s]*([^\n\r]+)', re.IGNORECASE),
+    compile_pattern('legado.nome_maiusculo_apos_cpf', r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+([A-Z\s]+)', re.IGNORECASE)
+]
+NOME_STRIP_RE = compile_pattern('legado.nome_caracteres', r'[0-9\-\_\.]')
+NASC_PATTERNS = [
+    compile_pattern('legado.nascimento_rotulo', r'Data de nascimento[:\s]*(\d{2}/\d{2}/\d{4})'),
+    compile_pattern('legado.nascimento', r'Nascimento[:\s]*(\d{2}/\d{2}/\d{4})')
+]
+
+# Início e fim das seções de vínculo
+SECTION_START_PATTERNS = [
+    compile_pattern('legado.secao_codigo_emp', r'^Código Emp\.'),
+    compile_pattern('legado.secao_cnpj', r'^\d+\s+\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}'),
+    compile_pattern('legado.secao_agrupamento', r'^\d+\s+AGRUPAMENTO')
+]
+SECTION_END_PATTERNS = [
+    compile_pattern('legado.fim_relacoes', r'^Relações Previdenciárias'),
+    compile_pattern('legado.fim_valores', r'^Valores Consolidados')
+]
+
+# Campos do vínculo
+EMPREGADOR_RE = compile_pattern('legado.empregador', r'^\d+\s+(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})\s+(.+)$')
+AGRUPAMENTO_RE = compile_pattern('legado.agrupamento', r'^\d+\s+(AGRUPAMENTO.+)$')
+CONTRIBUINTE_SUFFIX_RE = compile_pattern('legado.sufixo_contribuinte', r'\tContribuinte Individual.*$')
+CNPJ_RE = compile_pattern('legado.cnpj', r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}')
+DATE_PATTERNS = [
+    (compile_pattern('legado.datas_inicio_fim', r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})'), 2),  # Duas datas completas
+    (compile_pattern('legado.data_mes_ano', r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{4})'), 1),          # Data completa + MM/YYYY
+    (compile_pattern('legado.data', r'(\d{2}/\d{2}/\d{4})'), 0)                                      # Uma data
+]
+ULT_REMUN_RE = compile_pattern('legado.ultima_remuneracao', r'Últ\. Remun\.\s*(\d{2}/\d{4})')
+MONTH_YEAR_RE = compile_pattern('legado.mes_ano', r'(\d{2})/(\d{4})')
+
 class CNISExtractor:
     """Classe para extração de dados do CNIS usando Python"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None):
         """Inicializa o extrator"""
+        self.backend = backend
+        self.text_backend = None
         self.setup_models()
     
     def setup_models(self):
-        """Configura os modelos de IA necessários"""
-        try:
-            # Tenta importar bibliotecas de IA
-            import fitz  # PyMuPDF
-            logger.info("PyMuPDF carregado com sucesso")
-        except ImportError:
+        """Verifica as bibliotecas opcionais sem importá-las
+        
+        Importar PyMuPDF e pytesseract só para registrar que existem custava
+        a cada execução; elas são carregadas apenas por quem as usa.
+        """
+        if importlib.util.find_spec('fitz') is not None:
+            logger.info("PyMuPDF disponível")
+        else:
             logger.warning("PyMuPDF não encontrado. Instale com: pip install PyMuPDF")
         
-        try:
-            import pytesseract
-            logger.info("Tesseract carregado com sucesso")
-        except ImportError:
+        if importlib.util.find_spec('pytesseract') is not None:
+            logger.info("Tesseract disponível")
+        else:
             logger.warning("Tesseract não encontrado. Instale com: pip install pytesseract")
     
+    def iter_text_chunks(self, pdf_path: str) -> Iterator[str]:
+        """Gera o texto do PDF página a página (cada página termina com quebra de linha)"""
+        backend = get_backend(self.backend)
+        self.text_backend = backend.name
+        with backend(pdf_path) as pdf:
+            yield from pdf.iter_page_texts()
+        logger.info(f"Texto extraído com {backend.name}")
+    
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extrai texto do PDF usando PyMuPDF"""
+        """Extrai texto do PDF com o backend escolhido (padrão: o mais rápido instalado)"""
         try:
-            import fitz
-            doc = fitz.open(pdf_path)
-            text = ""
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text += page.get_text()
-            
-            doc.close()
-            return text
+            return ''.join(self.iter_text_chunks(pdf_path))
         except Exception as e:
             logger.error(f"Erro ao extrair texto do PDF: {e}")
             return ""
@@ -59,64 +112,48 @@ class CNISExtractor:
         """Extrai dados pessoais do texto"""
         personal_data = {}
         
-        # Padrões para CPF
-        cpf_patterns = [
-            r'CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})',
-            r'NIT[:\s]*\d+\.\d+\s+CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})',
-            r'(\d{3}\.\d{3}\.\d{3}-\d{2})'
-        ]
-        
-        for pattern in cpf_patterns:
-            match = re.search(pattern, text)
+        for pattern in CPF_PATTERNS:
+            match = pattern.search(text)
             if match:
                 personal_data['cpf'] = match.group(1)
                 break
         
-        # Padrões para nome
-        nome_patterns = [
-            r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([^\n\r]+)',
-            r'Nome[:\s]*([^\n\r]+)',
-            r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+([A-Z\s]+)'
-        ]
-        
-        for pattern in nome_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in NOME_PATTERNS:
+            match = pattern.search(text)
             if match:
                 nome = match.group(1).strip()
                 # Remove caracteres especiais e números
-                nome = re.sub(r'[0-9\-\_\.]', '', nome)
+                nome = NOME_STRIP_RE.sub('', nome)
                 nome = nome.strip()
                 if len(nome) > 3 and not nome.isdigit():
                     personal_data['nome'] = nome
                     break
         
-        # Padrões para data de nascimento
-        nasc_patterns = [
-            r'Data de nascimento[:\s]*(\d{2}/\d{2}/\d{4})',
-            r'Nascimento[:\s]*(\d{2}/\d{2}/\d{4})'
-        ]
-        
-        for pattern in nasc_patterns:
-            match = re.search(pattern, text)
+        for pattern in NASC_PATTERNS:
+            match = pattern.search(text)
             if match:
                 personal_data['data_nascimento'] = match.group(1)
                 break
         
         return personal_data
     
-    def extract_employment_data(self, text: str) -> List[Dict[str, str]]:
+    def extract_employment_data(self, text: str) -> List[Dict[str, Any]]:
         """Extrai dados de vínculos empregatícios"""
-        employments = []
+        return [vinculo_to_legacy(vinculo) for vinculo in self.extract_vinculos(text)]
+    
+    def extract_vinculos(self, text: str) -> List[Vinculo]:
+        """Extrai os vínculos empregatícios como registros do modelo"""
+        vinculos = []
         
         # Divide o texto em seções
         sections = self.split_into_employment_sections(text)
         
         for section in sections:
-            employment = self.extract_employment_from_section(section)
-            if employment and employment.get('empregador'):
-                employments.append(employment)
+            vinculo = self.extract_vinculo_from_section(section)
+            if vinculo.empregador:
+                vinculos.append(vinculo)
         
-        return employments
+        return vinculos
     
     def split_into_employment_sections(self, text: str) -> List[str]:
         """Divide o texto em seções de vínculos empregatícios"""
@@ -129,9 +166,7 @@ class CNISExtractor:
             line = line.strip()
             
             # Identifica início de uma seção de vínculo
-            if (re.match(r'^Código Emp\.', line) or 
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', line) or
-                re.match(r'^\d+\s+AGRUPAMENTO', line)):
+            if any(pattern.match(line) for pattern in SECTION_START_PATTERNS):
                 
                 if current_section:
                     sections.append('\n'.join(current_section))
@@ -142,8 +177,7 @@ class CNISExtractor:
                 current_section.append(line)
                 
                 # Identifica fim da seção
-                if (re.match(r'^Relações Previdenciárias', line) or
-                    re.match(r'^Valores Consolidados', line)):
+                if any(pattern.match(line) for pattern in SECTION_END_PATTERNS):
                     sections.append('\n'.join(current_section))
                     current_section = []
                     in_employment_section = False
@@ -153,16 +187,17 @@ class CNISExtractor:
         
         return sections
     
-    def extract_employment_from_section(self, section: str) -> Optional[Dict[str, str]]:
+    def extract_employment_from_section(self, section: str) -> Optional[Dict[str, Any]]:
         """Extrai dados de um vínculo empregatício de uma seção"""
-        employment = {
-            'empregador': '',
-            'cnpj': '',
-            'data_inicio': '',
-            'data_fim': '',
-            'salario': '',
-            'ultima_remuneracao': ''
-        }
+        return vinculo_to_legacy(self.extract_vinculo_from_section(section))
+    
+    def extract_vinculo_from_section(self, section: str) -> Vinculo:
+        """Extrai o vínculo empregatício de uma seção"""
+        empregador = ''
+        cnpj = ''
+        data_inicio = ''
+        data_fim = ''
+        ultima_remuneracao = None
         
         lines = section.split('\n')
         
@@ -170,84 +205,58 @@ class CNISExtractor:
             line = line.strip()
             
             # Extrai empregador e CNPJ
-            empregador_match = re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})\s+(.+)$', line)
+            empregador_match = EMPREGADOR_RE.match(line)
             if empregador_match:
-                employment['cnpj'] = empregador_match.group(1)
-                employment['empregador'] = empregador_match.group(2).strip()
+                cnpj = empregador_match.group(1)
+                empregador = empregador_match.group(2).strip()
             
-            agrupamento_match = re.match(r'^\d+\s+(AGRUPAMENTO.+)$', line)
+            agrupamento_match = AGRUPAMENTO_RE.match(line)
             if agrupamento_match:
                 empregador = agrupamento_match.group(1).strip()
                 # Remove "Contribuinte Individual" e CNPJ do nome
-                empregador = re.sub(r'\tContribuinte Individual.*$', '', empregador)
-                empregador = re.sub(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}', '', empregador)
-                employment['empregador'] = empregador.strip()
-                employment['cnpj'] = ''
+                empregador = CONTRIBUINTE_SUFFIX_RE.sub('', empregador)
+                empregador = CNPJ_RE.sub('', empregador)
+                empregador = empregador.strip()
+                cnpj = ''
             
             # Extrai datas
-            date_patterns = [
-                (r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})', 2),  # Duas datas completas
-                (r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{4})', 1),       # Data completa + MM/YYYY
-                (r'(\d{2}/\d{2}/\d{4})', 0)                        # Uma data
-            ]
-            
-            for pattern, date_count in date_patterns:
-                match = re.search(pattern, line)
+            for pattern, date_count in DATE_PATTERNS:
+                match = pattern.search(line)
                 if match:
                     if date_count == 2:
-                        employment['data_inicio'] = match.group(1)
-                        employment['data_fim'] = match.group(2)
+                        data_inicio = match.group(1)
+                        data_fim = match.group(2)
                     elif date_count == 1:
-                        employment['data_inicio'] = match.group(1)
-                        employment['data_fim'] = self.convert_month_year_to_full_date(match.group(2))
+                        data_inicio = match.group(1)
+                        data_fim = self.convert_month_year_to_full_date(match.group(2))
                     else:
-                        if not employment['data_inicio']:
-                            employment['data_inicio'] = match.group(1)
-                        elif not employment['data_fim']:
-                            employment['data_fim'] = match.group(1)
+                        if not data_inicio:
+                            data_inicio = match.group(1)
+                        elif not data_fim:
+                            data_fim = match.group(1)
                     break
             
             # Extrai última remuneração
-            ult_rem_match = re.search(r'Últ\. Remun\.\s*(\d{2}/\d{4})', line)
+            ult_rem_match = ULT_REMUN_RE.search(line)
             if ult_rem_match:
-                employment['ultima_remuneracao'] = ult_rem_match.group(1)
-        
-        # Define data de fim se não encontrada
-        if not employment['data_fim']:
-            employment['data_fim'] = 'sem data fim'
-        
-        # Extrai salário
-        employment['salario'] = self.extract_salary_from_section(section)
+                month, year = ult_rem_match.group(1).split('/')
+                if 1 <= int(month) <= 12:
+                    ultima_remuneracao = month_index(int(month), int(year))
         
-        return employment
+        # Vínculo sem data de fim fica em aberto ('sem data fim' na saída)
+        return Vinculo.from_fields(empregador, cnpj, data_inicio, data_fim,
+                                   Remuneracoes.from_lines(lines), ultima_remuneracao)
     
     def extract_salary_from_section(self, section: str) -> str:
-        """Extrai salário de uma seção"""
-        lines = section.split('\n')
-        last_salary = ''
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Procura por remunerações no formato MM/YYYY VALOR
-            salary_match = re.search(r'\d{2}/\d{4}\s+([\d\.,]+)', line)
-            if salary_match:
-                salary = salary_match.group(1)
-                # Converte para formato numérico
-                salary = salary.replace('.', '').replace(',', '.')
-                try:
-                    salary_float = float(salary)
-                    last_salary = f"{salary_float:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-                except ValueError:
-                    pass
-        
-        return last_salary
+        """Extrai a última remuneração de uma seção"""
+        ultima = Remuneracoes.from_lines(section.split('\n')).ultima()
+        return format_valor(ultima[1]) if ultima else ''
     
     def convert_month_year_to_full_date(self, month_year: str) -> str:
         """Converte MM/YYYY para o último dia do mês"""
         import datetime
         
-        match = re.match(r'(\d{2})/(\d{4})', month_year)
+        match = MONTH_YEAR_RE.match(month_year)
         if match:
             month = int(match.group(1))
             year = int(match.group(2))
@@ -278,19 +287,18 @@ class CNISExtractor:
             
             # Extrai dados
             personal_data = self.extract_personal_data(text)
-            employment_data = self.extract_employment_data(text)
+            vinculos = self.extract_vinculos(text)
             
-            result = {
-                'success': True,
-                'data': {
-                    'dados_pessoais': personal_data,
-                    'vinculos_empregaticios': employment_data,
-                    'beneficios': []
-                },
-                'text_length': len(text)
-            }
+            result = result_to_legacy(ExtractionResult(
+                personal=PersonalData.from_fields(**personal_data),
+                vinculos=vinculos,
+                text_length=len(text),
+                backend=self.text_backend,
+                ocr_pages=None,
+                skipped_pages=None,
+            ))
             
-            logger.info(f"Extraídos {len(employment_data)} vínculos empregatícios")
+            logger.info(f"Extraídos {len(vinculos)} vínculos empregatícios")
             return result
             
         except Exception as e:
@@ -303,18 +311,32 @@ class CNISExtractor:
 def main():
     """Função principal para execução via linha de comando"""
     parser = argparse.ArgumentParser(description='Extrator de dados do CNIS')
-    parser.add_argument('pdf_path', help='Caminho para o arquivo PDF do CNIS')
+    parser.add_argument('pdf_path', nargs='?', help='Caminho para o arquivo PDF do CNIS')
     parser.add_argument('--output', help='Arquivo de saída JSON (opcional)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Número de processos worker do modo lote')
+    parser.add_argument('--backend', choices=sorted(BACKENDS_BY_NAME),
+                        help='Biblioteca de PDF (padrão: a mais rápida instalada)')
+    add_batch_arguments(parser)
     
     args = parser.parse_args()
     
+    extractor_factory = functools.partial(CNISExtractor, backend=args.backend)
+    
+    if args.batch:
+        run_batch_cli(extractor_factory, args)
+        return
+    
+    if not args.pdf_path:
+        parser.error('pdf_path é obrigatório fora do modo --batch')
+    
     # Verifica se o arquivo existe
     if not Path(args.pdf_path).exists():
         print(f"Erro: Arquivo não encontrado - {args.pdf_path}")
         sys.exit(1)
     
     # Processa o CNIS
-    extractor = CNISExtractor()
+    extractor = extractor_factory()
     result = extractor.process_cnis(args.pdf_path)
     
     # Saída
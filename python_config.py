@@ -104,39 +104,44 @@ Previdia - www.previdia.com.br
 
 import os
 import sys
-import fitz  # PyMuPDF
-import pytesseract
-import cv2
-import numpy as np
-import pandas as pd
-from PIL import Image
-import spacy
 import json
 from pathlib import Path
 
+# Bibliotecas pesadas (PyMuPDF, OpenCV, Tesseract, spaCy) são importadas
+# apenas no caminho que as usa: a inicialização é paga a cada arquivo
+
 # Configurar caminhos
 TESSERACT_CMD = '/usr/bin/tesseract'
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
-# Carregar modelo spaCy
-try:
-    nlp = spacy.load("pt_core_news_sm")
-except OSError:
-    print("Modelo spaCy não encontrado. Execute: python -m spacy download pt_core_news_sm")
-    sys.exit(1)
+# Modelo spaCy, carregado no primeiro uso
+_nlp = None
+
+def load_nlp():
+    """Carrega o modelo spaCy na primeira vez em que for usado"""
+    global _nlp
+    if _nlp is None:
+        import spacy
+        try:
+            _nlp = spacy.load("pt_core_news_sm")
+        except OSError:
+            print("Modelo spaCy não encontrado. Execute: python -m spacy download pt_core_news_sm")
+            sys.exit(1)
+    return _nlp
 
 class CNISExtractor:
     def __init__(self):
-        self.nlp = nlp
         self.extracted_data = {}
     
+    @property
+    def nlp(self):
+        return load_nlp()
+    
     def extract_text_from_pdf(self, pdf_path):
         """Extrai texto do PDF usando PyMuPDF"""
         try:
+            import fitz  # PyMuPDF
             doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
+            text = "".join(page.get_text() for page in doc)
             doc.close()
             return text
         except Exception as e:
@@ -146,6 +151,10 @@ class CNISExtractor:
     def extract_text_from_image(self, image_path):
         """Extrai texto de imagem usando OCR"""
         try:
+            import cv2
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+            
             # Carregar imagem
             image = cv2.imread(image_path)
             if image is None:
@@ -2,7 +2,14 @@
 
 use Illuminate\Foundation\Inspiring;
 use Illuminate\Support\Facades\Artisan;
+use Illuminate\Support\Facades\Schedule;
 
 Artisan::command('inspire', function () {
     $this->comment(Inspiring::quote());
 })->purpose('Display an inspiring quote');
+
+// Vínculos dos CNIS extraídos pelo worker Python (python.queue.enabled)
+Schedule::command('cnis:import-queued')
+    ->everyMinute()
+    ->withoutOverlapping()
+    ->when(fn () => (bool) config('python.queue.enabled'));
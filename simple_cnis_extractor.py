@@ -4,427 +4,786 @@ Extrator de dados do CNIS usando Python - Versão Simplificada
 Usa apenas bibliotecas básicas do Python para extrair informações do CNIS
 """
 
+import os
 import sys
 import json
 import re
 import argparse
+import functools
+import importlib
+from contextlib import nullcontext
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Iterable, Iterator, Sequence, Tuple
 import logging
 
-# Configuração de logging
-logging.basicConfig(level=logging.INFO)
+from cnis_batch import add_batch_arguments, run_batch_cli
+from cnis_queue import add_queue_arguments, run_queue_cli
+from cnis_cache import ResultCache, DEFAULT_CACHE_DIR, fingerprint_files
+from cnis_input import PdfInput, PdfSource, source_digest
+from cnis_artifacts import artifact_path_for, save_pages, iter_artifact_pages
+from cnis_backends import BACKENDS_BY_NAME, PARALLEL_PAGE_THRESHOLD, Word, get_backend, iter_pdf_pages
+from cnis_pages import skip_page
+from cnis_layout import LayoutTableParser, is_layout_available
+from cnis_ocr import DEFAULT_OCR_DPI, DEFAULT_OCR_LANG, PageOCR, is_ocr_available
+from cnis_metrics import Metrics
+from cnis_remuneracoes import Remuneracoes
+from cnis_models import ExtractionResult, PersonalData, Vinculo
+from cnis_compat import result_to_simple, vinculo_to_simple
+from cnis_output import NDJSONWriter
+from cnis_patterns import PATTERNS, active_patterns, format_report, register_pattern, using_patterns
+from cnis_tokenizer import (
+    LineToken, tokenize, iter_lines, iter_line_batches,
+    VINCULO, TERMINADOR, CNPJ as CNPJ_ISOLADO
+)
+
+# Configuração de logging (sempre no stderr: o stdout é reservado ao resultado)
+logging.basicConfig(level=logging.INFO, stream=sys.stderr)
 logger = logging.getLogger(__name__)
 
+# Padrões de limpeza do nome do empregador
+# Na ordem visual (pdfplumber, PyMuPDF) a matrícula do trabalhador fica entre
+# o nome e o tipo do vínculo ("... LOCACOES LTDA 11 Empregado ou Agente"); no
+# pypdf o tipo vem colado ao nome e a matrícula vai para depois do NIT
+# (os padrões do extrator são lidos por active_patterns() no momento do uso)
+register_pattern('empregador.sufixo',
+                 r'(?:\s+\d[\d.\-/]*(?=\s))?\s*(Empregado ou Agente|Contribuinte Individual).*$', re.IGNORECASE)
+register_pattern('empregador.cnpj_opcional', r'\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?')
+register_pattern('empregador.numero_inicial', r'^\d+\s*')
+register_pattern('texto.espacos', r'\s+')
+
+# Padrões de datas de vínculo (último recurso, quando a linha de datas não foi reconhecida)
+DATE_PATTERNS = (
+    (register_pattern('vinculo.datas_inicio_fim', r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})'), 2),  # Duas datas completas
+    (register_pattern('vinculo.data_mes_ano', r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{4})'), 1),          # Data completa + MM/YYYY
+    (register_pattern('vinculo.data', r'(\d{2}/\d{2}/\d{4})'), 0)                                      # Uma data
+)
+register_pattern('vinculo.mes_ano', r'(\d{2})/(\d{4})')
+
+# Módulos cujas regras determinam o resultado (entram na versão do cache)
+RULE_MODULES = (
+    'cnis_tokenizer', 'cnis_patterns', 'cnis_remuneracoes', 'cnis_models', 'cnis_compat',
+    'cnis_backends', 'cnis_artifacts', 'cnis_ocr', 'cnis_pages', 'cnis_layout',
+)
+
+# Linhas do início da primeira página lidas como bloco de identificação
+HEADER_MAX_LINES = 60
+
+# Campos dos dados pessoais (a busca no documento inteiro só roda se faltar algum)
+PERSONAL_FIELDS = ('cpf', 'nome', 'data_nascimento')
+
+def preload_pdf_backend(name: Optional[str] = None) -> Optional[str]:
+    """Importa antecipadamente a biblioteca de PDF que será usada
+
+    Usado pelos modos servidor e fila para que os workers herdem o módulo já carregado.
+    """
+    try:
+        backend = get_backend(name)
+        backend.load_module()
+    except ImportError as e:
+        logger.warning(f"Nenhuma biblioteca de PDF pré-carregada: {e}")
+        return None
+    
+    logger.info(f"Biblioteca de PDF pré-carregada: {backend.name}")
+    return backend.name
+
+class PersonalDataScanner:
+    """Extração incremental dos dados pessoais, alimentada página a página
+    
+    Para cada campo guarda a melhor ocorrência vista até agora segundo a
+    prioridade dos padrões, de modo que o resultado é o mesmo de uma busca
+    sobre o texto completo (salvo campos quebrados entre duas páginas).
+    
+    No CNIS os dados pessoais ficam no bloco de identificação do início da
+    primeira página: from_header lê apenas esse bloco, e a busca no
+    documento inteiro fica para quando falta algum campo (o que também
+    evita CPFs de dependentes em páginas seguintes).
+    """
+    
+    # Fim do bloco de identificação: primeiro vínculo ou cabeçalho das relações
+    register_pattern(
+        'pessoais.fim_cabecalho',
+        r'(?:Relações Previdenciárias|Código Emp\.|\d+\s+(?:\d{2}\.\d{3}\.\d{3}|AGRUPAMENTO))'
+    )
+    
+    # Padrões para CPF - melhorados
+    CPF_PATTERNS = (
+        register_pattern('pessoais.cpf', r'CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})'),
+        register_pattern('pessoais.cpf_apos_nit', r'NIT[:\s]*\d+\.\d+\s+CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})'),
+        register_pattern('pessoais.cpf_solto', r'(\d{3}\.\d{3}\.\d{3}-\d{2})')
+    )
+    
+    # Os padrões de nome localizam apenas o rótulo (o nome começa logo após
+    # o casamento); a sequência de letras e espaços é lida por
+    # pessoais.nome_sequencia e o fim do nome é decidido por find_name_end. As
+    # versões preguiçosas '([...\s]+?)(?:\s+Data|$)' retrocediam em tempo
+    # quadrático (ou pior) sobre sequências longas de espaços e rótulos repetidos.
+    
+    # Padrão específico do CNIS: NIT + CPF + Nome na mesma linha
+    NOME_FULL_PATTERN = register_pattern(
+        'pessoais.nome_nit_cpf_texto',
+        r'NIT[:\s]*[\d\.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*(?=[A-ZÁÊÇÕ])',
+        re.IGNORECASE
+    )
+    
+    # Padrões para nome - melhorados para extrair corretamente
+    NOME_PATTERNS = (
+        # Padrão específico do CNIS: NIT + CPF + Nome na mesma linha
+        register_pattern('pessoais.nome_nit_cpf', r'NIT[:\s]*[\d\.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*(?=[A-ZÁÊÇÕ])', re.MULTILINE | re.IGNORECASE),
+        # Padrão: Nome após CPF na mesma linha
+        register_pattern('pessoais.nome_apos_cpf', r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*(?=[A-ZÁÊÇÕ])', re.MULTILINE | re.IGNORECASE),
+        # Padrão: Nome em linha específica com "Nome:"
+        register_pattern('pessoais.nome_rotulo', r'Nome[:\s]+(?=[A-ZÁÊÇÕ])', re.MULTILINE | re.IGNORECASE),
+    )
+    
+    # Padrão: linha que parece ser nome completo (pelo menos 2 palavras, maiúsculas);
+    # as linhas chegam sem espaços nas pontas, então não há '\s*' antes do '$'
+    register_pattern('pessoais.nome_linha', r'^([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ]+\s[A-ZÁÊÇÕa-záêçõ\s]+)$', re.MULTILINE | re.IGNORECASE)
+    
+    # Sequência de letras e espaços que contém o nome
+    register_pattern('pessoais.nome_sequencia', r'[A-ZÁÊÇÕa-záêçõ\s]*', re.IGNORECASE)
+    
+    # Fim do nome: espaço seguido de "Data"
+    register_pattern('pessoais.nome_fim', r'\sData', re.IGNORECASE)
+    
+    register_pattern('pessoais.nome_prefixo_invalido', r'^(DATA|NASCIMENTO|CPF|NIT|EXTRATO)')
+    register_pattern('pessoais.nome_caracteres', r'[0-9\-\_\.\(\)\[\]]')
+    
+    # Padrões para data de nascimento
+    NASC_PATTERNS = (
+        register_pattern('pessoais.nascimento_rotulo', r'Data de nascimento[:\s]*(\d{2}/\d{2}/\d{4})'),
+        register_pattern('pessoais.nascimento', r'Nascimento[:\s]*(\d{2}/\d{2}/\d{4})')
+    )
+    
+    def __init__(self):
+        self.cpf = None
+        self.cpf_rank = len(self.CPF_PATTERNS)
+        self.data_nascimento = None
+        self.nasc_rank = len(self.NASC_PATTERNS)
+        self.full_name_checked = False
+        self.full_name = None
+        self.line_name = None
+    
+    @classmethod
+    def header_window(cls, text: str, max_lines: int = HEADER_MAX_LINES) -> str:
+        """Bloco de identificação: até max_lines linhas, parando no primeiro vínculo"""
+        header_end = active_patterns().pessoais_fim_cabecalho
+        lines = []
+        for line in text.split('\n', max_lines)[:max_lines]:
+            if header_end.match(line.strip()):
+                break
+            lines.append(line)
+        return '\n'.join(lines)
+    
+    @classmethod
+    def from_header(cls, text: str, max_lines: int = HEADER_MAX_LINES) -> 'PersonalDataScanner':
+        """Scanner alimentado apenas com o bloco de identificação do texto"""
+        scanner = cls()
+        scanner.feed(cls.header_window(text, max_lines))
+        return scanner
+    
+    @staticmethod
+    def search_ranked(names: Sequence[str], text: str, rank: int):
+        """Procura apenas os padrões de prioridade maior que a já encontrada"""
+        patterns = active_patterns()
+        for index in range(rank):
+            match = patterns[names[index]].search(text)
+            if match:
+                return index, match.group(1)
+        return None
+    
+    def clean_name(self, nome: str) -> str:
+        """Limpa o nome removendo números, pontuação e espaços duplos"""
+        patterns = active_patterns()
+        nome = patterns.pessoais_nome_caracteres.sub('', nome.strip())
+        nome = patterns.texto_espacos.sub(' ', nome)
+        return nome.strip()
+    
+    def feed(self, text: str) -> None:
+        """Processa mais um trecho (página) do documento"""
+        found = self.search_ranked(self.CPF_PATTERNS, text, self.cpf_rank)
+        if found:
+            self.cpf_rank, self.cpf = found
+        
+        # Primeiro tenta encontrar o padrão específico do CNIS (só a primeira ocorrência conta)
+        if not self.full_name_checked:
+            nome = self.search_name(active_patterns()[self.NOME_FULL_PATTERN], text, False)
+            if nome is not None:
+                self.full_name_checked = True
+                nome = self.clean_name(nome)
+                if len(nome) > 5 and ' ' in nome:
+                    self.full_name = nome.title()
+        
+        # Se não encontrou, tenta os outros padrões linha por linha
+        if self.full_name is None and self.line_name is None:
+            self.line_name = self.find_name_in_lines(text)
+        
+        found = self.search_ranked(self.NASC_PATTERNS, text, self.nasc_rank)
+        if found:
+            self.nasc_rank, self.data_nascimento = found
+    
+    @classmethod
+    def find_name_end(cls, run: str, at_end: bool, final_newline: bool, multiline: bool) -> Optional[int]:
+        """Tamanho do nome dentro da sequência de letras e espaços
+        
+        Equivale ao término preguiçoso '+?)(?:\s+Data|$)': o menor tamanho
+        (ao menos 2) seguido de espaços e "Data", de uma quebra de linha
+        (multiline) ou do fim do texto (at_end). None quando não há término.
+        """
+        ends = []
+        match = active_patterns().pessoais_nome_fim.search(run, 2)
+        if match:
+            # O término começa no primeiro espaço da sequência de espaços
+            ends.append(max(len(run[:match.start()].rstrip()), 2))
+        if multiline:
+            newline = run.find('\n', 2)
+            if newline != -1:
+                ends.append(newline)
+        elif at_end and final_newline and len(run) > 2:
+            # Sem multiline, '$' também casa antes da quebra de linha final
+            ends.append(len(run) - 1)
+        if at_end and len(run) >= 2:
+            ends.append(len(run))
+        return min(ends) if ends else None
+    
+    def search_name(self, pattern: re.Pattern, text: str, multiline: bool) -> Optional[str]:
+        """Primeiro nome encontrado após o rótulo de um dos padrões de nome
+        
+        Um nome que começa dentro de uma sequência já descartada (sem término)
+        é descartado sem nova leitura: a sua sequência termina no mesmo ponto
+        e também não tem término. Assim cada caractere é lido por
+        pessoais.nome_sequencia no máximo uma vez.
+        """
+        name_run = active_patterns().pessoais_nome_sequencia
+        position = 0
+        run_end = -1
+        while True:
+            match = pattern.search(text, position)
+            if match is None:
+                return None
+            position = match.start() + 1
+            start = match.end()
+            if start < run_end:
+                continue
+            run_end = name_run.match(text, start).end()
+            run = text[start:run_end]
+            end = self.find_name_end(run, run_end == len(text), text.endswith('\n'), multiline)
+            if end is not None:
+                return run[:end]
+    
+    def valid_name(self, nome: str) -> bool:
+        """Validações do nome encontrado linha a linha"""
+        return (len(nome) > 5 and
+                not nome.isdigit() and
+                ' ' in nome and  # Deve ter pelo menos nome e sobrenome
+                not active_patterns().pessoais_nome_prefixo_invalido.match(nome.upper()))
+    
+    def find_name_in_lines(self, text: str) -> Optional[str]:
+        """Procura o nome linha a linha com os padrões alternativos"""
+        patterns = active_patterns()
+        name_patterns = [patterns[name] for name in self.NOME_PATTERNS]
+        for line in text.split('\n'):
+            line = line.strip()
+            for pattern in name_patterns:
+                nome = self.search_name(pattern, line, True)
+                if nome is not None:
+                    nome = self.clean_name(nome)
+                    if self.valid_name(nome):
+                        return nome.title()
+            match = patterns.pessoais_nome_linha.search(line)
+            if match:
+                nome = self.clean_name(match.group(1))
+                if self.valid_name(nome):
+                    return nome.title()
+        return None
+    
+    def result(self) -> Dict[str, str]:
+        """Retorna os dados pessoais encontrados"""
+        personal_data = {}
+        if self.cpf is not None:
+            personal_data['cpf'] = self.cpf
+        nome = self.full_name or self.line_name
+        if nome:
+            personal_data['nome'] = nome
+        if self.data_nascimento is not None:
+            personal_data['data_nascimento'] = self.data_nascimento
+        return personal_data
+    
+    def missing(self) -> List[str]:
+        """Campos dos dados pessoais ainda não encontrados"""
+        found = self.result()
+        return [field for field in PERSONAL_FIELDS if field not in found]
+
 class CNISExtractorSimple:
     """Classe para extração de dados do CNIS usando Python básico"""
     
-    def __init__(self):
-        """Inicializa o extrator"""
+    def __init__(self, cache_dir: Optional[str] = None, save_text: bool = False,
+                 from_text: bool = False, backend: Optional[str] = None,
+                 page_workers: int = 1, parallel_threshold: int = PARALLEL_PAGE_THRESHOLD,
+                 ocr: bool = True, ocr_dpi: int = DEFAULT_OCR_DPI, ocr_lang: str = DEFAULT_OCR_LANG,
+                 metrics: bool = False, profile_patterns: bool = False, target_pages: bool = True,
+                 layout: bool = True):
+        """Inicializa o extrator
+        
+        Com cache_dir, os resultados são guardados em cache pelo hash do PDF
+        e pela versão das regras de extração (os fontes do extrator).
+        Com save_text, o texto de cada página é salvo em um artefato ao lado
+        do PDF; com from_text, o texto é lido desse artefato em vez do PDF.
+        backend força uma biblioteca de PDF (padrão: a mais rápida instalada).
+        Com page_workers > 1, documentos a partir de parallel_threshold páginas
+        são decodificados em paralelo.
+        Com ocr, páginas sem camada de texto passam por OCR (PyMuPDF +
+        Tesseract) usando até page_workers processos.
+        Com metrics, o resultado traz um bloco 'metrics' com tempos por etapa
+        e contadores; desligado, o pipeline não é instrumentado.
+        Com profile_patterns, cada processamento usa um conjunto de padrões
+        medidos próprio (PATTERNS.profiled()) e o resultado traz
+        'pattern_profile' (contagens e tempo por padrão).
+        Com target_pages, as páginas de legenda, resumo e benefícios são
+        reconhecidas pelo topo e não têm o texto extraído; o resultado as
+        lista em 'skipped_pages'. Com save_text todas as páginas são lidas,
+        para que o artefato fique completo.
+        Com layout, quando o backend fornece as coordenadas das palavras
+        (PyMuPDF, pdfplumber) e o NumPy está instalado, a tabela de vínculos
+        é lida pelas colunas (cnis_layout); sem a tabela, o documento segue
+        pelo divisor de seções sobre o texto.
+        """
+        self.backend = backend
+        self.page_workers = page_workers
+        self.parallel_threshold = parallel_threshold
+        self.save_text = save_text
+        self.from_text = from_text
+        self.text_backend = None
+        self.ocr_pages: List[int] = []
+        self.target_pages = target_pages and not save_text
+        self.skipped_pages: List[int] = []
+        self.layout = layout and is_layout_available()
+        self.layout_parser: Optional[LayoutTableParser] = None
+        self.collect_metrics = metrics
+        self.profile_patterns = profile_patterns
+        self.metrics: Optional[Metrics] = None
+        self.ocr = None
+        if ocr:
+            if is_ocr_available():
+                self.ocr = PageOCR(dpi=ocr_dpi, lang=ocr_lang, workers=page_workers, cache_dir=cache_dir)
+            else:
+                logger.warning("OCR desabilitado: instale PyMuPDF e pytesseract para ler páginas digitalizadas")
+        self.cache = None
+        if cache_dir:
+            try:
+                version = f"{self.rules_version()}-{backend or 'auto'}"
+                if self.ocr is not None:
+                    version += f"-ocr{ocr_dpi}{ocr_lang}"
+                if not self.target_pages:
+                    version += '-todas'
+                if not self.layout:
+                    version += '-texto'
+                self.cache = ResultCache(cache_dir, version=version)
+            except OSError as e:
+                logger.warning(f"Cache desabilitado, diretório indisponível: {e}")
         logger.info("CNIS Extractor Simple inicializado")
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    @staticmethod
+    def rules_version() -> str:
+        """Impressão digital das regras de extração usada na chave do cache
+        
+        Cobre este arquivo e todos os módulos que dão forma ao resultado
+        (RULE_MODULES): mudar qualquer um deles invalida as entradas antigas.
+        """
+        return fingerprint_files([__file__] + [importlib.import_module(name).__file__ for name in RULE_MODULES])
+    
+    def iter_text_chunks(self, pdf_path: PdfSource) -> Iterator[str]:
+        """Gera o texto do PDF página a página (cada página termina com quebra de linha)
+        
+        Os índices das páginas dispensadas são acrescentados a skipped_pages.
+        """
+        backend = get_backend(self.backend)
+        self.text_backend = backend.name
+        chunks = iter_pdf_pages(pdf_path, backend.name, workers=self.page_workers,
+                                threshold=self.parallel_threshold, targeted=self.target_pages,
+                                words=self.layout_parser is not None)
+        if self.layout_parser is not None:
+            chunks = self.iter_layout_texts(chunks)
+        if self.ocr is not None:
+            chunks = self.ocr.iter_pages(pdf_path, chunks, self.ocr_pages)
+        for index, chunk in enumerate(chunks):
+            if chunk is None:
+                self.skipped_pages.append(index)
+            else:
+                yield chunk
+        logger.info(f"Texto extraído com {backend.name}")
+    
+    def iter_layout_texts(self, pages: Iterable[Optional[Tuple[List[Word], str]]]) -> Iterator[Optional[str]]:
+        """Passa as palavras de cada página ao parser por coordenadas e gera o texto dela
+
+        O texto é o do backend, não o remontado pelas linhas da tabela: se o
+        parser desistir, o divisor de seções, os dados pessoais, text_length
+        e o artefato de --save-text veem o mesmo texto de --no-layout.
+        """
+        for page in pages:
+            if page is None:
+                yield None
+                continue
+            words, text = page
+            with self.stage('layout'):
+                self.layout_parser.feed_page(words)
+            yield text
+    
+    def create_layout_parser(self) -> Optional[LayoutTableParser]:
+        """Parser por coordenadas do documento, quando habilitado e o backend fornece palavras"""
+        if not self.layout or self.from_text:
+            return None
+        try:
+            backend = get_backend(self.backend)
+        except (ImportError, ValueError):
+            return None
+        return LayoutTableParser() if backend.supports_words else None
+    
+    def iter_source_chunks(self, pdf_path: PdfSource) -> Iterator[str]:
+        """Escolhe a origem do texto: artefato salvo ou decodificação do PDF
+
+        O artefato fica ao lado do arquivo; um PDF em memória sem caminho
+        conhecido não tem onde salvá-lo.
+        """
+        if self.from_text:
+            meta = {}
+            for index, chunk in enumerate(iter_artifact_pages(artifact_path_for(pdf_path), meta)):
+                if self.target_pages and skip_page(index, chunk):
+                    self.skipped_pages.append(index)
+                else:
+                    yield chunk
+            self.text_backend = meta.get('backend')
+            return
+        
+        chunks = self.iter_text_chunks(pdf_path)
+        stored_path = pdf_path.path if isinstance(pdf_path, PdfInput) else pdf_path
+        if self.save_text and stored_path is None:
+            logger.warning(f"Texto não salvo: {pdf_path} não tem caminho no disco")
+        elif self.save_text:
+            chunks = save_pages(chunks, artifact_path_for(stored_path), source=stored_path,
+                                backend=lambda: self.text_backend)
+        yield from chunks
+    
+    def extract_text_from_pdf(self, pdf_path: PdfSource) -> str:
         """Extrai texto do PDF usando métodos básicos"""
         try:
-            # Tenta usar PyPDF2 se disponível
-            try:
-                import PyPDF2
-                with open(pdf_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
-                logger.info("Texto extraído com PyPDF2")
-                return text
-            except ImportError:
-                logger.warning("PyPDF2 não encontrado, tentando pdfplumber")
-            
-            # Tenta usar pdfplumber se disponível
-            try:
-                import pdfplumber
-                text = ""
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                logger.info("Texto extraído com pdfplumber")
-                return text
-            except ImportError:
-                logger.warning("pdfplumber não encontrado")
-            
-            # Se nenhuma biblioteca estiver disponível, retorna erro
-            raise ImportError("Nenhuma biblioteca de PDF encontrada. Instale PyPDF2 ou pdfplumber")
-            
+            return ''.join(self.iter_text_chunks(pdf_path))
         except Exception as e:
             logger.error(f"Erro ao extrair texto do PDF: {e}")
             return ""
     
     def extract_personal_data(self, text: str) -> Dict[str, str]:
-        """Extrai dados pessoais do texto"""
-        personal_data = {}
-        
-        # Padrões para CPF - melhorados
-        cpf_patterns = [
-            r'CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})',
-            r'NIT[:\s]*\d+\.\d+\s+CPF[:\s]*(\d{3}\.\d{3}\.\d{3}-\d{2})',
-            r'(\d{3}\.\d{3}\.\d{3}-\d{2})'
-        ]
-        
-        for pattern in cpf_patterns:
-            match = re.search(pattern, text)
-            if match:
-                personal_data['cpf'] = match.group(1)
-                break
-        
-        # Padrões para nome - melhorados para extrair corretamente
-        nome_patterns = [
-            # Padrão específico do CNIS: NIT + CPF + Nome na mesma linha
-            r'NIT[:\s]*[\d\.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data|$)',
-            # Padrão: Nome após CPF na mesma linha
-            r'CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data|$)',
-            # Padrão: Nome em linha específica com "Nome:"
-            r'Nome[:\s]+([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data|$)',
-            # Padrão: linha que parece ser nome completo (pelo menos 2 palavras, maiúsculas)
-            r'^([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ]+\s+[A-ZÁÊÇÕa-záêçõ\s]+)\s*$'
-        ]
-        
-        # Primeiro tenta encontrar o padrão específico do CNIS na linha completa
-        full_text_match = re.search(r'NIT[:\s]*[\d\.-]+\s+CPF[:\s]*\d{3}\.\d{3}\.\d{3}-\d{2}\s+Nome[:\s]*([A-ZÁÊÇÕ][A-ZÁÊÇÕa-záêçõ\s]+?)(?:\s+Data|$)', text, re.IGNORECASE)
-        if full_text_match:
-            nome = full_text_match.group(1).strip()
-            # Limpa o nome
-            nome = re.sub(r'[0-9\-\_\.\(\)\[\]]', '', nome)
-            nome = re.sub(r'\s+', ' ', nome)
-            nome = nome.strip()
-            if len(nome) > 5 and ' ' in nome:
-                personal_data['nome'] = nome.title()
-        
-        # Se não encontrou, tenta os outros padrões linha por linha
-        if 'nome' not in personal_data:
-            lines = text.split('\n')
-            for line in lines:
-                line = line.strip()
-                for pattern in nome_patterns:
-                    match = re.search(pattern, line, re.MULTILINE | re.IGNORECASE)
-                    if match:
-                        nome = match.group(1).strip()
-                        # Limpa o nome
-                        nome = re.sub(r'[0-9\-\_\.\(\)\[\]]', '', nome)
-                        nome = re.sub(r'\s+', ' ', nome)  # Remove espaços duplos
-                        nome = nome.strip()
-                        
-                        # Validações do nome
-                        if (len(nome) > 5 and 
-                            not nome.isdigit() and 
-                            ' ' in nome and  # Deve ter pelo menos nome e sobrenome
-                            not re.match(r'^(DATA|NASCIMENTO|CPF|NIT|EXTRATO)', nome.upper())):
-                            personal_data['nome'] = nome.title()
-                            break
-                if 'nome' in personal_data:
-                    break
+        """Extrai dados pessoais do texto
         
-        # Padrões para data de nascimento
-        nasc_patterns = [
-            r'Data de nascimento[:\s]*(\d{2}/\d{2}/\d{4})',
-            r'Nascimento[:\s]*(\d{2}/\d{2}/\d{4})'
-        ]
-        
-        for pattern in nasc_patterns:
-            match = re.search(pattern, text)
-            if match:
-                personal_data['data_nascimento'] = match.group(1)
-                break
-        
-        return personal_data
+        Procura no bloco de identificação e só percorre o texto inteiro para
+        os campos que faltarem.
+        """
+        header = PersonalDataScanner.from_header(text)
+        if not header.missing():
+            return header.result()
+        scanner = PersonalDataScanner()
+        scanner.feed(text)
+        return {**scanner.result(), **header.result()}
     
     def extract_employment_data(self, text: str) -> List[Dict[str, str]]:
         """Extrai dados de vínculos empregatícios"""
-        employments = []
+        return list(self.iter_employment_data(tokenize(text.split('\n'))))
+    
+    def iter_employment_data(self, tokens: Iterable[LineToken]) -> Iterator[Dict[str, str]]:
+        """Gera cada vínculo, no formato JSON, assim que a sua seção é concluída"""
+        for vinculo in self.iter_vinculos(tokens):
+            yield vinculo_to_simple(vinculo)
+    
+    def iter_tokens(self, chunks: Iterable[str]) -> Iterator[LineToken]:
+        """Classifica as linhas do texto, página a página"""
+        if self.metrics is None:
+            return tokenize(iter_lines(chunks))
+        return self.iter_timed_tokens(chunks)
+    
+    def iter_layout_vinculos(self, chunks: Iterable[str]) -> Iterator[Vinculo]:
+        """Vínculos lidos pelas coordenadas, com o texto como alternativa
         
-        # Divide o texto em seções
-        sections = self.split_into_employment_sections(text)
+        As páginas chegam a este ponto já processadas pelo parser (ver
+        iter_layout_texts). Até o parser abrir o primeiro vínculo pelas
+        colunas elas ficam guardadas: se antes disso ele falhar ou surgir uma
+        página digitalizada (OCR, sem coordenadas), essas páginas e as
+        seguintes passam pelo divisor de seções, assim como o documento
+        inteiro quando a tabela não aparece.
+        """
+        parser = self.layout_parser
+        chunks = iter(chunks)
+        timed = chunks if self.metrics is None else self.metrics.timed('decode', chunks)
+        pending = []
+        committed = False
+        ocr_seen = 0
+        for chunk in timed:
+            if not committed:
+                pending.append(chunk)
+                if parser.failed or self.ocr_pages:
+                    break
+                if not parser.started:
+                    continue
+                committed = True
+                pending = []
+            elif len(self.ocr_pages) > ocr_seen:
+                logger.warning(f"Página {self.ocr_pages[-1] + 1} digitalizada: fora da leitura por coordenadas")
+            ocr_seen = len(self.ocr_pages)
+            for vinculo in parser.drain():
+                if self.metrics is not None:
+                    self.metrics.count('vinculos')
+                yield vinculo
         
-        for section in sections:
-            employment = self.extract_employment_from_section(section)
-            if employment and employment.get('empregador'):
-                employments.append(employment)
+        if committed:
+            for vinculo in parser.finish():
+                if self.metrics is not None:
+                    self.metrics.count('vinculos')
+                yield vinculo
+            return
+        if not pending:
+            # Nenhuma página lida (PDF ilegível ou sem páginas)
+            return
         
-        return employments
+        logger.info("Tabela de vínculos não encontrada pelas coordenadas, usando o texto")
+        if self.metrics is not None:
+            self.metrics.count('fallback_layout')
+        yield from self.iter_vinculos(self.iter_tokens(chain(pending, chunks)))
+    
+    def iter_vinculos(self, tokens: Iterable[LineToken]) -> Iterator[Vinculo]:
+        """Gera cada vínculo assim que a sua seção é concluída"""
+        sections = self.iter_token_sections(tokens)
+        if self.metrics is not None:
+            sections = self.metrics.timed('split', sections)
+        for section in sections:
+            with self.stage('extract'):
+                vinculo = self.extract_vinculo_from_tokens(section)
+            if vinculo is not None:
+                if self.metrics is not None:
+                    self.metrics.count('vinculos')
+                yield vinculo
+    
+    def stage(self, name: str):
+        """Mede o bloco como uma etapa quando as métricas estão habilitadas"""
+        return self.metrics.stage(name) if self.metrics is not None else nullcontext()
+    
+    def iter_timed_tokens(self, chunks: Iterable[str]) -> Iterator[LineToken]:
+        """Classifica as linhas página a página, medindo decodificação e tokenização"""
+        metrics = self.metrics
+        batches = iter_line_batches(metrics.timed('decode', chunks))
+        for tokens in metrics.timed('tokenize', (list(tokenize(lines)) for lines in batches)):
+            metrics.count('lines', len(tokens))
+            yield from tokens
     
     def split_into_employment_sections(self, text: str) -> List[str]:
         """Divide o texto em seções de vínculos empregatícios"""
-        sections = []
-        lines = text.split('\n')
+        sections = self.iter_token_sections(tokenize(text.split('\n')))
+        return ['\n'.join(token.text for token in section) for section in sections]
+    
+    def split_token_sections(self, tokens: Iterable[LineToken]) -> List[List[LineToken]]:
+        """Divide as linhas classificadas em seções de vínculos empregatícios"""
+        return list(self.iter_token_sections(tokens))
+    
+    def iter_token_sections(self, tokens: Iterable[LineToken]) -> Iterator[List[LineToken]]:
+        """Consome as linhas classificadas e gera cada seção de vínculo assim que termina
+        
+        Guarda apenas a seção aberta e uma janela de duas linhas antes e depois
+        da linha atual, usada para decidir o início de seção.
+        """
         current_section = []
         in_employment_section = False
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            
-            # Identifica início de uma seção de vínculo (padrões melhorados)
-            is_start_of_section = (
-                re.match(r'^Código Emp\.', line) or 
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?', line) or
-                re.match(r'^\d+\s+AGRUPAMENTO', line) or
-                # Novo padrão: linha que começa com número seguido de CNPJ
-                re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}', line) or
-                # Padrão para seções que podem ter CNPJ na linha seguinte
-                (re.match(r'^\d+\s+[A-Z]', line) and i + 1 < len(lines) and 
-                 re.search(r'\d{2}\.\d{3}\.\d{3}', lines[i + 1]))
-            )
-            
-            if is_start_of_section:
-                # Salva a seção anterior se existir
-                if current_section:
-                    sections.append('\n'.join(current_section))
+        it = iter(tokens)
+        prev2 = prev1 = None
+        token = next(it, None)
+        next1 = next(it, None)
+        next2 = next(it, None)
+        
+        while token is not None:
+            # Identifica início de uma seção de vínculo (código + CNPJ, AGRUPAMENTO,
+            # cabeçalho "Código Emp." ou código + nome com CNPJ na linha seguinte)
+            if token.is_section_start(next1):
+                # Emite a seção anterior se existir
+                if current_section and self.keep_section(current_section):
+                    yield current_section
                 
-                current_section = [line]
+                current_section = [token]
                 in_employment_section = True
                 
                 # Se o CNPJ está na próxima linha, inclui ela também
-                if (i + 1 < len(lines) and 
-                    not re.search(r'\d{2}\.\d{3}\.\d{3}', line) and
-                    re.search(r'\d{2}\.\d{3}\.\d{3}', lines[i + 1])):
-                    current_section.append(lines[i + 1].strip())
+                if next1 is not None and token.cnpj is None and next1.cnpj is not None:
+                    current_section.append(next1)
                     
             elif in_employment_section:
-                current_section.append(line)
+                current_section.append(token)
                 
-                # Identifica fim da seção (padrões melhorados)
-                is_end_of_section = (
-                    re.match(r'^Relações Previdenciárias', line) or
-                    re.match(r'^Valores Consolidados', line) or
-                    re.match(r'^Legenda', line) or
-                    re.match(r'^TOTAIS', line) or
-                    # Nova seção começando
-                    (re.match(r'^\d+\s+\d{2}\.\d{3}\.\d{3}', line) and len(current_section) > 5) or
-                    (re.match(r'^\d+\s+AGRUPAMENTO', line) and len(current_section) > 5) or
-                    # Linha vazia seguida de padrão de nova seção
-                    (not line and i + 1 < len(lines) and 
-                     re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}|AGRUPAMENTO)', lines[i + 1].strip()))
-                )
-                
-                if is_end_of_section:
-                    if re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}|AGRUPAMENTO)', line):
-                        # Nova seção começando, remove esta linha da atual
-                        current_section.pop()
-                        sections.append('\n'.join(current_section))
-                        current_section = [line]
-                    else:
-                        sections.append('\n'.join(current_section))
-                        current_section = []
-                        in_employment_section = False
+                # Identifica fim da seção
+                if token.kind == TERMINADOR:
+                    if self.keep_section(current_section):
+                        yield current_section
+                    current_section = []
+                    in_employment_section = False
             
             # Se não está em seção mas encontra linha com CNPJ isolado, pode ser início de seção
-            elif not in_employment_section and re.match(r'^\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?', line):
+            elif token.kind == CNPJ_ISOLADO:
                 # Verifica se há contexto de empregador nas linhas anteriores ou seguintes
-                has_context = False
-                for j in range(max(0, i-2), min(len(lines), i+3)):
-                    if j != i and re.search(r'[A-Z]{3,}', lines[j]):
-                        has_context = True
-                        break
+                has_context = any(
+                    neighbor is not None and neighbor.upper_run >= 3
+                    for neighbor in (prev2, prev1, next1, next2)
+                )
                 
                 if has_context:
-                    current_section = [line]
+                    if self.metrics is not None:
+                        self.metrics.count('fallback_secao_cnpj_isolado')
+                    current_section = [token]
                     in_employment_section = True
+            
+            prev2, prev1, token, next1, next2 = prev1, token, next1, next2, next(it, None)
         
-        # Adiciona a última seção se existir
-        if current_section:
-            sections.append('\n'.join(current_section))
-        
-        # Filtra seções muito pequenas que provavelmente não são vínculos
-        filtered_sections = []
-        for section in sections:
-            section_lines = [l.strip() for l in section.split('\n') if l.strip()]
-            # Mantém seções que tenham pelo menos CNPJ ou nome de empresa
-            if (len(section_lines) >= 2 and 
-                (re.search(r'\d{2}\.\d{3}\.\d{3}', section) or 
-                 re.search(r'[A-Z]{5,}', section) or
-                 re.search(r'AGRUPAMENTO', section))):
-                filtered_sections.append(section)
-        
-        return filtered_sections
+        # Emite a última seção se existir
+        if current_section and self.keep_section(current_section):
+            yield current_section
+    
+    def keep_section(self, section: List[LineToken]) -> bool:
+        """Aplica o filtro de seções, contando as encontradas e as descartadas"""
+        keep = self.is_employment_section(section)
+        if self.metrics is not None:
+            self.metrics.count('sections')
+            if not keep:
+                self.metrics.count('sections_rejected')
+        return keep
+    
+    def is_employment_section(self, section: List[LineToken]) -> bool:
+        """Descarta seções muito pequenas que provavelmente não são vínculos"""
+        # Mantém seções que tenham pelo menos CNPJ ou nome de empresa
+        return (sum(1 for token in section if token.text) >= 2 and
+                any(token.cnpj is not None or token.upper_run >= 5 for token in section))
     
     def extract_employment_from_section(self, section: str) -> Optional[Dict[str, str]]:
         """Extrai dados de um vínculo empregatício de uma seção"""
-        employment = {
-            'empregador': '',
-            'cnpj': '',
-            'data_inicio': '',
-            'data_fim': ''
-        }
-        
-        lines = section.split('\n')
-        full_text = ' '.join(lines)  # Junta tudo para tratar CNPJ em múltiplas linhas
-        
-        # Extrai CNPJ completo primeiro (pode estar em múltiplas linhas)
-        cnpj_patterns = [
-            r'(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})',  # CNPJ completo
-            r'(\d{2}\.\d{3}\.\d{3})',              # CNPJ incompleto
-        ]
-        
-        for pattern in cnpj_patterns:
-            match = re.search(pattern, full_text)
-            if match:
-                employment['cnpj'] = match.group(1)
+        return self.extract_employment_from_tokens(list(tokenize(section.split('\n'))))
+    
+    def collect_employer_name(self, empregador: str, tokens: List[LineToken], start: int,
+                              max_lines: int, long_keywords: bool) -> str:
+        """Junta ao nome do empregador as linhas seguintes que continuam o nome"""
+        for token in tokens[start:start + max_lines]:
+            # Para se encontrar data, número, palavra-chave ou linha curta
+            has_keyword = token.kw_long if long_keywords else token.kw_short
+            if token.starts_digit or has_keyword or len(token.text) < 3:
                 break
+            empregador += ' ' + token.text
+        return empregador
+    
+    def extract_employment_from_tokens(self, tokens: List[LineToken]) -> Optional[Dict[str, str]]:
+        """Extrai dados de um vínculo empregatício das linhas classificadas de uma seção"""
+        vinculo = self.extract_vinculo_from_tokens(tokens)
+        return vinculo_to_simple(vinculo) if vinculo is not None else None
+    
+    def extract_vinculo_from_tokens(self, tokens: List[LineToken]) -> Optional[Vinculo]:
+        """Extrai o vínculo das linhas classificadas de uma seção"""
+        patterns = active_patterns()
+        nome = ''
+        data_inicio = ''
+        data_fim = ''
         
-        # Extrai empregador - melhorado para lidar com múltiplas linhas
+        # Extrai CNPJ completo primeiro (pode estar em qualquer linha da seção)
+        cnpj = next((token.cnpj_full for token in tokens if token.cnpj_full), None)
+        if cnpj is None:
+            cnpj = next((token.cnpj for token in tokens if token.cnpj), None)
+            if cnpj is not None and self.metrics is not None:
+                self.metrics.count('fallback_cnpj_parcial')
+        cnpj = cnpj or ''
+        
+        # Extrai empregador - linha com código + CNPJ + nome ou AGRUPAMENTO
         empregador_found = False
-        for i, line in enumerate(lines):
-            line = line.strip()
+        for i, token in enumerate(tokens):
+            if token.employer is None:
+                continue
             
-            # Padrão: linha com código + CNPJ + nome do empregador
-            empregador_match = re.match(r'^\d+\s+(\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?)\s+(.+)$', line)
-            if empregador_match:
-                if not employment['cnpj']:
-                    employment['cnpj'] = empregador_match.group(1)
-                empregador = empregador_match.group(3).strip()
-                
-                # Coleta linhas subsequentes que podem ser continuação do nome
-                for j in range(i + 1, min(i + 4, len(lines))):  # Máximo 3 linhas adicionais
-                    next_line = lines[j].strip()
-                    
-                    # Para se encontrar padrão de data, número ou palavra-chave
-                    if (re.match(r'^\d{2}/\d{2}/\d{4}', next_line) or 
-                        re.match(r'^\d+', next_line) or
-                        re.search(r'(Empregado|Contribuinte|Data|Início|Fim|Remuneração)', next_line, re.IGNORECASE) or
-                        len(next_line) < 3):
-                        break
-                    
-                    # Se a linha parece ser continuação do nome (sem números no início)
-                    if not re.match(r'^\d', next_line) and len(next_line) > 2:
-                        empregador += ' ' + next_line
-                    else:
-                        break
-                
-                # Limpa o nome do empregador
-                empregador = re.sub(r'\s*(Empregado ou Agente|Contribuinte Individual).*$', '', empregador, flags=re.IGNORECASE)
-                empregador = re.sub(r'\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?', '', empregador)
-                empregador = re.sub(r'\s+', ' ', empregador.strip())  # Remove espaços duplos
-                employment['empregador'] = empregador
-                empregador_found = True
-                break
+            empregador = token.employer.strip()
+            if token.kind == VINCULO:
+                if not cnpj:
+                    cnpj = token.header_cnpj
+                # Coleta até 3 linhas que podem ser continuação do nome
+                empregador = self.collect_employer_name(empregador, tokens, i + 1, 3, True)
+            else:
+                empregador = self.collect_employer_name(empregador, tokens, i + 1, 2, False)
             
-            # Padrão para AGRUPAMENTO
-            agrupamento_match = re.match(r'^\d+\s+(AGRUPAMENTO.+)$', line)
-            if agrupamento_match:
-                empregador = agrupamento_match.group(1).strip()
-                
-                # Coleta linhas subsequentes para AGRUPAMENTO também
-                for j in range(i + 1, min(i + 3, len(lines))):
-                    next_line = lines[j].strip()
-                    if (re.match(r'^\d{2}/\d{2}/\d{4}', next_line) or 
-                        re.match(r'^\d+', next_line) or
-                        re.search(r'(Empregado|Contribuinte|Data)', next_line, re.IGNORECASE)):
-                        break
-                    if not re.match(r'^\d', next_line) and len(next_line) > 2:
-                        empregador += ' ' + next_line
-                    else:
-                        break
-                
-                empregador = re.sub(r'\s*(Empregado ou Agente|Contribuinte Individual).*$', '', empregador, flags=re.IGNORECASE)
-                empregador = re.sub(r'\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?', '', empregador)
-                empregador = re.sub(r'\s+', ' ', empregador.strip())
-                employment['empregador'] = empregador
-                empregador_found = True
-                break
+            # Limpa o nome do empregador
+            empregador = patterns.empregador_sufixo.sub('', empregador)
+            empregador = patterns.empregador_cnpj_opcional.sub('', empregador)
+            empregador = patterns.texto_espacos.sub(' ', empregador.strip())
+            nome = empregador
+            empregador_found = True
+            break
         
         # Se não encontrou o empregador pelos padrões acima, tenta buscar por texto livre
-        if not empregador_found and employment['cnpj']:
+        if not empregador_found and cnpj:
             # Busca texto após CNPJ na mesma linha ou linhas subsequentes
-            cnpj_pattern = re.escape(employment['cnpj'])
-            for i, line in enumerate(lines):
-                if re.search(cnpj_pattern, line):
+            for i, token in enumerate(tokens):
+                if cnpj in token.text:
                     # Remove CNPJ e números da linha
-                    clean_line = re.sub(r'\d{2}\.\d{3}\.\d{3}(/\d{4}-\d{2})?', '', line)
-                    clean_line = re.sub(r'^\d+\s*', '', clean_line)
+                    clean_line = patterns.empregador_cnpj_opcional.sub('', token.text)
+                    clean_line = patterns.empregador_numero_inicial.sub('', clean_line)
                     clean_line = clean_line.strip()
                     
                     if len(clean_line) > 3:
-                        empregador = clean_line
-                        
-                        # Adiciona linhas subsequentes se necessário
-                        for j in range(i + 1, min(i + 3, len(lines))):
-                            next_line = lines[j].strip()
-                            if (re.match(r'^\d{2}/\d{2}/\d{4}', next_line) or 
-                                re.match(r'^\d+', next_line) or
-                                re.search(r'(Empregado|Contribuinte|Data)', next_line, re.IGNORECASE)):
-                                break
-                            if not re.match(r'^\d', next_line) and len(next_line) > 2:
-                                empregador += ' ' + next_line
-                            else:
-                                break
-                        
-                        empregador = re.sub(r'\s*(Empregado ou Agente|Contribuinte Individual).*$', '', empregador, flags=re.IGNORECASE)
-                        empregador = re.sub(r'\s+', ' ', empregador.strip())
-                        employment['empregador'] = empregador
+                        if self.metrics is not None:
+                            self.metrics.count('fallback_empregador_texto_livre')
+                        empregador = self.collect_employer_name(clean_line, tokens, i + 1, 2, False)
+                        empregador = patterns.empregador_sufixo.sub('', empregador)
+                        empregador = patterns.texto_espacos.sub(' ', empregador.strip())
+                        nome = empregador
                         break
         
         # Extrai datas - melhorado para evitar confundir com data de nascimento
-        data_nascimento = None
-        
-        # Primeiro, identifica a data de nascimento se presente
-        for line in lines:
-            nasc_match = re.search(r'(Data de nascimento|Nascimento)[:\s]*(\d{2}/\d{2}/\d{4})', line, re.IGNORECASE)
-            if nasc_match:
-                data_nascimento = nasc_match.group(2)
-                break
+        data_nascimento = next((token.nasc_date for token in tokens if token.nasc_date), None)
         
         # Agora extrai datas de vínculo, excluindo a data de nascimento
+        # (só as duas primeiras distintas são usadas: para de procurar ao
+        # achá-las, em vez de percorrer todo o histórico de competências)
         dates_found = []
-        for line in lines:
-            line = line.strip()
-            
+        for token in tokens:
+            if len(dates_found) >= 2:
+                break
             # Pula linhas que claramente são sobre nascimento
-            if re.search(r'(nascimento|nasc\.)', line, re.IGNORECASE):
+            if token.nasc:
                 continue
             
-            # Encontra todas as datas na linha
-            date_matches = re.findall(r'\d{2}/\d{2}/\d{4}', line)
-            for date in date_matches:
+            for date in token.full_dates:
                 if data_nascimento and date == data_nascimento:
                     continue
                 if date not in dates_found:
                     dates_found.append(date)
             
             # Também procura por padrões MM/YYYY
-            month_year_matches = re.findall(r'\d{2}/\d{4}', line)
-            for month_year in month_year_matches:
-                # Valida se é uma data válida antes de converter
-                month_match = re.match(r'(\d{2})/(\d{4})', month_year)
-                if month_match:
-                    month = int(month_match.group(1))
-                    year = int(month_match.group(2))
-                    # Só aceita meses válidos e anos razoáveis
-                    if 1 <= month <= 12 and 1900 <= year <= 2100:
-                        full_date = self.convert_month_year_to_full_date(month_year)
-                        if full_date not in dates_found:
-                            dates_found.append(full_date)
+            for month_year in token.month_years:
+                month = int(month_year[:2])
+                year = int(month_year[3:])
+                # Só aceita meses válidos e anos razoáveis
+                if 1 <= month <= 12 and 1900 <= year <= 2100:
+                    full_date = self.convert_month_year_to_full_date(month_year)
+                    if full_date not in dates_found:
+                        dates_found.append(full_date)
         
         # Atribui as datas encontradas
         if len(dates_found) >= 2:
-            employment['data_inicio'] = dates_found[0]
-            employment['data_fim'] = dates_found[1]
+            data_inicio = dates_found[0]
+            data_fim = dates_found[1]
         elif len(dates_found) == 1:
-            employment['data_inicio'] = dates_found[0]
-            employment['data_fim'] = ''
+            data_inicio = dates_found[0]
+            data_fim = ''
         
         # Se não encontrou datas pelo método acima, tenta padrões específicos
-        if not employment['data_inicio']:
-            for line in lines:
-                line = line.strip()
-                
-                # Padrões de datas de vínculo
-                date_patterns = [
-                    (r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})', 2),  # Duas datas completas
-                    (r'(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{4})', 1),       # Data completa + MM/YYYY
-                    (r'(\d{2}/\d{2}/\d{4})', 0)                        # Uma data
-                ]
+        # (só ocorre quando as únicas datas da seção são de nascimento)
+        if not data_inicio:
+            if self.metrics is not None:
+                self.metrics.count('fallback_datas_regex')
+            for token in tokens:
+                if not token.full_dates:
+                    continue
+                line = token.text
                 
-                for pattern, date_count in date_patterns:
-                    matches = re.findall(pattern, line)
+                for name, date_count in DATE_PATTERNS:
+                    matches = patterns[name].findall(line)
                     for match in matches:
                         if isinstance(match, tuple):
                             date1 = str(match[0]) if date_count >= 0 else str(match)
@@ -438,33 +797,37 @@ class CNISExtractorSimple:
                             continue
                         
                         if date_count == 2 and date2:
-                            employment['data_inicio'] = date1
-                            employment['data_fim'] = date2
+                            data_inicio = date1
+                            data_fim = date2
                             break
                         elif date_count == 1 and date2:
-                            employment['data_inicio'] = date1
-                            employment['data_fim'] = self.convert_month_year_to_full_date(date2)
+                            data_inicio = date1
+                            data_fim = self.convert_month_year_to_full_date(date2)
                             break
                         else:
-                            if not employment['data_inicio']:
-                                employment['data_inicio'] = date1
-                            elif not employment['data_fim'] and date1 != employment['data_inicio']:
-                                employment['data_fim'] = date1
+                            if not data_inicio:
+                                data_inicio = date1
+                            elif not data_fim and date1 != data_inicio:
+                                data_fim = date1
                     
-                    if employment['data_inicio']:
+                    if data_inicio:
                         break
         
-        # Se não encontrou data de fim, deixa vazio (indica vínculo ativo)
-        if not employment['data_fim']:
-            employment['data_fim'] = ''
+        if not nome:
+            return None
+        
+        # Série completa de competências e salários-de-contribuição
+        # (todas as linhas: o valor pode vir na linha seguinte à competência)
+        remuneracoes = Remuneracoes.from_lines(token.text for token in tokens if not token.nasc)
         
-        return employment if employment['empregador'] else None
+        # Sem data de fim, o vínculo está ativo
+        return Vinculo.from_fields(nome, cnpj, data_inicio, data_fim, remuneracoes)
     
     def convert_month_year_to_full_date(self, month_year: str) -> str:
         """Converte MM/YYYY para o último dia do mês"""
         import datetime
         
-        match = re.match(r'(\d{2})/(\d{4})', month_year)
+        match = active_patterns().vinculo_mes_ano.match(month_year)
         if match:
             try:
                 month = int(match.group(1))
@@ -488,39 +851,150 @@ class CNISExtractorSimple:
         
         return month_year
     
-    def process_cnis(self, pdf_path: str) -> Dict[str, Any]:
-        """Processa o arquivo CNIS e extrai todos os dados"""
+    def process_cnis(self, pdf_path: PdfSource,
+                     on_vinculo: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Processa o arquivo CNIS, com o bloco 'metrics' quando habilitado
+        
+        pdf_path é o caminho do PDF ou um PdfInput com o conteúdo em memória
+        (stdin, descritor herdado ou mmap). on_vinculo recebe cada vínculo
+        (no formato JSON) assim que é extraído; em acertos de cache não é
+        chamado.
+        """
+        self.metrics = Metrics() if self.collect_metrics else None
+        if self.profile_patterns:
+            patterns = PATTERNS.profiled()
+            with using_patterns(patterns):
+                result = self.process_cnis_cached(pdf_path, on_vinculo)
+            result = {**result, 'pattern_profile': patterns.snapshot()}
+        else:
+            result = self.process_cnis_cached(pdf_path, on_vinculo)
+        if self.metrics is not None:
+            result = {**result, 'metrics': self.metrics.as_dict()}
+        return result
+    
+    def process_cnis_cached(self, pdf_path: PdfSource,
+                            on_vinculo: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Processa o arquivo CNIS, consultando o cache quando habilitado"""
+        if self.cache is None or self.from_text:
+            return self.extract_cnis(pdf_path, on_vinculo)
+        
+        cache_key = None
+        try:
+            with self.stage('cache'):
+                cache_key = self.cache.key_for(source_digest(pdf_path))
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Resultado obtido do cache: {pdf_path}")
+                if self.metrics is not None:
+                    self.metrics.count('cache_hits')
+                return cached
+        except OSError as e:
+            logger.warning(f"Cache indisponível: {e}")
+        
+        result = self.extract_cnis(pdf_path, on_vinculo)
+        
+        if cache_key and result.get('success'):
+            try:
+                with self.stage('cache'):
+                    self.cache.set(cache_key, result)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar no cache: {e}")
+        
+        return result
+    
+    def extract_cnis(self, pdf_path: PdfSource,
+                     on_vinculo: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Extrai todos os dados do arquivo CNIS
+        
+        O texto flui página a página e é quebrado em linhas que seguem direto
+        para o divisor de seções, sem montar o documento inteiro em memória.
+        Os dados pessoais são lidos do bloco de identificação da primeira
+        página com texto, antes de a busca de vínculos começar; só quando
+        falta algum campo as páginas também alimentam uma busca no documento
+        inteiro. 'personal_source' informa o caminho usado ('header' ou
+        'document').
+        """
         try:
             logger.info(f"Processando arquivo: {pdf_path}")
             
-            # Extrai texto do PDF
-            text = self.extract_text_from_pdf(pdf_path)
+            self.text_backend = None
+            self.ocr_pages = []
+            self.skipped_pages = []
+            personal = {'header': None, 'document': None}
+            stats = {'text_length': 0, 'has_text': False, 'error': None}
             
-            if not text.strip():
+            def pages() -> Iterator[str]:
+                try:
+                    for chunk in self.iter_source_chunks(pdf_path):
+                        stats['text_length'] += len(chunk)
+                        if not stats['has_text'] and chunk.strip():
+                            stats['has_text'] = True
+                        if self.metrics is not None:
+                            self.metrics.count('pages')
+                        if personal['header'] is None and chunk.strip():
+                            with self.stage('personal'):
+                                personal['header'] = PersonalDataScanner.from_header(chunk)
+                            missing = personal['header'].missing()
+                            if missing:
+                                logger.info(f"Campos fora do bloco de identificação: {', '.join(missing)}")
+                                personal['document'] = PersonalDataScanner()
+                        if personal['document'] is not None:
+                            with self.stage('personal_fallback'):
+                                personal['document'].feed(chunk)
+                        yield chunk
+                except Exception as e:
+                    logger.error(f"Erro ao extrair texto do PDF: {e}")
+                    stats['error'] = e
+            
+            # Extrai vínculos enquanto as páginas são lidas
+            self.layout_parser = self.create_layout_parser()
+            if self.layout_parser is not None:
+                vinculo_source = self.iter_layout_vinculos(pages())
+            else:
+                vinculo_source = self.iter_vinculos(self.iter_tokens(pages()))
+            vinculos = []
+            for vinculo in vinculo_source:
+                vinculos.append(vinculo)
+                if on_vinculo is not None:
+                    with self.stage('emit'):
+                        on_vinculo(vinculo_to_simple(vinculo))
+            
+            if stats['error'] is not None or not stats['has_text']:
                 return {
                     'success': False,
                     'error': 'Não foi possível extrair texto do PDF'
                 }
             
-            # Extrai dados
-            personal_data = self.extract_personal_data(text)
-            employment_data = self.extract_employment_data(text)
+            personal_data = personal['header'].result()
+            if personal['document'] is not None:
+                if self.metrics is not None:
+                    self.metrics.count('personal_fallback')
+                personal_data = {**personal['document'].result(), **personal_data}
             
-            # Mapeia os dados para o formato esperado
-            result_data = {
-                'client_name': personal_data.get('nome', ''),
-                'client_cpf': personal_data.get('cpf', ''),
-                'vinculos_empregaticios': employment_data
-            }
+            extraction = ExtractionResult(
+                personal=PersonalData.from_fields(**personal_data),
+                vinculos=vinculos,
+                text_length=stats['text_length'],
+                backend=self.text_backend,
+                ocr_pages=self.ocr_pages,
+                skipped_pages=self.skipped_pages
+            )
             
-            result = {
-                'success': True,
-                'data': result_data,
-                'text_length': len(text)
-            }
+            # Mapeia os dados para o formato esperado
+            with self.stage('serialize'):
+                result = result_to_simple(extraction)
+            result['personal_source'] = 'document' if personal['document'] is not None else 'header'
             
-            logger.info(f"Extraídos {len(employment_data)} vínculos empregatícios")
-            logger.info(f"Nome do cliente: {result_data['client_name']}")
+            if self.ocr_pages:
+                if self.metrics is not None:
+                    self.metrics.count('ocr_pages', len(self.ocr_pages))
+                logger.info(f"OCR aplicado em {len(self.ocr_pages)} página(s)")
+            if self.skipped_pages:
+                if self.metrics is not None:
+                    self.metrics.count('skipped_pages', len(self.skipped_pages))
+                logger.info(f"Páginas sem vínculos dispensadas: {len(self.skipped_pages)}")
+            logger.info(f"Extraídos {len(vinculos)} vínculos empregatícios")
+            logger.info(f"Nome do cliente: {result['data']['client_name']}")
             return result
             
         except Exception as e:
@@ -530,22 +1004,196 @@ class CNISExtractorSimple:
                 'error': str(e)
             }
 
+def reads_stream(args: argparse.Namespace) -> bool:
+    """Indica se o PDF chega pelo stdin ('-') ou por um descritor herdado"""
+    return args.input_fd is not None or args.pdf_path == '-'
+
+def input_label(args: argparse.Namespace) -> str:
+    """Identificação da origem do PDF nos logs e no cabeçalho NDJSON"""
+    if args.input_fd is not None:
+        return f"fd:{args.input_fd}"
+    return '<stdin>' if args.pdf_path == '-' else args.pdf_path
+
+def open_input(args: argparse.Namespace) -> PdfSource:
+    """Origem do PDF no modo arquivo: caminho, stdin, descritor herdado ou mmap
+    
+    Feche com close_input depois do processamento.
+    """
+    if args.input_fd is not None:
+        return PdfInput.from_fd(args.input_fd)
+    if args.pdf_path == '-':
+        return PdfInput.from_stdin()
+    if args.mmap and not args.from_text:
+        return PdfInput.from_path(args.pdf_path)
+    return args.pdf_path
+
+def close_input(source: PdfSource) -> None:
+    if isinstance(source, PdfInput):
+        source.close()
+
+def run_ndjson(extractor_factory: Callable[[], CNISExtractorSimple], args: argparse.Namespace) -> None:
+    """Modo arquivo com saída NDJSON no stdout (ou em --output)"""
+    stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        writer = NDJSONWriter(stream)
+        writer.header(input_label(args))
+        
+        input_path = artifact_path_for(args.pdf_path) if args.from_text else args.pdf_path
+        if not reads_stream(args) and not Path(input_path).exists():
+            logger.error(f"Arquivo não encontrado: {input_path}")
+            writer.trailer({'success': False, 'error': f"Arquivo não encontrado - {input_path}"})
+            sys.exit(1)
+        
+        try:
+            source = open_input(args)
+        except (OSError, ValueError) as e:
+            logger.error(f"Não foi possível ler o PDF de {input_label(args)}: {e}")
+            writer.trailer({'success': False, 'error': f"Não foi possível ler o PDF - {e}"})
+            sys.exit(1)
+        
+        try:
+            extractor = extractor_factory()
+            result = extractor.process_cnis(source, on_vinculo=writer.vinculo)
+        finally:
+            close_input(source)
+        profile = result.pop('pattern_profile', None)
+        writer.trailer(result)
+    finally:
+        if args.output:
+            stream.close()
+    
+    if args.output:
+        logger.info(f"Resultado salvo em: {args.output}")
+    if profile:
+        print(format_report(profile), file=sys.stderr)
+
 def main():
     """Função principal para execução via linha de comando"""
     parser = argparse.ArgumentParser(description='Extrator de dados do CNIS - Versão Simplificada')
-    parser.add_argument('pdf_path', help='Caminho para o arquivo PDF do CNIS')
+    parser.add_argument('pdf_path', nargs='?', help="Caminho para o arquivo PDF do CNIS ('-' lê o PDF do stdin)")
+    parser.add_argument('--input-fd', type=int,
+                        help='Lê o PDF deste descritor de arquivo herdado (mapeado em memória '
+                             'quando é um arquivo regular)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Mapeia o PDF em memória para o hash do cache e os backends pypdf e '
+                             'pdfplumber (o PyMuPDF reabre o arquivo pelo caminho)')
     parser.add_argument('--output', help='Arquivo de saída JSON (opcional)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Modo servidor: mantém workers aquecidos e atende requisições JSON-lines')
+    parser.add_argument('--socket', help='Socket Unix do modo servidor (padrão: stdin/stdout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Número de workers dos modos servidor, lote e fila')
+    parser.add_argument('--max-requests-per-worker', type=int,
+                        help='Recicla cada worker após N requisições (opcional)')
+    parser.add_argument('--cache-dir', default=os.environ.get('CNIS_CACHE_DIR'),
+                        help='Diretório do cache de resultados (padrão: storage/framework/cache/cnis)')
+    parser.add_argument('--no-cache', action='store_true', help='Desabilita o cache de resultados')
+    parser.add_argument('--save-text', action='store_true',
+                        help='Salva o texto extraído de cada página ao lado do PDF (.cnis-text.jsonl.gz)')
+    parser.add_argument('--from-text', action='store_true',
+                        help='Lê o texto do artefato salvo com --save-text em vez de decodificar o PDF')
+    parser.add_argument('--backend', choices=sorted(BACKENDS_BY_NAME),
+                        help='Biblioteca de PDF (padrão: a mais rápida instalada)')
+    parser.add_argument('--page-workers', type=int,
+                        help='Processos para decodificar páginas de PDFs grandes '
+                             '(padrão: todos os núcleos para um arquivo, 1 nos modos servidor e lote)')
+    parser.add_argument('--parallel-threshold', type=int, default=PARALLEL_PAGE_THRESHOLD,
+                        help='Número mínimo de páginas para decodificar em paralelo')
+    parser.add_argument('--all-pages', action='store_true',
+                        help='Extrai o texto de todas as páginas, inclusive legendas, resumos e benefícios')
+    parser.add_argument('--no-layout', action='store_true',
+                        help='Lê a tabela de vínculos pelo texto mesmo quando o backend fornece '
+                             'as coordenadas das palavras')
+    parser.add_argument('--no-ocr', action='store_true',
+                        help='Não aplica OCR às páginas sem camada de texto')
+    parser.add_argument('--ocr-dpi', type=int, default=DEFAULT_OCR_DPI,
+                        help='Resolução da rasterização das páginas para OCR')
+    parser.add_argument('--ocr-lang', default=DEFAULT_OCR_LANG, help='Idioma do Tesseract')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Inclui no resultado o bloco "metrics" (tempos por etapa e contadores)')
+    parser.add_argument('--metrics-textfile',
+                        help='Nos modos servidor e lote, grava métricas agregadas neste arquivo '
+                             '(textfile do Prometheus); implica --metrics')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='Saída do modo arquivo: JSON único ou NDJSON (cabeçalho, um registro '
+                             'por vínculo assim que extraído e trailer com contagens e métricas)')
+    parser.add_argument('--quiet', action='store_true', help='Suprime os logs (exceto erros) no stderr')
+    parser.add_argument('--profile-patterns', action='store_true',
+                        help='Mede cada expressão regular (chamadas, acertos, tempo) e imprime no stderr '
+                             'o relatório ordenado pelo custo, por documento ou para o lote inteiro')
+    add_batch_arguments(parser)
+    add_queue_arguments(parser)
     
     args = parser.parse_args()
     
+    if args.quiet:
+        logging.getLogger().setLevel(logging.ERROR)
+    
+    # Nos modos servidor, lote e fila os núcleos já estão ocupados pelo pool de documentos
+    page_workers = args.page_workers
+    if page_workers is None:
+        page_workers = 1 if (args.serve or args.batch or args.queue) else (os.cpu_count() or 1)
+    
+    cache_dir = None if args.no_cache else (args.cache_dir or str(DEFAULT_CACHE_DIR))
+    extractor_factory = functools.partial(CNISExtractorSimple, cache_dir=cache_dir,
+                                          save_text=args.save_text, from_text=args.from_text,
+                                          backend=args.backend, page_workers=page_workers,
+                                          parallel_threshold=args.parallel_threshold,
+                                          ocr=not args.no_ocr, ocr_dpi=args.ocr_dpi,
+                                          ocr_lang=args.ocr_lang,
+                                          metrics=args.metrics or bool(args.metrics_textfile),
+                                          profile_patterns=args.profile_patterns,
+                                          target_pages=not args.all_pages,
+                                          layout=not args.no_layout)
+    
+    if args.serve:
+        from cnis_server import serve
+        preload_pdf_backend(args.backend)
+        serve(extractor_factory, socket_path=args.socket, workers=args.workers,
+              max_tasks_per_worker=args.max_requests_per_worker,
+              metrics_textfile=args.metrics_textfile)
+        return
+    
+    if args.batch:
+        run_batch_cli(extractor_factory, args)
+        return
+    
+    if args.queue:
+        preload_pdf_backend(args.backend)
+        run_queue_cli(extractor_factory, args)
+        return
+    
+    if not args.pdf_path and args.input_fd is None:
+        parser.error('pdf_path (ou --input-fd) é obrigatório fora dos modos --serve, --batch e --queue')
+    if reads_stream(args) and args.from_text:
+        parser.error('--from-text lê o artefato ao lado do PDF e precisa do caminho do arquivo')
+    
+    if args.format == 'ndjson':
+        run_ndjson(extractor_factory, args)
+        return
+    
     # Verifica se o arquivo existe
-    if not Path(args.pdf_path).exists():
-        print(f"Erro: Arquivo não encontrado - {args.pdf_path}")
+    input_path = artifact_path_for(args.pdf_path) if args.from_text else args.pdf_path
+    if not reads_stream(args) and not Path(input_path).exists():
+        print(f"Erro: Arquivo não encontrado - {input_path}")
+        sys.exit(1)
+    
+    try:
+        source = open_input(args)
+    except (OSError, ValueError) as e:
+        print(f"Erro: Não foi possível ler o PDF de {input_label(args)} - {e}")
         sys.exit(1)
     
     # Processa o CNIS
-    extractor = CNISExtractorSimple()
-    result = extractor.process_cnis(args.pdf_path)
+    try:
+        extractor = extractor_factory()
+        result = extractor.process_cnis(source)
+    finally:
+        close_input(source)
+    
+    profile = result.pop('pattern_profile', None)
+    if profile:
+        print(format_report(profile), file=sys.stderr)
     
     # Saída
     if args.output: